@@ -0,0 +1,89 @@
+"""
+Cache-aside helpers for data that is read on most requests but rarely written (exam
+papers, the concept list, the master concept tree).
+
+Values are stored in the configured cache (CACHES['default']), so they are shared by
+every worker process when that cache is shared (database, memcached, redis), and only
+by the current process with LocMemCache.
+
+Keys are grouped in namespaces, e.g. 'exam:12'. Each namespace has a version number
+that is part of every key in it, so all of a namespace's values are invalidated at
+once by incrementing its version (see invalidate() and invalidate_on()); old values
+simply expire. A missing version is initialized from the clock rather than to 1, so a
+version that was evicted cannot bring back values cached under an earlier one.
+Versions never expire (timeout None).
+"""
+
+import time
+
+from django.core.cache import cache as default_cache
+from django.db.models.signals import post_save, post_delete
+
+CACHE_TIMEOUT = 60 * 60 # seconds
+
+
+def clock_version():
+    return int(time.time() * 1000)
+
+
+def namespace_version(namespace, backend=None):
+    backend = backend or default_cache
+    version_key = 'version:%s' % namespace
+    version = backend.get(version_key)
+    if version is None:
+        backend.add(version_key, clock_version(), None)
+        version = backend.get(version_key)
+    return version
+
+
+def versioned_key(namespace, *parts, **kwargs):
+    """
+    Returns the cache key of `parts` in the current version of `namespace`.
+    """
+    version = namespace_version(namespace, kwargs.get('backend'))
+    return ':'.join([namespace, str(version)] + [unicode(part) for part in parts])
+
+
+def get_or_set(namespace, parts, compute, timeout=CACHE_TIMEOUT, backend=None):
+    """
+    Returns the cached value of `parts` in `namespace`, or calls `compute()`, caches
+    its result and returns it. None is a valid value.
+    """
+    backend = backend or default_cache
+    key = versioned_key(namespace, *parts, backend=backend)
+    cached = backend.get(key)
+    if cached is not None:
+        return cached[0]
+    value = compute()
+    # wrapped, so that a cached None can be told apart from a miss
+    backend.set(key, (value,), timeout)
+    return value
+
+
+def invalidate(namespace, backend=None):
+    """
+    Invalidates all values cached in `namespace`.
+    """
+    backend = backend or default_cache
+    version_key = 'version:%s' % namespace
+    version = backend.get(version_key) or 0
+    backend.set(version_key, max(version + 1, clock_version()), None)
+
+
+def invalidate_on(namespace, *senders):
+    """
+    Invalidates `namespace` whenever an instance of one of the models `senders` is
+    saved or deleted. `namespace` is either a string or a function that takes the
+    instance and returns a namespace (or None to leave the cache alone).
+
+    Signals are not sent for queryset update() and bulk_create(); code that writes
+    cached data that way has to call invalidate() itself.
+    """
+    def receiver(sender, instance, **kwargs):
+        name = namespace(instance) if callable(namespace) else namespace
+        if name is not None:
+            invalidate(name)
+    for sender in senders:
+        post_save.connect(receiver, sender=sender, weak=False)
+        post_delete.connect(receiver, sender=sender, weak=False)
+    return receiver
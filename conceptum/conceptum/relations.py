@@ -0,0 +1,59 @@
+"""
+Batch loading of GenericForeignKey targets.
+
+Reading a GenericForeignKey (Question.content_object, Excerpt.content_object,
+ValueCounter.target, RankingProcess.parent) costs a query per instance. In a loop,
+call prefetch_generic() on the instances first.
+"""
+
+import collections
+
+from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
+
+# targets read per query; SQLite allows at most 999 parameters in a query
+BATCH_SIZE = 500
+
+
+def generic_field(model, field_name):
+    field = getattr(model, field_name, None)
+    if not isinstance(field, generic.GenericForeignKey):
+        raise ValueError("%s has no generic foreign key %r" % (model.__name__, field_name))
+    return field
+
+
+def prefetch_generic(objects, field_name):
+    """
+    Loads the targets of the GenericForeignKey `field_name` of all `objects` with one
+    query per content type (per BATCH_SIZE targets), and caches them on the
+    instances, so that reading the field costs no query. Missing targets are cached
+    as None.
+
+    `objects` can be any iterable of instances of one model; they are returned as a
+    list.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+    field = generic_field(type(objects[0]), field_name)
+    ct_attname = objects[0]._meta.get_field(field.ct_field).get_attname()
+
+    object_ids = collections.defaultdict(set)
+    for obj in objects:
+        content_type_id = getattr(obj, ct_attname)
+        if content_type_id is not None:
+            object_ids[content_type_id].add(getattr(obj, field.fk_field))
+
+    targets = {}
+    for content_type_id, ids in object_ids.items():
+        content_type = ContentType.objects.get_for_id(content_type_id)
+        ids = sorted(ids)
+        for start in range(0, len(ids), BATCH_SIZE):
+            for target in content_type.get_all_objects_for_this_type(
+                    pk__in=ids[start:start + BATCH_SIZE]):
+                targets[(content_type_id, target.pk)] = target
+
+    for obj in objects:
+        key = (getattr(obj, ct_attname), getattr(obj, field.fk_field))
+        setattr(obj, field.cache_attr, targets.get(key))
+    return objects
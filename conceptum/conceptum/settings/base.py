@@ -255,6 +255,10 @@ LOGGING = {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
+        },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler'
         }
     },
     'loggers': {
@@ -263,6 +267,11 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'exam': {
+            'handlers': ['console', 'mail_admins'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     }
 }
 ########## END LOGGING CONFIGURATION
@@ -3,6 +3,7 @@
 from __future__ import absolute_import
 
 from os.path import join, normpath
+from tempfile import gettempdir
 
 from .base import *
 
@@ -53,9 +54,12 @@ DATABASES = {
 
 ########## CACHE CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# A file based cache is shared by runserver and management commands, like the
+# production cache is shared by the workers.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': join(gettempdir(), 'conceptum_cache'),
     }
 }
 ########## END CACHE CONFIGURATION
@@ -89,9 +89,19 @@ DATABASES = {
 
 ########## CACHE CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# The cache must be shared by all worker processes (see conceptum/caching.py), so
+# LocMemCache cannot be used here. The default is the database cache, whose table
+# must be created once with `python manage.py createcachetable conceptum_cache`
+# before the site is started (see "Deployment" in README.md); for memcached set
+# "cache_backend" to "django.core.cache.backends.memcached.MemcachedCache" and
+# "cache_location" to "host:port" (requires python-memcached), for redis use the
+# backend of django-redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': secrets.get('cache_backend',
+                               'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': secrets.get('cache_location', 'conceptum_cache'),
+        'KEY_PREFIX': 'conceptum',
     }
 }
 ########## END CACHE CONFIGURATION
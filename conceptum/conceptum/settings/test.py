@@ -18,3 +18,10 @@ DATABASES = {
         "PORT": "",
     },
 }
+########## TEST CACHE
+# conceptum/test_caching.py also runs the cache helpers against a file based cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache, get_cache
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from interviews.models import DummyConcept, get_cached_concepts
+from nodemanager.models import CITreeInfo, ConceptNode
+from . import caching
+
+
+class CachingTest(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        # the helpers are run against each of the local stand-in backends
+        self.backends = [cache,
+                         get_cache('django.core.cache.backends.filebased.FileBasedCache',
+                                   LOCATION=self.cache_dir)]
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_or_set(self):
+        for backend in self.backends:
+            calls = []
+            def compute():
+                calls.append(1)
+                return ['value', len(calls)]
+            self.assertEqual(caching.get_or_set('test', ['a', 1], compute, backend=backend),
+                             ['value', 1])
+            self.assertEqual(caching.get_or_set('test', ['a', 1], compute, backend=backend),
+                             ['value', 1])
+            self.assertEqual(len(calls), 1)
+
+            # a new version of the namespace does not see the old values
+            caching.invalidate('test', backend=backend)
+            self.assertEqual(caching.get_or_set('test', ['a', 1], compute, backend=backend),
+                             ['value', 2])
+
+            # None is cached too
+            self.assertIsNone(caching.get_or_set('test', ['none'], lambda: calls.append(1),
+                                                 backend=backend))
+            self.assertIsNone(caching.get_or_set('test', ['none'], lambda: 1/0,
+                                                 backend=backend))
+
+    def test_evicted_version(self):
+        for backend in self.backends:
+            backend.set('version:evicted', 5)
+            old_key = caching.versioned_key('evicted', 'a', backend=backend)
+            backend.set(old_key, ('old',))
+            backend.delete('version:evicted')
+            self.assertNotEqual(caching.versioned_key('evicted', 'a', backend=backend),
+                                old_key)
+
+    def test_concept_list(self):
+        concepts = get_cached_concepts()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_cached_concepts(), concepts)
+        self.assertEqual(len(queries), 0)
+        new_concept = DummyConcept.objects.create(name='Cached Concept')
+        self.assertIn(new_concept, get_cached_concepts())
+        new_concept.delete()
+        self.assertNotIn(new_concept, get_cached_concepts())
+
+    def test_master_tree(self):
+        CITreeInfo.objects.filter(is_master=True).update(is_master=False)
+        caching.invalidate('master_tree')
+        self.assertIsNone(CITreeInfo.get_master_tree_root())
+
+        info = CITreeInfo.objects.create(is_master=True)
+        root = ConceptNode.objects.create(ci_tree_info=info, content='root')
+        self.assertEqual(CITreeInfo.get_master_tree_root(), root)
+        ConceptNode.objects.create(ci_tree_info=info, parent=root, content='child')
+        # only the root node is read
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(CITreeInfo.get_master_tree_root(), root)
+        self.assertEqual(len(queries), 1)
+
+        info.is_master = False
+        info.save()
+        self.assertIsNone(CITreeInfo.get_master_tree_root())
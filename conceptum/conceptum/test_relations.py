@@ -0,0 +1,142 @@
+import datetime
+import os
+import sys
+import time
+from unittest import skipUnless
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from exam.models import Exam, ExamStage, Question
+from interviews.models import DummyConcept, Interview, InterviewGroup, Excerpt, seed_concepts
+from nodemanager.models import CITreeInfo, ConceptNode, ConceptAtom
+from profiles.tests import set_up_user
+from ranking.models import RankingProcess, ValueCounter
+from .relations import prefetch_generic, BATCH_SIZE
+
+
+def create_questions(exam, count):
+    """
+    Creates `count` multiple choice questions in `exam`, spread over the concepts.
+    """
+    concept_type = ContentType.objects.get_for_model(DummyConcept)
+    concepts = list(DummyConcept.objects.all())
+    Question.objects.bulk_create([
+        Question(exam=exam, is_multiple_choice=True, question="question %d?" % i,
+                 number=i, content_type=concept_type,
+                 object_id=concepts[i % len(concepts)].id)
+        for i in range(count)])
+
+
+class PrefetchGenericTest(SimpleTestCase):
+    def setUp(self):
+        seed_concepts()
+        self.exam = Exam.objects.create(name='Generic Exam', description='an exam for testing')
+        create_questions(self.exam, 20)
+
+    def test_prefetch_generic(self):
+        questions = list(self.exam.question_set.all())
+        missing = questions[0]
+        missing.object_id = 999999
+        # content types are cached by get_for_id, so only the concepts are read
+        ContentType.objects.get_for_id(missing.content_type_id)
+        with CaptureQueriesContext(connection) as queries:
+            prefetch_generic(questions, 'content_object')
+            names = set(question.content_object.name for question in questions[1:])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(names, set(DummyConcept.objects.values_list('name', flat=True)))
+        self.assertIsNone(missing.content_object)
+        self.assertEqual(prefetch_generic([], 'content_object'), [])
+        self.assertRaises(ValueError, prefetch_generic, questions, 'question')
+
+    def test_rank_choices(self):
+        user = set_up_user()
+        node = ConceptNode.objects.create(ci_tree_info=CITreeInfo.objects.create(),
+                                          content='root')
+        ranking_process = RankingProcess.objects.create(parent=node)
+        atom_type = ContentType.objects.get_for_model(ConceptAtom)
+        atoms = [ConceptAtom.objects.create(concept_node=node, user=user,
+                                            text='atom %d' % i)
+                 for i in range(10)]
+        for value, atom in enumerate(atoms):
+            ValueCounter.objects.create(ranking_process=ranking_process, value=value,
+                                        content_type=atom_type, object_id=atom.id)
+        with CaptureQueriesContext(connection) as queries:
+            choices = ranking_process.get_rank_choices()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(choices, list(reversed(atoms)))
+
+
+class PrefetchGenericBatchTest(TestCase):
+    def test_many_targets(self):
+        # more targets than SQLite allows parameters in a query
+        DummyConcept.objects.bulk_create([DummyConcept(name='Batch %d' % i)
+                                          for i in range(1200)])
+        concepts = list(DummyConcept.objects.filter(name__startswith='Batch '))
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        questions = [Question(content_type=concept_type, object_id=concept.id)
+                     for concept in concepts]
+        with CaptureQueriesContext(connection) as queries:
+            prefetch_generic(questions, 'content_object')
+        self.assertEqual(len(queries), (len(concepts) + BATCH_SIZE - 1) // BATCH_SIZE)
+        self.assertEqual([question.content_object.name for question in questions],
+                         [concept.name for concept in concepts])
+
+
+@skipUnless(os.environ.get('CONCEPTUM_BENCHMARK'),
+            'set CONCEPTUM_BENCHMARK=1 to run the list page benchmarks')
+class ListPageBenchmark(SimpleTestCase):
+    """
+    Renders list pages with 1k and 10k rows behind generic foreign keys, and reports
+    their query count and time on stderr. The query count must not grow.
+    """
+    sizes = [1000, 10000]
+
+    def setUp(self):
+        seed_concepts()
+        self.user = set_up_user()
+        self.user.profile.is_contrib = True
+        self.user.profile.save()
+        self.client.login(email=self.user.email, password='password')
+
+    def measure(self, name, url):
+        self.client.get(url)
+        start = time.time()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        elapsed = time.time() - start
+        self.assertEqual(response.status_code, 200)
+        sys.stderr.write('\n%s: %d queries, %.3fs' % (name, len(queries), elapsed))
+        return len(queries)
+
+    def test_exam_index(self):
+        counts = []
+        for size in self.sizes:
+            exam = Exam.objects.create(name='Benchmark %d' % size, description='benchmark')
+            create_questions(exam, size)
+            exam.stage = ExamStage.DIST
+            exam.save()
+            counts.append(self.measure('exam index, %d questions' % size,
+                                       reverse('CI_exam:distribute_index')))
+        self.assertEqual(counts[0], counts[-1])
+
+    def test_interview_group(self):
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        concepts = list(DummyConcept.objects.all())
+        counts = []
+        for size in self.sizes:
+            group = InterviewGroup.objects.create(name='Benchmark %d' % size)
+            interviews = [Interview.objects.create(group=group, interviewee='expert %d' % i,
+                                                   date_of_interview=datetime.date.today(),
+                                                   uploaded_by=self.user)
+                          for i in range(10)]
+            Excerpt.objects.bulk_create([
+                Excerpt(interview=interviews[i % 10], content_type=concept_type,
+                        object_id=concepts[i % len(concepts)].id, response='response')
+                for i in range(size)])
+            counts.append(self.measure('interview group, %d excerpts' % size,
+                                       reverse('interview_group', args=[group.id])))
+        self.assertEqual(counts[0], counts[-1])
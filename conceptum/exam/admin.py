@@ -3,9 +3,12 @@ from django.contrib.contenttypes.generic import GenericTabularInline, GenericSta
 
 from .models import (
     Exam,
+    ExamKind,
     Question,
     ResponseSet,
     ExamResponse,
+    ExamInvitation,
+    ResponseSetStats,
     FreeResponseQuestion,
     FreeResponseResponse,
     MultipleChoiceOption,
@@ -15,6 +18,8 @@ from .models import (
 
 import reversion
 
+from .grading import grade_response_set
+
 """
 Warning! For versioning to work correctly, if you want to register a model with
 reversion.VersionAdmin, do not also register it as a ModelAdmin or Inline.
@@ -40,13 +45,36 @@ class MultipleChoiceQuestionAdmin(admin.ModelAdmin):
 
 
 class ResponseSetAdmin(admin.ModelAdmin):
-    pass
+    actions = ['regrade']
+    
+    def regrade(self, request, queryset):
+        """
+        Re-scores the submitted ExamResponses of the selected sets and rebuilds their
+        stats (e.g. after a correct option was changed).
+        """
+        graded = 0
+        for response_set in queryset.exclude(exam__kind=ExamKind.SURVEY).select_related('exam'):
+            report = grade_response_set(response_set)
+            report.save_scores()
+            ResponseSetStats.rebuild(response_set)
+            graded += report.num_students
+        self.message_user(request, "Regraded %d exam response(s)." % graded)
+    regrade.short_description = "Regrade selected response sets"
 
 
 class ExamResponseAdmin(admin.ModelAdmin):
     pass
 
 
+class ExamInvitationAdmin(admin.ModelAdmin):
+    list_display = ('exam_response', 'status', 'attempts', 'next_attempt', 'created')
+    list_filter = ('status',)
+
+
+class ResponseSetStatsAdmin(admin.ModelAdmin):
+    list_display = ('response_set', 'count', 'total', 'min_score', 'max_score')
+
+
 class MultipleChoiceResponseAdmin(admin.ModelAdmin):
     pass
 
@@ -60,5 +88,7 @@ admin.site.register(FreeResponseQuestion, FreeResponseQuestionAdmin)
 admin.site.register(MultipleChoiceQuestion, MultipleChoiceQuestionAdmin)
 admin.site.register(ResponseSet, ResponseSetAdmin)
 admin.site.register(ExamResponse, ExamResponseAdmin)
+admin.site.register(ExamInvitation, ExamInvitationAdmin)
+admin.site.register(ResponseSetStats, ResponseSetStatsAdmin)
 admin.site.register(FreeResponseResponse, FreeResponseResponseAdmin)
 admin.site.register(MultipleChoiceResponse, MultipleChoiceResponseAdmin)
\ No newline at end of file
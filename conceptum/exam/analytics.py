@@ -0,0 +1,149 @@
+"""
+Item analysis for concept inventories.
+
+The submitted multiple choice responses of an Exam (across all of its ResponseSets)
+are loaded with a single query into dense NumPy matrices with one row per student
+and one column per question (item). All statistics are then computed in vectorized
+form:
+
+    analysis = analyze_exam(exam)
+    analysis.difficulty()        # proportion of students answering each item correctly
+    analysis.discrimination()    # corrected item-total (point-biserial) correlation
+    analysis.kr20()              # KR-20 reliability (= Cronbach's alpha for 0/1 items)
+    analysis.option_rates()      # {option id: proportion of students choosing it}
+
+Unanswered questions count as incorrect.
+"""
+
+import numpy as np
+
+from .models import MultipleChoiceResponse
+
+
+class ItemAnalysis(object):
+    """
+    Item statistics for a student x item matrix.
+
+    Attributes:
+        items: array of question ids, one per column.
+
+        correct: float array (students x items), 1 where the student chose the correct
+            option and 0 otherwise.
+
+        choices: int array (students x items) of the chosen option ids, 0 where the
+            question was not answered.
+    """
+    def __init__(self, items, correct, choices):
+        self.items = np.asarray(items)
+        self.correct = np.asarray(correct, dtype=float)
+        self.choices = np.asarray(choices, dtype=np.int64)
+
+    @property
+    def num_students(self):
+        return self.correct.shape[0]
+
+    @property
+    def num_items(self):
+        return self.correct.shape[1]
+
+    def scores(self):
+        """
+        Number of items each student answered correctly.
+        """
+        return self.correct.sum(axis=1)
+
+    def difficulty(self):
+        """
+        Item difficulty (p-value): the proportion of students who answered each item
+        correctly. NaN if there are no students.
+        """
+        if not self.num_students:
+            return np.full(self.num_items, np.nan)
+        return self.correct.mean(axis=0)
+
+    def discrimination(self):
+        """
+        Corrected point-biserial discrimination: the correlation between each item and
+        the total score on the *other* items. NaN for items (or rest scores) with no
+        variance.
+        """
+        rest = self.scores()[:, np.newaxis] - self.correct
+        item_dev = self.correct - self.correct.mean(axis=0)
+        rest_dev = rest - rest.mean(axis=0)
+        numerator = (item_dev * rest_dev).sum(axis=0)
+        denominator = np.sqrt((item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
+
+    def kr20(self):
+        """
+        Kuder-Richardson 20 reliability of the whole exam. For dichotomous items this
+        is the same as Cronbach's alpha. NaN if it is undefined (fewer than 2 items or
+        no variance in total scores).
+        """
+        k = self.num_items
+        if k < 2 or not self.num_students:
+            return np.nan
+        total_variance = self.scores().var()
+        if total_variance == 0:
+            return np.nan
+        p = self.difficulty()
+        return k / float(k - 1) * (1 - (p * (1 - p)).sum() / total_variance)
+
+    alpha = kr20
+
+    def option_rates(self):
+        """
+        Distractor analysis: {option id: proportion of students who chose it}. Options
+        nobody chose are not included.
+        """
+        if not self.num_students:
+            return {}
+        chosen = self.choices[self.choices > 0]
+        options, counts = np.unique(chosen, return_counts=True)
+        return dict(zip(options.tolist(), (counts / float(self.num_students)).tolist()))
+
+
+def load_matrix(responses):
+    """
+    Builds an ItemAnalysis from a queryset of MultipleChoiceResponses, with a single
+    query.
+    """
+    rows = list(responses.order_by()
+                         .values_list('exam_response', 'question', 'option',
+                                      'option__is_correct'))
+    count = len(rows)
+    if not count:
+        return ItemAnalysis([], np.zeros((0, 0)), np.zeros((0, 0)))
+    # ExamResponse keys are strings; numbering them with a dict is much faster than
+    # np.unique on the strings
+    students = {}
+    student_index = np.fromiter((students.setdefault(row[0], len(students)) for row in rows),
+                                np.intp, count)
+    items, item_index = np.unique(np.fromiter((row[1] for row in rows), np.int64, count),
+                                  return_inverse=True)
+    correct = np.zeros((len(students), len(items)))
+    choices = np.zeros((len(students), len(items)), dtype=np.int64)
+    correct[student_index, item_index] = np.fromiter((row[3] is True for row in rows),
+                                                     bool, count)
+    choices[student_index, item_index] = np.fromiter((row[2] or 0 for row in rows),
+                                                     np.int64, count)
+    return ItemAnalysis(items, correct, choices)
+
+
+def analyze_exam(exam):
+    """
+    Item analysis of every submitted ExamResponse, in all ResponseSets, of `exam`.
+    """
+    return load_matrix(MultipleChoiceResponse.objects.filter(
+        exam_response__response_set__exam=exam,
+        exam_response__submitted__isnull=False))
+
+
+def analyze_response_set(response_set):
+    """
+    Item analysis of the submitted ExamResponses of one ResponseSet.
+    """
+    return load_matrix(MultipleChoiceResponse.objects.filter(
+        exam_response__response_set=response_set,
+        exam_response__submitted__isnull=False))
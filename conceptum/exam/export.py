@@ -0,0 +1,154 @@
+"""
+CSV export of exam results.
+
+Rows are produced by generators, so an export can be streamed (StreamingHttpResponse,
+or the `export_responses` management command) without holding a whole ResponseSet or
+Exam in memory. Submitted ExamResponses are read in chunks of CHUNK_SIZE, ordered by
+key; each chunk costs three queries (the ExamResponses, then their multiple choice and
+free response answers).
+
+Two layouts are available:
+    wide - one row per respondent, one column per question. Multiple choice answers
+        are given as the chosen option's index.
+    long - one row per answer.
+"""
+
+import csv
+
+from .models import ExamResponse, FreeResponseResponse, MultipleChoiceResponse
+
+CHUNK_SIZE = 500
+LAYOUTS = ('wide', 'long')
+
+RESPONDENT_HEADER = ['key', 'respondent', 'submitted', 'score']
+LONG_HEADER = RESPONDENT_HEADER + ['question_id', 'question_number', 'question_type',
+                                   'answer', 'option_index', 'is_correct']
+
+
+def response_chunks(exam_responses, chunk_size=CHUNK_SIZE):
+    """
+    Yields the submitted ExamResponses of the queryset `exam_responses` as lists of
+    (key, respondent, submitted, score) tuples, in chunks of at most `chunk_size`.
+    Each chunk is fetched with its own query (keyset pagination on the key).
+    """
+    responses = exam_responses.filter(submitted__isnull=False).order_by('key')\
+                              .values_list('key', 'respondent', 'submitted', 'score')
+    last_key = None
+    while True:
+        if last_key is None:
+            chunk = list(responses[:chunk_size])
+        else:
+            chunk = list(responses.filter(key__gt=last_key)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_key = chunk[-1][0]
+
+
+def answer_rows(keys):
+    """
+    Returns the answers of the ExamResponses `keys`, as a dictionary
+    {key: [(question id, question type, answer, option index, is_correct), ...]}.
+    """
+    answers = dict((key, []) for key in keys)
+    multiple_choice = MultipleChoiceResponse.objects.filter(exam_response__in=keys)\
+        .order_by('exam_response', 'question')\
+        .values_list('exam_response', 'question', 'option__text', 'option__index',
+                     'option__is_correct')
+    for key, question, text, index, is_correct in multiple_choice:
+        answers[key].append((question, 'MC', text, index, is_correct))
+    free_response = FreeResponseResponse.objects.filter(exam_response__in=keys)\
+        .order_by('exam_response', 'question')\
+        .values_list('exam_response', 'question', 'response')
+    for key, question, response in free_response:
+        answers[key].append((question, 'FR', response, None, None))
+    return answers
+
+
+def question_columns(exam):
+    """
+    Returns a list of (question id, column name), in exam order.
+    """
+    columns = []
+    for pk, number in exam.question_set.values_list('pk', 'number'):
+        if number is None:
+            columns.append((pk, 'question_%d' % pk))
+        else:
+            columns.append((pk, 'Q%d' % number))
+    return columns
+
+
+def wide_rows(exam, exam_responses, chunk_size=CHUNK_SIZE):
+    """
+    Yields a header and then one row per submitted ExamResponse in `exam_responses`:
+    the respondent, their score, and their answer to each question of `exam`.
+    """
+    columns = question_columns(exam)
+    yield RESPONDENT_HEADER + [name for pk, name in columns]
+    for chunk in response_chunks(exam_responses, chunk_size):
+        answers = answer_rows([response[0] for response in chunk])
+        for response in chunk:
+            by_question = {}
+            for question, kind, answer, index, is_correct in answers[response[0]]:
+                by_question[question] = index if kind == 'MC' else answer
+            yield list(response) + [by_question.get(pk) for pk, name in columns]
+
+
+def long_rows(exam, exam_responses, chunk_size=CHUNK_SIZE):
+    """
+    Yields a header and then one row per answer of each submitted ExamResponse in
+    `exam_responses`.
+    """
+    numbers = dict(exam.question_set.values_list('pk', 'number'))
+    yield LONG_HEADER
+    for chunk in response_chunks(exam_responses, chunk_size):
+        answers = answer_rows([response[0] for response in chunk])
+        for response in chunk:
+            for question, kind, answer, index, is_correct in answers[response[0]]:
+                yield list(response) + [question, numbers.get(question), kind,
+                                        answer, index, is_correct]
+
+
+def export_rows(exam, exam_responses, layout='wide', chunk_size=CHUNK_SIZE):
+    """
+    Returns a generator of rows for `layout` ('wide' or 'long').
+    """
+    if layout == 'long':
+        return long_rows(exam, exam_responses, chunk_size)
+    return wide_rows(exam, exam_responses, chunk_size)
+
+
+def response_set_rows(response_set, layout='wide', chunk_size=CHUNK_SIZE):
+    return export_rows(response_set.exam, response_set.examresponse_set.all(),
+                       layout, chunk_size)
+
+
+def exam_rows(exam, layout='wide', chunk_size=CHUNK_SIZE):
+    return export_rows(exam, ExamResponse.objects.filter(response_set__exam=exam),
+                       layout, chunk_size)
+
+
+class Echo(object):
+    """
+    A file-like object whose write() returns the value instead of storing it, so a
+    csv.writer can produce one line at a time.
+    """
+    def write(self, value):
+        return value
+
+
+def encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def csv_lines(rows):
+    """
+    Yields each row of `rows` as a line of UTF-8 encoded CSV.
+    """
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow([encode(value) for value in row])
@@ -9,7 +9,8 @@ from django.db import models, transaction
 from interviews.models import get_concept_list, DummyConcept as Concept #TEMPORARY: DummyConcept
 from .models import ExamResponse, FreeResponseQuestion, MultipleChoiceQuestion, \
                     Question, MultipleChoiceOption, ResponseSet, Exam, \
-                    MAX_CHOICES, REQUIRED_CHOICES
+                    FreeResponseResponse, MultipleChoiceResponse, \
+                    MAX_CHOICES, REQUIRED_CHOICES, update_by_pk
 import reversion
 
 MAX_EMAILS = 30 # I don't think this is currently checked
@@ -328,21 +329,17 @@ class QuestionVersionForm(forms.ModelForm):
         """
         A list of tuples (i,question)
         
-        i is the index in get_unique_versions() and question is the
+        i is the index in get_unique_fingerprints() and question is the
         question text at that version
         """
-        l = []
-        i = 0
-        for version in self.instance.get_unique_versions():
-            l.append( (i,version.field_dict['question']))
-            i+=1
-        return l
+        return [(i, fingerprint.text) for i, fingerprint in enumerate(self.fingerprints)]
     
     def __init__(self, *args, **kwargs):
         """
         There is one field, a list of tuples
         """
         super(QuestionVersionForm, self).__init__(*args, **kwargs)
+        self.fingerprints = self.instance.get_unique_fingerprints()
         self.fields['version']=forms.ChoiceField(choices=self.get_version_choices(),
                                                  widget=forms.RadioSelect())
 
@@ -357,11 +354,10 @@ class FreeResponseVersionForm(QuestionVersionForm):
     def save(self):
         """
         The data saved in 'version' is an integer that is the selected version's index
-        in get_unique_versions()
+        in get_unique_fingerprints()
         """
         index = int(self.cleaned_data.get('version'))
-        version_list = self.instance.get_unique_versions()
-        version_list[index].revert()
+        self.fingerprints[index].version.revert()
         return self.instance
 
         
@@ -375,13 +371,12 @@ class MultipleChoiceVersionForm(QuestionVersionForm):
     def save(self):
         """
         The data saved in 'version' is an integer that is the selected version's index
-        in get_unique_versions()
+        in get_unique_fingerprints()
         """
         index = int(self.cleaned_data.get('version'))
-        version_list = self.instance.get_unique_versions()
-        revision = version_list[index].revision
+        revision = self.fingerprints[index].revision
         
-        # We would like to just call `version_list[index].revision.revert(delete=True)`
+        # We would like to just call `revision.revert(delete=True)`
         # but this does not work with proxy models. We call our own revert method instead.
         self.instance.revision_revert(revision)
 
@@ -489,11 +484,10 @@ class DistributeForm(forms.Form):
         does not check that an email has not been entered twice in the same input.
         """
         data = self.cleaned_data['recipients']
-        for email in data:
-            if self.instance.examresponse_set.filter(respondent__exact=email):
-                raise forms.ValidationError("You have already sent an exam to one or more \
-                                            of these addresses.  If you'd like to resend an \
-                                            exam, use the checkbox below.")
+        if data and self.instance.examresponse_set.filter(respondent__in=data).exists():
+            raise forms.ValidationError("You have already sent an exam to one or more \
+                                        of these addresses.  If you'd like to resend an \
+                                        exam, use the checkbox below.")
         return data
     
     def clean(self):
@@ -526,6 +520,14 @@ class ExamResponseForm(forms.ModelForm):
     Has fields for every question in an exam.  These fields are generated in the __init__()
     method.  After an ExamResponse has been submitted, the save() method updates the
     FreeResponseResponse and QuestionResponseResponse objects with the student's responses.
+    
+    Fields are named "MC_response_<question id>" or "FR_response_<question id>", so the
+    unbound form is the same for every student taking the exam.
+    
+    Questions and options come from Exam.get_paper() (cached once the exam is
+    distributed), responses are loaded with one query per kind (and kept in dicts
+    keyed by question id), and save() writes all answers in one transaction, so the
+    number of queries does not depend on the number of questions.
     """
     class Meta:
         model = ExamResponse
@@ -536,33 +538,62 @@ class ExamResponseForm(forms.ModelForm):
         Generate a field for each associated QuestionResponse object.
         """
         super(ExamResponseForm, self).__init__(*args, **kwargs)
-        multiple_choice_responses = self.instance.multiplechoiceresponse_set.all()
-        free_response_responses = self.instance.freeresponseresponse_set.all()
+        self.questions, options = self.instance.response_set.exam.get_paper()
+        self.multiple_choice_responses = dict(
+            (response.question_id, response)
+            for response in self.instance.multiplechoiceresponse_set.all())
+        self.free_response_responses = dict(
+            (response.question_id, response)
+            for response in self.instance.freeresponseresponse_set.all())
         
         # need to create response fields in the order that their questions are ordered
-        for question in self.instance.response_set.exam.question_set.all():
+        for question in self.questions:
             if question.is_multiple_choice:
-                response = multiple_choice_responses.get(question=question)
-                self.fields["MC_response_%d" % response.id] = forms.ModelChoiceField(
-                    label=_(response.question.__unicode__()),
+                self.fields["MC_response_%d" % question.id] = forms.TypedChoiceField(
+                    label=_(question.__unicode__()),
                     required=True,
-                    queryset=response.question.multiplechoiceoption_set.all(),
-                    empty_label=None,
+                    choices=[(option.id, option.__unicode__())
+                             for option in options.get(question.id, [])],
+                    coerce=int,
                     widget=forms.RadioSelect())
             else:
-                response = free_response_responses.get(question=question)
-                self.fields["FR_response_%d" % response.id] = forms.CharField(
-                    label=_(response.question.__unicode__()),
+                self.fields["FR_response_%d" % question.id] = forms.CharField(
+                    label=_(question.__unicode__()),
                     required=True,
                     widget=forms.Textarea(),)
     
+    def field_name(self, question):
+        if question.is_multiple_choice:
+            return "MC_response_%d" % question.id
+        return "FR_response_%d" % question.id
+    
+    def question_fields(self):
+        """
+        Returns a list of (bound field, question) pairs, in question order.
+        """
+        return [(self[self.field_name(question)], question) for question in self.questions]
+    
     def save(self):
         """
         Save the student's responses.
+        
+        The response rows are updated in place with one UPDATE per kind of response
+        (see update_by_pk), however many questions the exam has.
         """
-        for response in self.instance.freeresponseresponse_set.all():
-            response.response = self.cleaned_data.get("FR_response_%d" % response.id)
-            response.save()
-        for response in self.instance.multiplechoiceresponse_set.all():
-            response.option = self.cleaned_data.get("MC_response_%d" % response.id)
-            response.save()
+        free_response = {}
+        multiple_choice = {}
+        for question in self.questions:
+            value = self.cleaned_data.get(self.field_name(question))
+            if question.is_multiple_choice:
+                response = self.multiple_choice_responses.get(question.id)
+                if response is not None:
+                    response.option_id = value
+                    multiple_choice[response.pk] = value
+            else:
+                response = self.free_response_responses.get(question.id)
+                if response is not None:
+                    response.response = value
+                    free_response[response.pk] = value
+        with transaction.atomic():
+            update_by_pk(FreeResponseResponse, 'response', free_response)
+            update_by_pk(MultipleChoiceResponse, 'option', multiple_choice)
@@ -0,0 +1,168 @@
+"""
+Set-based grading of multiple choice responses.
+
+Grading joins MultipleChoiceResponse.option to MultipleChoiceOption.is_correct in the
+database and groups the result, instead of looking at one response object at a time.
+A whole ResponseSet or Exam is graded with a constant number of queries, no matter
+how many students took it:
+
+    report = grade_response_set(response_set)   # or grade_exam(exam)
+    report.scores             # {ExamResponse key: number correct}
+    report.question_percent   # {question id: percent correct}
+    report.option_counts      # {option id: number of students who chose it}
+
+question_correct_counts() counts the correct answers per question with a single
+aggregate query, for pages that only need those counts.
+
+Only submitted ExamResponses are graded.
+"""
+
+from collections import OrderedDict
+
+from django.db.models import Count
+
+from .models import ExamResponse, MultipleChoiceResponse, MultipleChoiceQuestion, percent
+
+# keeps `pk IN (...)` lists under database parameter limits
+CHUNK_SIZE = 500
+
+
+class GradeReport(object):
+    """
+    The result of grading a set of ExamResponses.
+
+    Attributes:
+        questions: list of the ids of the exam's multiple choice questions, in exam
+            order.
+
+        scores: OrderedDict {ExamResponse key: number of correct answers}, ordered by
+            respondent.
+
+        respondents: {ExamResponse key: respondent email}
+
+        question_correct: {question id: number of students who answered correctly}
+
+        question_answered: {question id: number of students who chose an option}
+
+        option_counts: {option id: number of students who chose that option}
+    """
+    def __init__(self, questions, responses, correct_counts, option_rows):
+        """
+        `responses` is a list of (key, respondent) pairs, `correct_counts` a dictionary
+        {key: number correct} (keys with no correct answers may be missing), and
+        `option_rows` a list of (question id, option id, is_correct, count) tuples.
+        """
+        self.questions = questions
+        self.scores = OrderedDict((key, correct_counts.get(key, 0)) for key, _ in responses)
+        self.respondents = dict(responses)
+        self.question_correct = dict((question, 0) for question in questions)
+        self.question_answered = dict((question, 0) for question in questions)
+        self.option_counts = {}
+        for question, option, is_correct, count in option_rows:
+            if option is None:
+                continue
+            self.option_counts[option] = count
+            self.question_answered[question] = self.question_answered.get(question, 0) + count
+            if is_correct:
+                self.question_correct[question] = self.question_correct.get(question, 0) + count
+
+    @property
+    def num_questions(self):
+        return len(self.questions)
+
+    @property
+    def num_students(self):
+        return len(self.scores)
+
+    @property
+    def question_percent(self):
+        """
+        {question id: percent of graded students who answered correctly}
+        """
+        return dict((question, percent(self.question_correct.get(question, 0),
+                                       self.num_students))
+                    for question in self.questions)
+
+    def summary(self):
+        """
+        Returns [numQuestions, numCorrect, averageScore, maxScore, lowScore], where the
+        scores are percentages (the format of ResponseSetStats.as_list()).
+        """
+        if not self.scores:
+            return [0, 0, 0, 0, 0]
+        scores = self.scores.values()
+        total = sum(scores)
+        return [self.num_questions,
+                total,
+                percent(total, self.num_questions * len(scores)),
+                percent(max(scores), self.num_questions),
+                percent(min(scores), self.num_questions)]
+
+    def response_stats(self, key):
+        """
+        Returns [numQuestions, numCorrect, percentCorrect] for the ExamResponse `key`,
+        or None if it was not graded.
+        """
+        if key not in self.scores:
+            return None
+        score = self.scores[key]
+        return [self.num_questions, score, percent(score, self.num_questions)]
+
+    def save_scores(self):
+        """
+        Stores the scores on the ExamResponses, with one update per distinct score.
+        """
+        by_score = {}
+        for key, score in self.scores.items():
+            by_score.setdefault(score, []).append(key)
+        for score, keys in by_score.items():
+            for i in range(0, len(keys), CHUNK_SIZE):
+                ExamResponse.objects.filter(pk__in=keys[i:i + CHUNK_SIZE]).update(score=score)
+
+
+def grade_responses(exam, exam_responses):
+    """
+    Grades the submitted ExamResponses in the queryset `exam_responses`, which must
+    all belong to `exam`. Uses four queries.
+    """
+    exam_responses = exam_responses.filter(submitted__isnull=False)
+    questions = list(MultipleChoiceQuestion.objects.filter(exam=exam)
+                                                   .order_by('number', 'rank', 'pk')
+                                                   .values_list('pk', flat=True))
+    responses = list(exam_responses.order_by('respondent', 'pk')
+                                   .values_list('pk', 'respondent'))
+    answers = MultipleChoiceResponse.objects.filter(exam_response__in=exam_responses)\
+                                            .order_by()
+    correct_counts = dict(answers.filter(option__is_correct=True)
+                                 .values_list('exam_response')
+                                 .annotate(Count('pk')))
+    option_rows = list(answers.values_list('question', 'option', 'option__is_correct')
+                              .annotate(Count('pk')))
+    return GradeReport(questions, responses, correct_counts, option_rows)
+
+
+def question_correct_counts(exam_responses):
+    """
+    Returns {question id: number of correct answers} for the submitted ExamResponses
+    in the queryset `exam_responses`, using one query. Questions nobody answered
+    correctly are missing.
+    """
+    return dict(MultipleChoiceResponse.objects
+                .filter(exam_response__in=exam_responses.filter(submitted__isnull=False),
+                        option__is_correct=True)
+                .order_by().values_list('question').annotate(Count('pk')))
+
+
+def grade_response_set(response_set):
+    """
+    Grades every submitted ExamResponse in `response_set`. Returns a GradeReport.
+    """
+    return grade_responses(response_set.exam, response_set.examresponse_set.all())
+
+
+def grade_exam(exam):
+    """
+    Grades every submitted ExamResponse, in all ResponseSets, of `exam`. Returns a
+    GradeReport.
+    """
+    return grade_responses(exam, ExamResponse.objects.filter(response_set__exam=exam))
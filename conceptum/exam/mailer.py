@@ -0,0 +1,73 @@
+"""
+Worker for the exam invitation outbox (see ExamInvitation).
+
+DistributeView only queues invitations, so distributing an exam to a large class
+does not wait on the mail server. send_queued_invitations() drains the queue in
+batches, using one mail server connection per batch. It is run by the
+`send_invitations` management command, either once or as a daemon:
+
+    python manage.py send_invitations
+    python manage.py send_invitations --daemon
+
+Several workers can drain the queue at the same time: each invitation is claimed
+(see ExamInvitation.claim) before it is sent, so no invitation is sent twice.
+"""
+
+from django.contrib.sites.models import Site
+from django.core.mail import get_connection
+from django.utils import timezone
+
+from .models import ExamInvitation, InvitationStatus
+
+BATCH_SIZE = 100
+
+
+def send_queued_invitations(batch_size=BATCH_SIZE, connection=None):
+    """
+    Sends up to `batch_size` queued invitations that are due, over a single
+    connection. If no connection is given, one is made with the configured
+    EMAIL_BACKEND. Invitations left SENDING by a worker whose claim has expired
+    are sent again.
+
+    Each invitation is marked SENT, and its ExamResponse's `sent` field is set, as
+    soon as it is delivered. Invitations that cannot be rendered or sent are
+    rescheduled (see ExamInvitation.retry_later). If the mail server cannot be reached,
+    the whole batch is postponed without counting an attempt against any invitation
+    (see ExamInvitation.postpone), so an outage cannot make invitations fail.
+
+    Returns a tuple (number sent, number failed).
+    """
+    due = ExamInvitation.objects.filter(status__in=[InvitationStatus.QUEUED,
+                                                    InvitationStatus.SENDING],
+                                        next_attempt__lte=timezone.now())
+    invitations = [invitation for invitation in due.select_related('exam_response')[:batch_size]
+                   if invitation.claim()]
+    if not invitations:
+        return (0, 0)
+
+    current_site = Site.objects.get_current()
+    if connection is None:
+        connection = get_connection()
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as error:
+        # could not reach the mail server; try the whole batch again later
+        ExamInvitation.postpone(invitations, error)
+        return (0, len(invitations))
+    try:
+        for invitation in invitations:
+            try:
+                message = invitation.exam_response.render_invitation(
+                    invitation.test_url, current_site=current_site)
+                message.connection = connection
+                message.send()
+            except Exception as error:
+                invitation.retry_later(error)
+                failed += 1
+            else:
+                invitation.mark_sent()
+                sent += 1
+    finally:
+        connection.close()
+    return (sent, failed)
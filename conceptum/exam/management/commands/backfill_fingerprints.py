@@ -0,0 +1,27 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from reversion.models import Version
+
+from exam.models import Question, QuestionFingerprint
+
+BATCH_SIZE = 500
+
+
+class Command(NoArgsCommand):
+    help = ("Fingerprints the question versions that have no QuestionFingerprint yet, "
+            "i.e. those saved before fingerprints were recorded.")
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        question_type = ContentType.objects.get_for_model(Question)
+        version_ids = list(Version.objects.filter(content_type=question_type,
+                                                  question_fingerprint__isnull=True)
+                                          .order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(version_ids), BATCH_SIZE):
+            with transaction.atomic():
+                QuestionFingerprint.backfill(
+                    Version.objects.filter(pk__in=version_ids[start:start + BATCH_SIZE]))
+        if verbosity >= 1:
+            self.stdout.write("Fingerprinted %d question version(s)." % len(version_ids))
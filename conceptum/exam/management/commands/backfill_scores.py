@@ -0,0 +1,25 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from exam.grading import grade_response_set
+from exam.models import ResponseSet, ResponseSetStats, ExamKind
+
+
+class Command(NoArgsCommand):
+    help = ("(Re)grades the submitted ExamResponses of every ResponseSet, then rebuilds "
+            "the ResponseSet's stats.")
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        response_sets = list(ResponseSet.objects.exclude(exam__kind=ExamKind.SURVEY)
+                                                .select_related('exam'))
+        graded = 0
+        for response_set in response_sets:
+            with transaction.atomic():
+                report = grade_response_set(response_set)
+                report.save_scores()
+                ResponseSetStats.rebuild(response_set)
+            graded += report.num_students
+        if verbosity >= 1:
+            self.stdout.write("Scored %d exam response(s) in %d response set(s)."
+                              % (graded, len(response_sets)))
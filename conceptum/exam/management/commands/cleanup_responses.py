@@ -0,0 +1,24 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from exam.managers import EXPIRED_BATCH_SIZE
+from exam.models import ExamResponse
+
+
+class Command(NoArgsCommand):
+    help = ("Deletes the ExamResponses that expired without being submitted, with their "
+            "question responses. Meant to be run periodically, e.g. from cron.")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', action='store', type='int', dest='batch_size',
+            default=EXPIRED_BATCH_SIZE,
+            help='Number of ExamResponses deleted per transaction. Defaults to %d.'
+                 % EXPIRED_BATCH_SIZE),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        deleted = ExamResponse.objects.delete_expired(batch_size=options['batch_size'])
+        if verbosity >= 1:
+            self.stdout.write("Deleted %d expired exam response(s)." % deleted)
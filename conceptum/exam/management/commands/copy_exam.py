@@ -0,0 +1,33 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+
+
+class Command(BaseCommand):
+    args = '<exam_id>'
+    help = ("Copies an Exam with all of its questions and options into a new Exam in "
+            "the development stage (see Exam.clone).")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--name', action='store', dest='new_name',
+            help="Name of the copy. Defaults to '<name> (copy)'."),
+        make_option('--description', action='store', dest='new_description',
+            help="Description of the copy. Defaults to the exam's description."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Give the id of the exam to copy.")
+        try:
+            exam = Exam.objects.get(pk=args[0])
+        except (Exam.DoesNotExist, ValueError):
+            raise CommandError("Exam %s does not exist." % args[0])
+        fields = {'name': options['new_name'] or '%s (copy)' % exam.name}
+        if options['new_description']:
+            fields['description'] = options['new_description']
+        new_exam = exam.clone(**fields)
+        if int(options.get('verbosity', 1)) >= 1:
+            self.stdout.write("Copied exam %d to exam %d (%s)."
+                              % (exam.pk, new_exam.pk, new_exam.name))
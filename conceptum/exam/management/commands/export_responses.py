@@ -0,0 +1,55 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from exam import export
+from exam.models import Exam, ResponseSet
+
+
+class Command(NoArgsCommand):
+    help = ("Writes the submitted responses of a ResponseSet or of a whole Exam as CSV. "
+            "Rows are written as they are read, so memory use does not depend on the "
+            "number of responses.")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--response-set', action='store', type='int', dest='response_set',
+            help='Id of the ResponseSet to export.'),
+        make_option('--exam', action='store', type='int', dest='exam',
+            help='Id of the Exam to export (all of its ResponseSets).'),
+        make_option('--layout', action='store', dest='layout', default='wide',
+            choices=export.LAYOUTS,
+            help="'wide' (one row per respondent, the default) or 'long' "
+                 "(one row per answer)."),
+        make_option('--output', action='store', dest='output',
+            help='File to write to. Defaults to standard output.'),
+        make_option('--chunk-size', action='store', type='int', dest='chunk_size',
+            default=export.CHUNK_SIZE,
+            help='Number of ExamResponses read per query. Defaults to %d.'
+                 % export.CHUNK_SIZE),
+    )
+
+    def handle_noargs(self, **options):
+        if bool(options['response_set']) == bool(options['exam']):
+            raise CommandError("Give exactly one of --response-set and --exam.")
+        layout = options['layout']
+        chunk_size = options['chunk_size']
+        if options['response_set']:
+            try:
+                response_set = ResponseSet.objects.get(pk=options['response_set'])
+            except ResponseSet.DoesNotExist:
+                raise CommandError("ResponseSet %s does not exist." % options['response_set'])
+            rows = export.response_set_rows(response_set, layout, chunk_size)
+        else:
+            try:
+                exam = Exam.objects.get(pk=options['exam'])
+            except Exam.DoesNotExist:
+                raise CommandError("Exam %s does not exist." % options['exam'])
+            rows = export.exam_rows(exam, layout, chunk_size)
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for line in export.csv_lines(rows):
+                    output.write(line)
+        else:
+            for line in export.csv_lines(rows):
+                self.stdout.write(line, ending='')
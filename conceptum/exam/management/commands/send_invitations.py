@@ -0,0 +1,48 @@
+import logging
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from exam.mailer import send_queued_invitations, BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class Command(NoArgsCommand):
+    help = ("Sends queued exam invitations. Without --daemon, sends everything that "
+            "is due and exits.")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--daemon', action='store_true', dest='daemon', default=False,
+            help='Keep running, checking the queue every --interval seconds.'),
+        make_option('--batch-size', action='store', type='int', dest='batch_size',
+            default=BATCH_SIZE,
+            help='Number of invitations to send over one connection. '
+                 'Defaults to %d.' % BATCH_SIZE),
+        make_option('--interval', action='store', type='float', dest='interval',
+            default=10.0,
+            help='Seconds to wait when the queue is empty (with --daemon). '
+                 'Defaults to 10.'),
+    )
+
+    def handle_noargs(self, **options):
+        batch_size = options['batch_size']
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            try:
+                sent, failed = send_queued_invitations(batch_size)
+            except Exception:
+                # e.g. the database went away; the invitations are still queued
+                if not options['daemon']:
+                    raise
+                logger.exception("Could not send queued invitations")
+                time.sleep(options['interval'])
+                continue
+            if verbosity >= 1 and (sent or failed):
+                self.stdout.write("Sent %d invitation(s), %d failed." % (sent, failed))
+            if sent + failed < batch_size:
+                # the queue is drained (for now)
+                if not options['daemon']:
+                    break
+                time.sleep(options['interval'])
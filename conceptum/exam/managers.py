@@ -1,11 +1,14 @@
 import hashlib
 import random
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 #from .models import FreeResponseResponse, MultipleChoiceResponse
 
+EXPIRED_BATCH_SIZE = 500
+
 
 class FreeResponseManager(models.Manager):
     use_for_related_fields = True
@@ -42,4 +45,36 @@ class ExamResponseManager(models.Manager):
     
     def create(self, **kwargs):
         key = random_token(['extra_string'])
-        return super(ExamResponseManager,self).create(key=key, **kwargs)
\ No newline at end of file
+        return super(ExamResponseManager,self).create(key=key, **kwargs)
+    
+    def expired(self, now=None):
+        """
+        ExamResponses that expired before `now` (defaults to the current time) without
+        being submitted.
+        """
+        if now is None:
+            now = timezone.now()
+        return self.filter(submitted__isnull=True, expiration_datetime__lt=now)
+    
+    def delete_expired(self, batch_size=EXPIRED_BATCH_SIZE, now=None):
+        """
+        Deletes the expired, unsubmitted ExamResponses (see expired()) with their
+        QuestionResponses and invitations, and returns how many were deleted.
+        
+        Responses are deleted batch_size at a time, each batch with queryset deletes in
+        a transaction of its own that locks the batch's rows first, so that a response
+        cannot be submitted or resent while it is being deleted, and locks are held only
+        briefly.
+        """
+        if now is None:
+            now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(self.expired(now).select_for_update()
+                                .values_list('pk', flat=True)[:batch_size])
+                if keys:
+                    self.filter(pk__in=keys).delete()
+            deleted += len(keys)
+            if len(keys) < batch_size:
+                return deleted
\ No newline at end of file
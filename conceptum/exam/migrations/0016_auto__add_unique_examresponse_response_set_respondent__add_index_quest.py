@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Removing duplicate ExamResponses, which the unique constraint would reject
+        if not db.dry_run:
+            self.delete_duplicate_responses(orm)
+
+        # Adding unique constraint on 'ExamResponse', fields ['response_set', 'respondent']
+        db.create_unique(u'exam_examresponse', ['response_set_id', 'respondent'])
+
+        # Adding index on 'Question', fields ['exam', 'is_multiple_choice', 'content_type', 'object_id']
+        db.create_index(u'exam_question', ['exam_id', 'is_multiple_choice', 'content_type_id', 'object_id'])
+
+        # Adding index on 'Exam', fields ['kind', 'stage']
+        db.create_index(u'exam_exam', ['kind', 'stage'])
+
+
+    def delete_duplicate_responses(self, orm):
+        """
+        Keeps one ExamResponse per respondent in each ResponseSet: the latest
+        submitted one, or else the latest sent one. The other responses are deleted
+        with their question responses and invitations. Run `backfill_scores`
+        afterwards if a submitted response was deleted.
+        """
+        duplicates = (orm.ExamResponse.objects.order_by()
+                                              .values('response_set', 'respondent')
+                                              .annotate(count=models.Count('key'))
+                                              .filter(count__gt=1))
+        for duplicate in duplicates:
+            responses = orm.ExamResponse.objects.filter(response_set=duplicate['response_set'],
+                                                        respondent=duplicate['respondent'])
+            keep = max(responses, key=lambda response: (response.submitted is not None,
+                                                        response.submitted,
+                                                        response.sent is not None,
+                                                        response.sent,
+                                                        response.expiration_datetime))
+            responses.exclude(pk=keep.pk).delete()
+
+    def backwards(self, orm):
+        # Removing index on 'Exam', fields ['kind', 'stage']
+        db.delete_index(u'exam_exam', ['kind', 'stage'])
+
+        # Removing index on 'Question', fields ['exam', 'is_multiple_choice', 'content_type', 'object_id']
+        db.delete_index(u'exam_question', ['exam_id', 'is_multiple_choice', 'content_type_id', 'object_id'])
+
+        # Removing unique constraint on 'ExamResponse', fields ['response_set', 'respondent']
+        db.delete_unique(u'exam_examresponse', ['response_set_id', 'respondent'])
+
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'authtools.user': {
+            'Meta': {'ordering': "[u'name', u'email']", 'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'unique': 'True', 'max_length': '255', 'db_index': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'exam.exam': {
+            'Meta': {'object_name': 'Exam', 'index_together': "[['kind', 'stage']]"},
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '500'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'kind': ('django.db.models.fields.IntegerField', [], {'default': '1'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'randomize': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'stage': ('django.db.models.fields.IntegerField', [], {'default': '1'})
+        },
+        u'exam.examinvitation': {
+            'Meta': {'ordering': "['created']", 'object_name': 'ExamInvitation'},
+            'attempts': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'exam_response': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'invitation'", 'unique': 'True', 'to': u"orm['exam.ExamResponse']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'last_error': ('django.db.models.fields.TextField', [], {'default': "''", 'blank': 'True'}),
+            'next_attempt': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'status': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'test_url': ('django.db.models.fields.CharField', [], {'max_length': '200'})
+        },
+        u'exam.examresponse': {
+            'Meta': {'unique_together': "[['response_set', 'respondent']]", 'object_name': 'ExamResponse', 'index_together': "[['submitted', 'expiration_datetime']]"},
+            'expiration_datetime': ('django.db.models.fields.DateTimeField', [], {}),
+            'key': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '64', 'primary_key': 'True'}),
+            'respondent': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '100'}),
+            'response_set': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.ResponseSet']"}),
+            'score': ('django.db.models.fields.IntegerField', [], {'default': 'None', 'null': 'True', 'blank': 'True'}),
+            'sent': ('django.db.models.fields.DateTimeField', [], {'null': 'True'}),
+            'submitted': ('django.db.models.fields.DateTimeField', [], {'default': 'None', 'null': 'True', 'blank': 'True'})
+        },
+        u'exam.freeresponseresponse': {
+            'Meta': {'object_name': 'FreeResponseResponse'},
+            'exam_response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.ExamResponse']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'question': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.Question']"}),
+            'response': ('django.db.models.fields.CharField', [], {'max_length': '2000', 'blank': 'True'})
+        },
+        u'exam.multiplechoiceoption': {
+            'Meta': {'ordering': "['index']", 'object_name': 'MultipleChoiceOption'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'index': ('django.db.models.fields.IntegerField', [], {}),
+            'is_correct': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'question': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.Question']"}),
+            'rank': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'text': ('django.db.models.fields.CharField', [], {'max_length': '500'})
+        },
+        u'exam.multiplechoiceresponse': {
+            'Meta': {'object_name': 'MultipleChoiceResponse'},
+            'exam_response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.ExamResponse']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'option': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.MultipleChoiceOption']", 'null': 'True'}),
+            'question': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.Question']"})
+        },
+        u'exam.question': {
+            'Meta': {'ordering': "['number']", 'object_name': 'Question', 'index_together': "[['exam', 'is_multiple_choice', 'content_type', 'object_id']]"},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'exam': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.Exam']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'image': ('django.db.models.fields.files.ImageField', [], {'max_length': '100', 'blank': 'True'}),
+            'is_multiple_choice': ('django.db.models.fields.BooleanField', [], {}),
+            'number': ('django.db.models.fields.IntegerField', [], {'null': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'optional': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'question': ('django.db.models.fields.CharField', [], {'max_length': '1000'}),
+            'rank': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'})
+        },
+        u'exam.questionfingerprint': {
+            'Meta': {'ordering': "['-version']", 'object_name': 'QuestionFingerprint'},
+            'fingerprint': ('django.db.models.fields.CharField', [], {'max_length': '40'}),
+            'question_id': ('django.db.models.fields.IntegerField', [], {'db_index': 'True'}),
+            'revision': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'question_fingerprints'", 'to': u"orm['reversion.Revision']"}),
+            'text': ('django.db.models.fields.CharField', [], {'max_length': '1000'}),
+            'version': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'question_fingerprint'", 'unique': 'True', 'primary_key': 'True', 'to': u"orm['reversion.Version']"})
+        },
+        u'exam.responseset': {
+            'Meta': {'ordering': "['-created']", 'object_name': 'ResponseSet'},
+            'course': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'exam': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['exam.Exam']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'instructor': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['profiles.ContributorProfile']"}),
+            'pre_test': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'exam.responsesetstats': {
+            'Meta': {'object_name': 'ResponseSetStats'},
+            'count': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'histogram': ('django.db.models.fields.TextField', [], {'default': "'{}'"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'max_score': ('django.db.models.fields.IntegerField', [], {'default': 'None', 'null': 'True'}),
+            'min_score': ('django.db.models.fields.IntegerField', [], {'default': 'None', 'null': 'True'}),
+            'num_questions': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'response_set': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'stats'", 'unique': 'True', 'to': u"orm['exam.ResponseSet']"}),
+            'total': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'})
+        },
+        u'profiles.contributorprofile': {
+            'Meta': {'object_name': 'ContributorProfile'},
+            'homepage': ('django.db.models.fields.URLField', [], {'default': "''", 'max_length': '200'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'institution': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '200'}),
+            'interest_in_deploy': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'interest_in_devel': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_contrib': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'text_info': ('django.db.models.fields.TextField', [], {'default': "''", 'blank': 'True'}),
+            'user': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'profile'", 'unique': 'True', 'to': u"orm['authtools.User']"})
+        },
+        u'reversion.revision': {
+            'Meta': {'object_name': 'Revision'},
+            'comment': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'date_created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'db_index': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'manager_slug': ('django.db.models.fields.CharField', [], {'default': "u'default'", 'max_length': '191', 'db_index': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['authtools.User']", 'null': 'True', 'on_delete': 'models.SET_NULL', 'blank': 'True'})
+        },
+        u'reversion.version': {
+            'Meta': {'object_name': 'Version'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'format': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.TextField', [], {}),
+            'object_id_int': ('django.db.models.fields.IntegerField', [], {'db_index': 'True', 'null': 'True', 'blank': 'True'}),
+            'object_repr': ('django.db.models.fields.TextField', [], {}),
+            'revision': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['reversion.Revision']"}),
+            'serialized_data': ('django.db.models.fields.TextField', [], {})
+        }
+    }
+
+    complete_apps = ['exam']
\ No newline at end of file
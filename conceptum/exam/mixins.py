@@ -1,7 +1,7 @@
 from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.shortcuts import get_object_or_404
 
-from .models import Exam, ExamKind, ResponseSet, ExamResponse
+from .models import Exam, ExamKind, ExamStage, ResponseSet, ExamResponse
 
 
 class DevelopmentMixin(object):
@@ -69,6 +69,13 @@ class DistributionMixin(object):
             return get_object_or_404(ExamResponse, pk=self.kwargs['key']).response_set.exam
         return ImproperlyConfigured('DistributeMixin was not provided with correct kwargs')
     
+    def stage_allowed(self, exam):
+        """
+        Returns True if the view can be used in the exam's stage.
+        override this to allow other stages
+        """
+        return exam.can_distribute()
+    
     def dispatch(self, request, *args, **kwargs):
         """
         note: calls CurrentAppMixin's set_current_app method
@@ -77,11 +84,20 @@ class DistributionMixin(object):
         self.exam = self.get_exam_for_mixin()
         self.set_current_app(request)
         if (self.exam.kind != self.exam_kind
-            or not self.exam.can_distribute()):
+            or not self.stage_allowed(self.exam)):
                 raise PermissionDenied
         return super(DistributionMixin, self).dispatch(request, *args, **kwargs)
 
 
+class ResultsMixin(DistributionMixin):
+    """
+    Like DistributionMixin, but also accepts exams in the closed stage, whose results
+    can still be read.
+    """
+    def stage_allowed(self, exam):
+        return exam.can_distribute() or exam.stage == ExamStage.CLOSED
+
+
 class CurrentAppMixin(object):
     """
     Gets information from the url namespace in order to determine the current app.
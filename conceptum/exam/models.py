@@ -1,20 +1,31 @@
+from collections import OrderedDict, defaultdict
 from datetime import timedelta
+import hashlib
+import json
 
-from django.db import models, IntegrityError
+from django.db import models, transaction, connection, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType, ContentTypeManager
 from django.contrib.contenttypes import generic
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.utils import timezone
+from django.utils.encoding import force_text
 
 from allauth.account.adapter import get_adapter
 from django_enumfield import enum
 import reversion
+from reversion.models import Revision, Version, post_revision_commit
 
+from conceptum import caching
 from profiles.models import ContributorProfile
-from .managers import FreeResponseManager, MultipleChoiceManager, ExamResponseManager
+from .managers import FreeResponseManager, MultipleChoiceManager, ExamResponseManager, \
+                      random_token
 
 # Constants
 EXAM_NAME_LENGTH = 100
@@ -26,6 +37,12 @@ REQUIRED_CHOICES = 1
 RESPONSE_FREE_LENGTH = 2000
 RESPONDENT_NAME_LENGTH = 100
 COURSE_NAME_LENGTH = 100
+TEST_URL_LENGTH = 200
+MAX_SEND_ATTEMPTS = 5
+SEND_RETRY_DELAY = 60 # seconds
+SEND_LEASE = 10 * 60 # seconds
+EXAM_PAPER_CACHE_TIMEOUT = 60 * 60 * 24 # seconds
+EXAM_PAPER_FRAGMENTS = ('exam_paper', 'exam_consent')
 
 
 """
@@ -114,6 +131,10 @@ class Exam(models.Model):
     kind = enum.EnumField(ExamKind, default=ExamKind.CI)
     stage = enum.EnumField(ExamStage, default=ExamStage.DEV)
     
+    class Meta:
+        # the index pages list exams by kind and stage
+        index_together = [['kind', 'stage']]
+    
     @property
     def freeresponsequestion_set(self):
         return FreeResponseQuestion.objects.filter(exam=self)
@@ -136,6 +157,66 @@ class Exam(models.Model):
     
     def is_CI(self):
         return self.kind == ExamKind.CI
+    
+    def cache_namespace(self):
+        return 'exam:%d' % self.pk
+    
+    def load_paper(self):
+        """
+        Returns the exam's questions, in order, and a dictionary that maps question ids
+        to lists of MultipleChoiceOptions.
+        """
+        questions = list(Question.objects.filter(exam=self))
+        options = {}
+        for option in MultipleChoiceOption.objects.filter(question__exam=self):
+            options.setdefault(option.question_id, []).append(option)
+        return questions, options
+    
+    def get_paper(self):
+        """
+        Same as load_paper(). The questions of a distributed exam cannot change, so
+        in that stage the result is cached (see conceptum.caching).
+        """
+        if not self.can_distribute():
+            return self.load_paper()
+        return caching.get_or_set(self.cache_namespace(), ['paper'], self.load_paper)
+    
+    def clone(self, user=None, **fields):
+        """
+        Returns a new Exam, in the development stage, with copies of this exam's
+        questions and options. `fields` (e.g. name, description) replace the values
+        copied from this exam.
+        
+        Questions and options are inserted in bulk, in one transaction, and the copies
+        are recorded in one revision (by `user`), so each begins with a clean version
+        history of one version. Copied questions refer to the same image files.
+        """
+        values = {'name': self.name, 'description': self.description,
+                  'randomize': self.randomize, 'kind': self.kind}
+        values.update(fields)
+        with transaction.atomic():
+            new_exam = Exam.objects.create(**values)
+            questions = list(Question.objects.filter(exam=self).order_by('pk'))
+            options = list(MultipleChoiceOption.objects.filter(question__exam=self))
+            old_question_ids = [question.pk for question in questions]
+            for question in questions:
+                question.pk = None
+                question.exam = new_exam
+            Question.objects.bulk_create(questions)
+            # bulk_create does not set primary keys; the copies are numbered in the
+            # order they were inserted
+            new_question_ids = dict(zip(old_question_ids,
+                                        Question.objects.filter(exam=new_exam).order_by('pk')
+                                                        .values_list('pk', flat=True)))
+            for option in options:
+                option.pk = None
+                option.question_id = new_question_ids[option.question_id]
+            MultipleChoiceOption.objects.bulk_create(options)
+            save_bulk_revision(
+                list(Question.objects.filter(exam=new_exam))
+                + list(MultipleChoiceOption.objects.filter(question__exam=new_exam)),
+                user=user, comment='Copied from %s' % self.name)
+        return new_exam
 
 def question_imageupload_to(question, filename):
     """
@@ -150,6 +231,93 @@ def question_imageupload_to(question, filename):
     return 'exams/%d/%s' % (question.exam.pk, filename)
 
 
+def version_fingerprint(question_data, option_data):
+    """
+    Returns a hash of a question version's content, for finding duplicate versions.
+
+    Args:
+        question_data: The serialized data of the question's version.
+        option_data: The serialized data of the multiple choice option versions in
+            the same revision. Their order does not matter.
+    """
+    sha = hashlib.sha1(question_data.encode('utf-8'))
+    for data in sorted(option_data):
+        # the length prefix keeps payloads from running into each other
+        sha.update('\0%d:' % len(data))
+        sha.update(data.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def percent(part, whole):
+    """
+    Returns part/whole as a percentage truncated to 2 decimals (0 if whole is 0).
+    """
+    if not whole:
+        return 0
+    return part / float(whole) * 10000 // 1 / 100
+
+
+def option_data_by_question(revisions):
+    """
+    Returns a dict mapping (revision id, question id) to the serialized data of the
+    multiple choice option versions of that question in that revision, for the
+    revisions `revisions` (ids or a queryset). The versions are read in one query.
+    """
+    option_type = ContentType.objects.get_for_model(MultipleChoiceOption)
+    option_data = defaultdict(list)
+    for option_version in Version.objects.filter(revision__in=revisions,
+                                                 content_type=option_type).order_by():
+        option = option_version.object_version.object
+        option_data[(option_version.revision_id, option.question_id)].append(
+            option_version.serialized_data)
+    return option_data
+
+
+def update_by_pk(model, field_name, values, chunk_size=300):
+    """
+    Sets the field `field_name` of the `model` rows given by the dictionary
+    {primary key: value} `values`, with one UPDATE (a CASE on the primary key) per
+    `chunk_size` rows, which keeps the query under database parameter limits.
+    """
+    qn = connection.ops.quote_name
+    meta = model._meta
+    field = meta.get_field(field_name)
+    pks = list(values)
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        params = []
+        for pk in chunk:
+            params.extend([pk, field.get_db_prep_save(values[pk], connection)])
+        params.extend(chunk)
+        connection.cursor().execute(
+            'UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)' % (
+                qn(meta.db_table), qn(field.column), qn(meta.pk.column),
+                ' '.join(['WHEN %s THEN %s'] * len(chunk)),
+                qn(meta.pk.column), ', '.join(['%s'] * len(chunk))),
+            params)
+
+
+def save_bulk_revision(objects, user=None, comment=""):
+    """
+    Records one revision of `objects`, instances of models registered with reversion,
+    like reversion's save_revision() but with the versions inserted in one query.
+    post_revision_commit is sent as usual.
+    """
+    revision = Revision.objects.create(user=user, comment=comment)
+    Version.objects.bulk_create([
+        Version(revision=revision, **reversion.get_adapter(obj.__class__).get_version_data(obj))
+        for obj in objects])
+    # read back for their primary keys
+    versions = dict(((version.content_type_id, version.object_id), version)
+                    for version in revision.version_set.all())
+    post_revision_commit.send(reversion.default_revision_manager,
+        instances=objects,
+        revision=revision,
+        versions=[versions[(ContentType.objects.get_for_model(obj).pk, force_text(obj.pk))]
+                  for obj in objects])
+    return revision
+
+
 class Question(models.Model):
     """
     Base class that represents one question within an exam.
@@ -170,6 +338,8 @@ class Question(models.Model):
     
     class Meta:
         ordering = ['number']
+        # questions are looked up by exam, kind of question and concept
+        index_together = [['exam', 'is_multiple_choice', 'content_type', 'object_id']]
 
     
     def __unicode__(self):
@@ -192,49 +362,44 @@ class Question(models.Model):
         and removes duplicates, but only when they are adjacent in the list. Also, it only
         looks at the object's own fields without following the reverse relations.
             
-        get_unique_versions calls reversion.get_unique_for_object(self), and filters the
-        list to remove duplicates (keeping the most recent version) from any position
-        in the list. It checks the question's serialized data and also its related
-        multiple choice options' serialized data.
+        get_unique_versions removes duplicates (keeping the most recent version) from any
+        position in the list. Two versions are duplicates when the question's serialized
+        data and the serialized data of its own multiple choice options saved in the same
+        revision are equal, in any order; see version_fingerprint.
         
         This is neither a subset nor superset of the list returned by get_unique_for_object.
+        It takes two queries, however many versions there are.
         """
         versions = reversion.get_for_object(self)
+        option_data = defaultdict(list)
+        if self.is_multiple_choice:
+            option_data = option_data_by_question(versions.values('revision'))
+        
         unique_versions = []
+        fingerprints = set()
         for v in versions:
-            if not unique_versions:
+            fingerprint = version_fingerprint(v.serialized_data,
+                                              option_data[(v.revision_id, self.pk)])
+            if fingerprint not in fingerprints:
+                fingerprints.add(fingerprint)
                 unique_versions.append(v)
-                continue
-            # check against all versions in the new list
-            for u in unique_versions:
-                #check question
-                if u.serialized_data != v.serialized_data:
-                    continue
-                
-                if self.is_multiple_choice:
-                    # check number of options
-                    option_type = ContentType.objects.get_for_model(MultipleChoiceOption)
-                    v_options = v.revision.version_set.filter(content_type__pk=option_type.id)
-                    u_options = u.revision.version_set.filter(content_type__pk=option_type.id)
-                    if len(v_options) != len(u_options):
-                        continue
-                    
-                    # check if options are the same
-                    u_options = list(u_options)
-                    for v_option in v_options:
-                        for u_option in u_options:
-                            if u_option.serialized_data == v_option.serialized_data:
-                                u_options.remove(u_option)
-                                break       
-                    if u_options: #list not empty, so there was something that didn't match
-                        continue
-                #if we get here, then v == u, do not append v
-                break
-            
-            else: #we did not break, v != u for all u
-                unique_versions.append(v)    
         return unique_versions
     
+    def get_unique_fingerprints(self):
+        """
+        Returns the QuestionFingerprints of the question's distinct versions, most
+        recent first, keeping the most recent version of each. The fingerprints are
+        the hashes get_unique_versions() compares, so both find the same versions;
+        this reads them in one query instead of loading every version.
+        """
+        unique_fingerprints = []
+        seen = set()
+        for fingerprint in QuestionFingerprint.objects.filter(question_id=self.pk):
+            if fingerprint.fingerprint not in seen:
+                seen.add(fingerprint.fingerprint)
+                unique_fingerprints.append(fingerprint)
+        return unique_fingerprints
+    
     def save(self, *args, **kwargs):
         """
         Questions should not be editable unless exam.can_develop()
@@ -336,6 +501,70 @@ class MultipleChoiceOption(models.Model):
         
 #reversion.register(MultipleChoiceQuestion, follow=["multiplechoiceoption_set"])
 reversion.register(MultipleChoiceOption)
+
+
+class QuestionFingerprint(models.Model):
+    """
+    The content hash of a reversion Version of a Question (see version_fingerprint),
+    so that the distinct versions of a question are found without loading and
+    comparing all of its versions (see Question.get_unique_fingerprints).
+    
+    Rows are added by record_question_fingerprints when a revision is saved. Versions
+    saved before this table existed are fingerprinted by migration 0017, or later by
+    the `backfill_fingerprints` management command.
+    
+    Fields:
+        version: The Version of the question.
+        
+        revision: The Version's revision, which also holds the versions of the
+            question's multiple choice options.
+        
+        question_id: The id of the question (Version.object_id is text).
+        
+        text: The question text in this version.
+        
+        fingerprint: Hash of the question's and its options' serialized data.
+    """
+    version = models.OneToOneField(Version, primary_key=True,
+                                   related_name='question_fingerprint')
+    revision = models.ForeignKey(Revision, related_name='question_fingerprints')
+    question_id = models.IntegerField(db_index=True)
+    text = models.CharField(max_length=QUESTION_LENGTH)
+    fingerprint = models.CharField(max_length=40)
+    
+    class Meta:
+        ordering = ['-version']
+    
+    def __unicode__(self):
+        return self.fingerprint
+    
+    @staticmethod
+    def for_version(version, question, option_data):
+        """
+        Returns an unsaved QuestionFingerprint of `version`, the Version of `question`
+        (in that version), given the serialized data of its options in the revision.
+        """
+        return QuestionFingerprint(version_id=version.pk, revision_id=version.revision_id,
+                                   question_id=question.pk, text=question.question,
+                                   fingerprint=version_fingerprint(version.serialized_data,
+                                                                   option_data))
+    
+    @staticmethod
+    def backfill(versions):
+        """
+        Saves the fingerprints of the question Versions `versions`. Their options'
+        versions are read in one query.
+        """
+        versions = list(versions)
+        option_data = option_data_by_question(set(version.revision_id
+                                                  for version in versions))
+        fingerprints = []
+        for version in versions:
+            question = version.object_version.object
+            fingerprints.append(QuestionFingerprint.for_version(
+                version, question, option_data[(version.revision_id, question.pk)]))
+        QuestionFingerprint.objects.bulk_create(fingerprints)
+        return fingerprints
     
 
 class ResponseSet(models.Model):
@@ -361,12 +590,77 @@ class ResponseSet(models.Model):
     exam = models.ForeignKey(Exam)
     # modules = models.ManyToManyField(...
     
+    # possible outcomes for each email passed to distribute()
+    created_response = 'created'
+    duplicate_response = 'duplicate'
+    resent_response = 'resent'
+    
     class Meta:
         ordering = ['-created']
     
     def __unicode__(self):
         return "{0} ({1})".format(self.course, self.created.date())
     
+    def distribute(self, emails, expiration_datetime, resend=()):
+        """
+        Creates an ExamResponse, and a *QuestionResponse for every question in the exam,
+        for each email address in `emails`. ExamResponses listed in `resend` are deleted
+        and their respondents get a new ExamResponse (with a new key).
+        
+        An email that already has an ExamResponse in this set (or that appears twice)
+        is skipped. Existing respondents are fetched with one query, keys are generated
+        in memory, and all rows are written with bulk_create in a single transaction, so
+        the number of queries does not depend on the number of emails or questions.
+        The database also keeps respondents unique per ResponseSet, so two concurrent
+        distributions to the same email raise an IntegrityError instead of both
+        creating a response.
+        
+        Returns a tuple (exam_responses, summary):
+            exam_responses - list of the new ExamResponses, which still need to be sent
+            summary - an OrderedDict mapping each email to created_response,
+                duplicate_response, or resent_response
+        
+        TODO: apply filter by modules
+        """
+        summary = OrderedDict()
+        exam_responses = []
+        with transaction.atomic():
+            resend = list(resend)
+            resent_emails = set(response.respondent for response in resend)
+            if resend:
+                ExamResponse.objects.filter(pk__in=[r.pk for r in resend]).delete()
+            
+            existing = set(self.examresponse_set.values_list('respondent', flat=True))
+            for email in list(emails) + [response.respondent for response in resend]:
+                if email in summary:
+                    continue
+                if email in existing:
+                    summary[email] = self.duplicate_response
+                    continue
+                exam_responses.append(ExamResponse(key=random_token(['extra_string']),
+                                                   response_set=self,
+                                                   respondent=email,
+                                                   expiration_datetime=expiration_datetime))
+                if email in resent_emails:
+                    summary[email] = self.resent_response
+                else:
+                    summary[email] = self.created_response
+            if not exam_responses:
+                return exam_responses, summary
+            ExamResponse.objects.bulk_create(exam_responses)
+            
+            # TODO: instead of all(), filter by module
+            questions = list(self.exam.question_set.values_list('pk', 'is_multiple_choice'))
+            free_response = [pk for pk, is_mc in questions if not is_mc]
+            multiple_choice = [pk for pk, is_mc in questions if is_mc]
+            FreeResponseResponse.objects.bulk_create(
+                [FreeResponseResponse(question_id=question_id, exam_response=exam_response)
+                 for exam_response in exam_responses for question_id in free_response])
+            MultipleChoiceResponse.objects.bulk_create(
+                [MultipleChoiceResponse(question_id=question_id, exam_response=exam_response)
+                 for exam_response in exam_responses for question_id in multiple_choice])
+        return exam_responses, summary
+    
     
 class ExamResponse(models.Model):
     """
@@ -384,12 +678,15 @@ class ExamResponse(models.Model):
         
         expiration_datetime: If the ER has expired, it should not be available for a
             student to access.  Expired, unsubmitted responses can be deleted by a staff
-            user.
+            user, or by the `cleanup_responses` management command.
         
         sent: This field is set in the send() method.
         
         submitted: Date submitted.  Defaults to None, which means that this ER has not
             been submitted yet.  If submitted is not None, it should not be available.
+        
+        score: Number of multiple choice questions answered correctly. Set by grade()
+            when the ER is submitted; None until then (and for surveys).
     
     To get a queryset of QuestionResponses associated with an ExamResponse, use
     self.freeresponseresponse_set or multiplechoiceresponse_set
@@ -406,10 +703,17 @@ class ExamResponse(models.Model):
     expiration_datetime = models.DateTimeField()
     sent = models.DateTimeField(null=True)
     submitted = models.DateTimeField(null=True, blank=True, default=None)
+    score = models.IntegerField(null=True, blank=True, default=None)
     
     # provides a new create() method that generates a key
     objects = ExamResponseManager()
     
+    class Meta:
+        # an email gets at most one ExamResponse per ResponseSet (see distribute)
+        unique_together = [['response_set', 'respondent']]
+        # finds submitted and expired, unsubmitted responses (see ExamResponseManager)
+        index_together = [['submitted', 'expiration_datetime']]
+    
     def is_available(self):
         """
         An ExamResponse is available if it has not been submitted and it has not
@@ -417,19 +721,32 @@ class ExamResponse(models.Model):
         """
         return (not self.submitted) and self.expiration_datetime >= timezone.now()
     
-    def send(self, request, email, **kwargs):
+    def grade(self):
+        """
+        Counts the correct multiple choice answers (one query), stores the result in
+        self.score and returns it. Does not save.
+        """
+        self.score = self.multiplechoiceresponse_set.filter(option__is_correct=True).count()
+        return self.score
+    
+    def get_test_url(self, request):
+        """
+        Returns the absolute url of this ExamResponse's consent (IRB) page.
         """
-        Generates an email message with a link to the ExamResponse form.  The link
-        is generated using self.key.
+        return request.build_absolute_uri(reverse("take_test_IRB", args=[self.key]))
+    
+    def render_invitation(self, test_url, email=None, current_site=None):
+        """
+        Returns an EmailMessage (not yet sent) with a link to the ExamResponse form.
+        The message is addressed to `email`, or to self.respondent if no email is given.
         
         This function calls get_adapter() from django-allauth and uses allauth's
-        send_mail function.
+        render_mail function.
         """
-        current_site = Site.objects.get_current()
-        test_url = reverse("take_test_IRB", args=[self.key])
-        test_url = request.build_absolute_uri(test_url)
+        if current_site is None:
+            current_site = Site.objects.get_current()
         # The ctx dictionary is a way to create variables to be used in the message
-        # template (no need to get into the send_mail function below.)
+        # template (no need to get into the render_mail function below.)
         ctx = {
             "test_url": test_url,
             "current_site": current_site,
@@ -438,10 +755,20 @@ class ExamResponse(models.Model):
         }
         # email_template is a prefix, '_message.txt' or '_subject.txt' will be added
         email_template = 'exam/email_test'
-        # get_adapter and send_mail depend on django-allauth
-        get_adapter().send_mail(email_template,
-                                email,
-                                ctx)
+        # get_adapter and render_mail depend on django-allauth
+        return get_adapter().render_mail(email_template,
+                                         email or self.respondent,
+                                         ctx)
+    
+    def send(self, request, email, **kwargs):
+        """
+        Generates an email message with a link to the ExamResponse form and sends it
+        immediately.  The link is generated using self.key.
+        
+        Sending happens synchronously, inside the request. To send many invitations,
+        use ExamInvitation.queue() instead.
+        """
+        self.render_invitation(self.get_test_url(request), email).send()
         self.sent = timezone.now()
         self.save()
 
@@ -450,6 +777,242 @@ class ExamResponse(models.Model):
         return self.key[-8:]
 
 
+class InvitationStatus(enum.Enum):
+    """
+    an Enum-class (see django-enumfield) with 4 values:
+        QUEUED  - The invitation is waiting to be sent (or to be retried).
+        SENT    - The invitation was delivered to the mail server.
+        FAILED  - Delivery failed MAX_SEND_ATTEMPTS times; the invitation will not be
+                    retried.
+        SENDING - A worker has claimed the invitation and is sending it.
+    """
+    QUEUED = 0
+    SENT = 1
+    FAILED = 2
+    SENDING = 3
+    
+    labels = {
+        QUEUED: 'Queued',
+        SENT: 'Sent',
+        FAILED: 'Failed',
+        SENDING: 'Sending',
+    }
+
+
+class ExamInvitation(models.Model):
+    """
+    An outbox entry for the email that invites a student to take an ExamResponse.
+    
+    Distributing an exam only queues invitations (see queue()). The actual emails are
+    sent by exam.mailer.send_queued_invitations(), which is run by the
+    `send_invitations` management command. ExamResponse.sent is set once an
+    invitation has been delivered.
+    
+    Fields:
+        exam_response: The ExamResponse this invitation links to. If the ExamResponse
+            is deleted (e.g. because it is re-sent), the invitation goes with it.
+        
+        test_url: The absolute url of the exam. It is built when the invitation is
+            queued, because the worker has no request to build it from.
+        
+        attempts: Number of failed delivery attempts so far. Only attempts at sending
+            this invitation count, not batches that could not reach the mail server.
+        
+        next_attempt: The invitation will not be sent before this time. After every
+            failed attempt it is pushed back by SEND_RETRY_DELAY seconds, doubled for
+            each previous attempt. While the invitation is SENDING, this is the end of
+            the worker's claim: if the worker dies, another one takes the invitation
+            over after SEND_LEASE seconds.
+    """
+    exam_response = models.OneToOneField(ExamResponse, related_name='invitation')
+    test_url = models.CharField(max_length=TEST_URL_LENGTH)
+    status = enum.EnumField(InvitationStatus, default=InvitationStatus.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created']
+    
+    def __unicode__(self):
+        return "Invitation for {0}".format(self.exam_response)
+    
+    @staticmethod
+    def queue(exam_responses, request):
+        """
+        Creates a queued invitation for each ExamResponse in `exam_responses`, using
+        a single query. Returns the list of new invitations.
+        """
+        invitations = [ExamInvitation(exam_response=exam_response,
+                                      test_url=exam_response.get_test_url(request))
+                       for exam_response in exam_responses]
+        ExamInvitation.objects.bulk_create(invitations)
+        return invitations
+    
+    def claim(self):
+        """
+        Claims this invitation for the calling worker, by marking it SENDING for
+        SEND_LEASE seconds. The status and next_attempt read by the worker are part
+        of the UPDATE's condition, so only one worker can claim an invitation.
+        Returns True if the claim succeeded.
+        """
+        lease = timezone.now() + timedelta(seconds=SEND_LEASE)
+        claimed = ExamInvitation.objects.filter(pk=self.pk, status=self.status,
+                                                next_attempt=self.next_attempt)\
+                                        .update(status=InvitationStatus.SENDING,
+                                                next_attempt=lease)
+        if claimed:
+            self.status = InvitationStatus.SENDING
+            self.next_attempt = lease
+        return bool(claimed)
+    
+    def mark_sent(self):
+        """
+        Records a successful delivery, and sets the ExamResponse's `sent` field.
+        """
+        self.status = InvitationStatus.SENT
+        self.last_error = ''
+        ExamInvitation.objects.filter(pk=self.pk).update(status=self.status,
+                                                         last_error=self.last_error)
+        ExamResponse.objects.filter(pk=self.exam_response_id).update(sent=timezone.now())
+    
+    @staticmethod
+    def postpone(invitations, error):
+        """
+        Queues the claimed `invitations` again after SEND_RETRY_DELAY seconds, without
+        counting an attempt: used when none of them was tried, because the mail server
+        could not be reached. Uses a single query.
+        """
+        next_attempt = timezone.now() + timedelta(seconds=SEND_RETRY_DELAY)
+        ExamInvitation.objects.filter(pk__in=[invitation.pk for invitation in invitations])\
+                              .update(status=InvitationStatus.QUEUED,
+                                      next_attempt=next_attempt, last_error=unicode(error))
+        for invitation in invitations:
+            invitation.status = InvitationStatus.QUEUED
+            invitation.next_attempt = next_attempt
+            invitation.last_error = unicode(error)
+    
+    def retry_later(self, error):
+        """
+        Records a failed delivery attempt. The invitation is queued again with an
+        exponential backoff, or marked FAILED after MAX_SEND_ATTEMPTS attempts.
+        """
+        self.attempts += 1
+        self.last_error = unicode(error)
+        if self.attempts >= MAX_SEND_ATTEMPTS:
+            self.status = InvitationStatus.FAILED
+        else:
+            self.status = InvitationStatus.QUEUED
+            delay = SEND_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt = timezone.now() + timedelta(seconds=delay)
+        self.save()
+
+
+class ResponseSetStats(models.Model):
+    """
+    Score aggregates for the submitted ExamResponses of a ResponseSet, so that the
+    results page reads one row instead of grading every response.
+    
+    The row is updated by add_score() whenever an ExamResponse is submitted, and can
+    be rebuilt from the stored scores with rebuild() (see the `backfill_scores`
+    management command).
+    
+    Fields:
+        num_questions: Number of multiple choice questions in the exam.
+        
+        count: Number of scored (submitted) ExamResponses.
+        
+        total: Sum of their scores.
+        
+        min_score, max_score: Lowest and highest score, None while count is 0.
+        
+        histogram: JSON object mapping each score to the number of ExamResponses with
+            that score. Use get_histogram() to read it.
+    """
+    response_set = models.OneToOneField(ResponseSet, related_name='stats')
+    num_questions = models.PositiveIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    min_score = models.IntegerField(null=True, default=None)
+    max_score = models.IntegerField(null=True, default=None)
+    histogram = models.TextField(default='{}')
+    
+    class Meta:
+        verbose_name_plural = 'response set stats'
+    
+    def __unicode__(self):
+        return "Stats for {0}".format(self.response_set)
+    
+    @staticmethod
+    def add_score(response_set, score):
+        """
+        Adds one submitted score to the stats of `response_set`. The row is locked
+        while it is updated, so concurrent submissions are not lost.
+        """
+        with transaction.atomic():
+            stats, created = ResponseSetStats.objects.select_for_update()\
+                                                     .get_or_create(response_set=response_set)
+            if created:
+                stats.num_questions = response_set.exam.question_set\
+                                                  .filter(is_multiple_choice=True).count()
+            histogram = stats.get_histogram()
+            histogram[score] = histogram.get(score, 0) + 1
+            stats.histogram = json.dumps(histogram)
+            stats.count += 1
+            stats.total += score
+            if stats.min_score is None or score < stats.min_score:
+                stats.min_score = score
+            if stats.max_score is None or score > stats.max_score:
+                stats.max_score = score
+            stats.save()
+        return stats
+    
+    @staticmethod
+    def rebuild(response_set):
+        """
+        Recomputes the stats of `response_set` from the scores stored on its
+        ExamResponses, using a constant number of queries.
+        """
+        scores = response_set.examresponse_set.filter(score__isnull=False)
+        with transaction.atomic():
+            stats, created = ResponseSetStats.objects.select_for_update()\
+                                                     .get_or_create(response_set=response_set)
+            stats.num_questions = response_set.exam.question_set\
+                                              .filter(is_multiple_choice=True).count()
+            aggregates = scores.aggregate(count=models.Count('pk'),
+                                          total=models.Sum('score'),
+                                          min_score=models.Min('score'),
+                                          max_score=models.Max('score'))
+            stats.count = aggregates['count']
+            stats.total = aggregates['total'] or 0
+            stats.min_score = aggregates['min_score']
+            stats.max_score = aggregates['max_score']
+            histogram = scores.order_by().values_list('score').annotate(models.Count('pk'))
+            stats.histogram = json.dumps(dict(histogram))
+            stats.save()
+        return stats
+    
+    def get_histogram(self):
+        """
+        Returns the histogram as a dictionary {score: number of ExamResponses}.
+        """
+        return dict((int(score), n) for score, n in json.loads(self.histogram).items())
+    
+    def as_list(self):
+        """
+        Returns [numQuestions, numCorrect, averageScore, maxScore, lowScore], where the
+        scores are percentages. This is the format used by response_set_detail.html.
+        """
+        if not self.count:
+            return [0, 0, 0, 0, 0]
+        return [self.num_questions,
+                self.total,
+                percent(self.total / float(self.count), self.num_questions),
+                percent(self.max_score, self.num_questions),
+                percent(self.min_score, self.num_questions)]
+
+
 class QuestionResponse(models.Model):
     """
     Base class for *Response models.  Subclasses should define a
@@ -480,3 +1043,80 @@ class MultipleChoiceResponse(QuestionResponse):
     """
     question = models.ForeignKey(MultipleChoiceQuestion)
     option = models.ForeignKey(MultipleChoiceOption, null=True)
+
+
+def exam_paper_cache_keys(exam_id):
+    """
+    Returns the cache keys of the template fragments that take_test.html and
+    take_test_IRB.html cache for the Exam `exam_id`, in each of its stages.
+    """
+    return [make_template_fragment_key(fragment, [exam_id, stage])
+            for fragment in EXAM_PAPER_FRAGMENTS
+            for stage, label in ExamStage.choices()]
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def invalidate_exam_paper(sender, instance, **kwargs):
+    """
+    The rendered questions of an Exam are cached once it is distributed (questions
+    cannot change in that stage). Any change to the Exam, in particular a change of
+    stage, drops them.
+    """
+    cache.delete_many(exam_paper_cache_keys(instance.pk))
+
+
+def purge_question_history(questions):
+    """
+    Deletes the reversion history of the Questions in the queryset `questions`, so
+    that it does not show up for new questions that reuse their ids. Call it before
+    deleting the questions, while their options can still be found.
+    
+    Revisions holding no other questions are deleted whole. From revisions shared with
+    other questions (e.g. the one that records an exam copy), only the versions of these
+    questions and of their options are deleted. Everything is selected with subqueries,
+    so the number of queries does not depend on the number of revisions.
+    """
+    question_type = ContentType.objects.get_for_model(Question)
+    option_type = ContentType.objects.get_for_model(MultipleChoiceOption)
+    question_ids = questions.values('pk')
+    question_versions = Version.objects.filter(content_type=question_type,
+                                               object_id_int__in=question_ids)
+    shared_revisions = Version.objects.filter(
+        revision__in=question_versions.values('revision'),
+        content_type=question_type).exclude(object_id_int__in=question_ids)
+    Revision.objects.filter(pk__in=question_versions.values('revision')) \
+                    .exclude(pk__in=shared_revisions.values('revision')).delete()
+    Version.objects.filter(
+        revision__in=question_versions.values('revision'), content_type=option_type,
+        object_id_int__in=MultipleChoiceOption.objects.filter(question__in=question_ids)
+                                                      .values('pk')).delete()
+    question_versions.delete()
+
+
+@receiver(post_revision_commit)
+def record_question_fingerprints(sender, instances, revision, versions, **kwargs):
+    """
+    Fingerprints the versions of the questions saved in a new revision.
+    """
+    option_data = defaultdict(list)
+    for instance, version in zip(instances, versions):
+        if isinstance(instance, MultipleChoiceOption):
+            option_data[instance.question_id].append(version.serialized_data)
+    QuestionFingerprint.objects.bulk_create([
+        QuestionFingerprint.for_version(version, instance, option_data[instance.pk])
+        for instance, version in zip(instances, versions)
+        if isinstance(instance, Question)])
+
+
+def option_cache_namespace(option):
+    try:
+        return 'exam:%d' % option.question.exam_id
+    except Question.DoesNotExist:
+        # deleted along with its question, which invalidated the exam
+        return None
+
+caching.invalidate_on(Exam.cache_namespace, Exam)
+caching.invalidate_on(lambda question: 'exam:%d' % question.exam_id,
+                      Question, FreeResponseQuestion, MultipleChoiceQuestion)
+caching.invalidate_on(option_cache_namespace, MultipleChoiceOption)
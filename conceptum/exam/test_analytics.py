@@ -0,0 +1,110 @@
+import math
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+import numpy as np
+
+from profiles.tests import set_up_user
+from .analytics import ItemAnalysis, analyze_exam, analyze_response_set
+from .models import ExamKind, MultipleChoiceQuestion, MultipleChoiceOption, ResponseSet
+from .test_models import create_exam_with_questions, submit_responses
+
+
+class ItemAnalysisTest(SimpleTestCase):
+    def setUp(self):
+        # 5 students x 3 items
+        self.correct = [[1, 1, 1],
+                        [1, 1, 0],
+                        [1, 0, 0],
+                        [0, 1, 0],
+                        [1, 0, 0]]
+        self.analysis = ItemAnalysis([10, 20, 30], self.correct,
+                                     [[1, 4, 7],
+                                      [1, 4, 8],
+                                      [1, 5, 9],
+                                      [2, 4, 0],
+                                      [1, 6, 0]])
+
+    def test_difficulty(self):
+        np.testing.assert_allclose(self.analysis.difficulty(), [0.8, 0.6, 0.2])
+
+    def test_discrimination(self):
+        # compare with a plain correlation of each item against the rest score
+        correct = np.array(self.correct, dtype=float)
+        discrimination = self.analysis.discrimination()
+        for j in range(3):
+            rest = correct.sum(axis=1) - correct[:, j]
+            expected = np.corrcoef(correct[:, j], rest)[0, 1]
+            self.assertAlmostEqual(discrimination[j], expected)
+        # an item everybody gets right does not discriminate
+        analysis = ItemAnalysis([1, 2], [[1, 1], [1, 0]], [[1, 3], [1, 4]])
+        self.assertTrue(math.isnan(analysis.discrimination()[0]))
+
+    def test_kr20(self):
+        # k/(k-1) * (1 - sum(pq) / var(total)), with population variances
+        p = np.array([0.8, 0.6, 0.2])
+        totals = np.array([3, 2, 1, 1, 1])
+        expected = 1.5 * (1 - (p * (1 - p)).sum() / totals.var())
+        self.assertAlmostEqual(self.analysis.kr20(), expected)
+        self.assertAlmostEqual(self.analysis.alpha(), expected)
+
+    def test_option_rates(self):
+        self.assertEqual(self.analysis.option_rates(),
+                         {1: 0.8, 2: 0.2, 4: 0.6, 5: 0.2, 6: 0.2, 7: 0.2, 8: 0.2, 9: 0.2})
+
+    def test_empty(self):
+        analysis = ItemAnalysis([], np.zeros((0, 0)), np.zeros((0, 0)))
+        self.assertEqual(analysis.num_students, 0)
+        self.assertTrue(math.isnan(analysis.kr20()))
+        self.assertEqual(analysis.option_rates(), {})
+
+
+class AnalyzeExamTest(TestCase):
+    def setUp(self):
+        self.user = set_up_user()
+        self.exam = create_exam_with_questions(2, 0, num_options=2, name='Analyzed Exam',
+                                               kind=ExamKind.CI)
+        self.questions = list(MultipleChoiceQuestion.objects.filter(exam=self.exam))
+        options = MultipleChoiceOption.objects.filter(question__exam=self.exam)\
+                                              .order_by('question__number')
+        self.correct = list(options.filter(index=1))
+        self.wrong = list(options.filter(index=2))
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course',
+                                                       exam=self.exam)
+        submit_responses(self.response_set, [('a@test.com', [True, True]),
+                                             ('b@test.com', [True, False]),
+                                             ('c@test.com', [False, None]),
+                                             ('pending@test.com', None)])
+
+    def test_analyze_exam(self):
+        with CaptureQueriesContext(connection) as queries:
+            analysis = analyze_exam(self.exam)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(analysis.num_students, 3)
+        self.assertEqual(analysis.items.tolist(), [q.pk for q in self.questions])
+        np.testing.assert_allclose(analysis.difficulty(), [2 / 3.0, 1 / 3.0])
+        rates = analysis.option_rates()
+        self.assertAlmostEqual(rates[self.wrong[0].pk], 1 / 3.0)
+        # c@test.com did not answer the second question
+        self.assertAlmostEqual(rates[self.correct[1].pk], 1 / 3.0)
+        self.assertAlmostEqual(rates[self.wrong[1].pk], 1 / 3.0)
+        self.assertEqual(analyze_response_set(self.response_set).num_students, 3)
+
+    def test_dist_detail_view(self):
+        self.user.profile.is_contrib = True
+        self.user.profile.save()
+        self.client.login(email=self.user.email, password='password')
+        response = self.client.get(reverse('CI_exam:distribute_detail', args=[self.exam.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Item Analysis')
+        self.assertEqual(response.context['item_analysis']['num_students'], 3)
+        question, difficulty, discrimination, options = \
+            response.context['item_analysis']['items'][0]
+        self.assertEqual(question, self.questions[0])
+        self.assertAlmostEqual(difficulty, 2 / 3.0)
+        self.assertEqual([option for option, rate in options],
+                         [self.correct[0], self.wrong[0]])
@@ -0,0 +1,165 @@
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from unittest import skipUnless
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from interviews.models import DummyConcept, seed_concepts
+from profiles.tests import set_up_user
+from .models import Exam, ExamKind, ExamStage, Question, ResponseSet, ResponseSetStats
+from .test_models import create_exam_with_questions, submit_responses
+
+# (exams, questions per exam, students per ResponseSet)
+SCALES = [(2, 4, 5), (4, 16, 20), (8, 40, 60)]
+OPTIONS_PER_QUESTION = 4
+
+
+def seed_exams(num_exams, num_questions, num_students, instructor):
+    """
+    Creates `num_exams` CIs with `num_questions` questions each (half of them multiple
+    choice, see create_exam_with_questions()) and a ResponseSet of `num_students`
+    students, half of whom have submitted. The last exam is closed, the others are
+    distributed. The first exam is also copied
+    into a CI in development, which gives its questions a version history.
+
+    Returns (distributed exam, exam in development, ResponseSet).
+    """
+    exams = []
+    for i in range(num_exams):
+        num_multiple_choice = num_questions // 2
+        exam = create_exam_with_questions(num_multiple_choice,
+                                          num_questions - num_multiple_choice,
+                                          num_options=OPTIONS_PER_QUESTION,
+                                          name='Benchmark exam %d' % i,
+                                          description='benchmark', kind=ExamKind.CI)
+        response_set = ResponseSet.objects.create(instructor=instructor, exam=exam,
+                                                  course='Benchmark course')
+        # the submitted half only answered the free response questions
+        submit_responses(response_set, [('student%d@test.com' % j,
+                                          [] if j < num_students // 2 else None)
+                                         for j in range(num_students)])
+        ResponseSetStats.rebuild(response_set)
+        exams.append(exam)
+    dev_exam = exams[0].clone(name='Benchmark copy')
+    exams[-1].stage = ExamStage.CLOSED
+    exams[-1].save()
+    return exams[0], dev_exam, ResponseSet.objects.filter(exam=exams[0]).get()
+
+
+def exam_urls(exam, dev_exam, response_set):
+    """
+    Returns (name, url) for every page of exam/urls.py, using the given objects.
+    """
+    ns = 'CI_exam:'
+    concept = DummyConcept.objects.all()[0]
+    fr_question = Question.objects.filter(exam=dev_exam, is_multiple_choice=False)[0]
+    mc_question = Question.objects.filter(exam=dev_exam, is_multiple_choice=True)[0]
+    submitted = response_set.examresponse_set.filter(submitted__isnull=False)[0]
+    pending = response_set.examresponse_set.filter(submitted__isnull=True)[0]
+    return [
+        ('index', reverse(ns + 'index')),
+        ('create', reverse(ns + 'create')),
+        ('detail', reverse(ns + 'detail', args=[dev_exam.id])),
+        ('edit', reverse(ns + 'edit', args=[dev_exam.id])),
+        ('delete_exam', reverse(ns + 'delete_exam', args=[dev_exam.id])),
+        ('select_concept', reverse(ns + 'select_concept', args=[dev_exam.id])),
+        ('question_create', reverse(ns + 'question_create',
+                                    args=[dev_exam.id, concept.id, 'mc'])),
+        ('fr_edit', reverse(ns + 'fr_edit', args=[fr_question.id])),
+        ('fr_versions', reverse(ns + 'fr_versions', args=[fr_question.id])),
+        ('fr_delete', reverse(ns + 'fr_delete', args=[fr_question.id])),
+        ('mc_edit', reverse(ns + 'mc_edit', args=[mc_question.id])),
+        ('mc_versions', reverse(ns + 'mc_versions', args=[mc_question.id])),
+        ('mc_delete', reverse(ns + 'mc_delete', args=[mc_question.id])),
+        ('finalize', reverse(ns + 'finalize', args=[dev_exam.id])),
+        ('distribute_index', reverse(ns + 'distribute_index')),
+        ('distribute_detail', reverse(ns + 'distribute_detail', args=[exam.id])),
+        ('copy', reverse(ns + 'copy', args=[exam.id])),
+        ('copy_denied', reverse(ns + 'copy_denied', args=[exam.id])),
+        ('close', reverse(ns + 'close', args=[exam.id])),
+        ('response_sets', reverse(ns + 'response_sets', args=[exam.id])),
+        ('distribute_new', reverse(ns + 'distribute_new', args=[exam.id])),
+        ('export_exam', reverse(ns + 'export_exam', args=[exam.id])),
+        ('responses', reverse(ns + 'responses', args=[response_set.id])),
+        ('distribute_send', reverse(ns + 'distribute_send', args=[response_set.id])),
+        ('distribute_delete', reverse(ns + 'distribute_delete', args=[response_set.id])),
+        ('export_responses', reverse(ns + 'export_responses', args=[response_set.id])),
+        ('response_detail', reverse(ns + 'response_detail', args=[submitted.pk])),
+        ('distribute_cleanup', reverse('distribute_cleanup')),
+        ('take_test_IRB', reverse('take_test_IRB', args=[pending.pk])),
+        ('take_test', reverse('take_test', args=[pending.pk])),
+        ('response_complete', reverse('response_complete')),
+        ('exam_unavailable', reverse('exam_unavailable')),
+    ]
+
+
+@skipUnless(os.environ.get('CONCEPTUM_BENCHMARK'),
+            'set CONCEPTUM_BENCHMARK=1 to run the exam view benchmarks')
+class ExamViewBenchmark(TestCase):
+    """
+    Requests every exam page at each of SCALES and records its query count, wall time
+    and the growth of the process's peak memory (ru_maxrss, in kB) while it rendered.
+    The results are written as JSON to $CONCEPTUM_BENCHMARK_OUTPUT (by default
+    exam_benchmark.json in the temporary directory). Fails if the query count of a
+    page grows with the amount of data.
+    """
+    def setUp(self):
+        seed_concepts()
+        self.user = set_up_user()
+        self.user.is_staff = True
+        self.user.save()
+        self.user.profile.is_contrib = True
+        self.user.profile.save()
+        self.client.login(email=self.user.email, password='password')
+
+    def measure(self, url):
+        # the first request fills the caches (content types, sessions, exam papers)
+        self.client.get(url)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        elapsed = time.time() - start
+        num_queries = len(queries)
+        if response.streaming:
+            # an export is only produced while it is read
+            with CaptureQueriesContext(connection) as streaming:
+                for chunk in response.streaming_content:
+                    pass
+            num_queries += len(streaming)
+            elapsed = time.time() - start
+        return {'status': response.status_code,
+                'queries': num_queries,
+                'seconds': round(elapsed, 4),
+                'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak}
+
+    def test_exam_views(self):
+        results = {}
+        for num_exams, num_questions, num_students in SCALES:
+            exam, dev_exam, response_set = seed_exams(num_exams, num_questions,
+                                                      num_students, self.user.profile)
+            for name, url in exam_urls(exam, dev_exam, response_set):
+                result = self.measure(url)
+                result.update(exams=num_exams, questions=num_questions,
+                              students=num_students)
+                results.setdefault(name, []).append(result)
+            # later scales copy their own exam into development
+            Exam.objects.filter(pk=dev_exam.pk).update(stage=ExamStage.CLOSED)
+
+        output = os.environ.get('CONCEPTUM_BENCHMARK_OUTPUT',
+                                os.path.join(tempfile.gettempdir(), 'exam_benchmark.json'))
+        with open(output, 'w') as f:
+            json.dump({'scales': SCALES, 'views': results}, f, indent=2, sort_keys=True)
+        sys.stderr.write('\nexam view benchmark written to %s\n' % output)
+
+        growing = ['%s: %s' % (name, ', '.join(str(r['queries']) for r in runs))
+                   for name, runs in sorted(results.items())
+                   if len(set(r['queries'] for r in runs)) > 1]
+        self.assertFalse(growing, 'query counts grow with the data:\n' + '\n'.join(growing))
@@ -0,0 +1,111 @@
+import csv
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from profiles.tests import set_up_user
+from .export import response_set_rows, exam_rows, csv_lines, LONG_HEADER
+from .models import ExamKind, ExamStage, MultipleChoiceOption, ResponseSet
+from .test_models import create_exam_with_questions, submit_responses
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.user = set_up_user()
+        self.exam = create_exam_with_questions(1, name='Exported Exam', kind=ExamKind.CI)
+        options = MultipleChoiceOption.objects.filter(question__exam=self.exam)
+        options.filter(index=1).update(text="right")
+        options.filter(index=2).update(text=u"wr\xf6ng")
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course',
+                                                       exam=self.exam)
+        exam_responses = submit_responses(self.response_set, [('a@test.com', [True]),
+                                                              ('b@test.com', [False]),
+                                                              ('c@test.com', [False]),
+                                                              ('pending@test.com', None)])
+        self.keys = dict((email, exam_response.key)
+                         for email, exam_response in exam_responses.items())
+
+    def test_wide_rows(self):
+        rows = list(response_set_rows(self.response_set))
+        self.assertEqual(rows[0], ['key', 'respondent', 'submitted', 'score', 'Q1', 'Q2'])
+        self.assertEqual(len(rows), 4) # pending response is not exported
+        by_respondent = dict((row[1], row) for row in rows[1:])
+        self.assertEqual(by_respondent['a@test.com'][3:], [1, 'answer of a@test.com', 1])
+        self.assertEqual(by_respondent['b@test.com'][3:], [0, 'answer of b@test.com', 2])
+        self.assertEqual(by_respondent['c@test.com'][0], self.keys['c@test.com'])
+
+    def test_long_rows(self):
+        rows = list(exam_rows(self.exam, layout='long'))
+        self.assertEqual(rows[0], LONG_HEADER)
+        self.assertEqual(len(rows), 1 + 3 * 2)
+        mc_rows = [row for row in rows[1:] if row[6] == 'MC']
+        self.assertEqual(sorted((row[1], row[7], row[8], row[9]) for row in mc_rows),
+                         [('a@test.com', 'right', 1, True),
+                          ('b@test.com', u'wr\xf6ng', 2, False),
+                          ('c@test.com', u'wr\xf6ng', 2, False)])
+
+    def test_chunks(self):
+        # 3 queries per chunk of ExamResponses, plus the question list and the last,
+        # empty chunk
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(response_set_rows(self.response_set, chunk_size=2))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len(queries), 1 + 2 * 3 + 1)
+        self.assertEqual(sorted(row[1] for row in rows[1:]),
+                         ['a@test.com', 'b@test.com', 'c@test.com'])
+
+    def test_csv_lines(self):
+        lines = list(csv_lines(exam_rows(self.exam, layout='long')))
+        self.assertEqual(len(lines), 7)
+        parsed = list(csv.reader(lines))
+        self.assertIn(u'wr\xf6ng'.encode('utf-8'), [row[7] for row in parsed])
+
+    def test_export_view(self):
+        url = reverse('CI_exam:export_responses', args=[self.response_set.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(email=self.user.email, password='password')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(list(csv.reader(response.streaming_content))), 4)
+
+        response = self.client.get(url, {'layout': 'long'})
+        self.assertEqual(len(list(csv.reader(response.streaming_content))), 7)
+        response = self.client.get(url, {'layout': 'parquet'})
+        self.assertEqual(response.status_code, 404)
+
+        # only staff can export a whole exam (others are redirected, as in DeleteView)
+        url = reverse('CI_exam:export_exam', args=[self.exam.id])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.user.is_staff = False
+        self.user.save()
+
+    def test_export_closed_exam(self):
+        self.exam.stage = ExamStage.CLOSED
+        self.exam.save()
+        self.user.is_staff = True
+        self.user.save()
+        self.client.login(email=self.user.email, password='password')
+        for url in [reverse('CI_exam:export_responses', args=[self.response_set.id]),
+                    reverse('CI_exam:export_exam', args=[self.exam.id])]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(list(csv.reader(response.streaming_content))), 4)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_responses', response_set=self.response_set.id, stdout=out)
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0][:2], ['key', 'respondent'])
+        self.assertEqual(len(rows), 4)
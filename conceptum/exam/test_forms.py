@@ -8,7 +8,7 @@ from django.utils.translation import ugettext_lazy as _
 import reversion
 
 from profiles.tests import set_up_user
-from interviews.models import get_concept_list, DummyConcept as Concept
+from interviews.models import seed_concepts, DummyConcept as Concept
 from .models import Exam, FreeResponseQuestion, MultipleChoiceQuestion, MultipleChoiceOption,\
                     ExamKind, ExamStage, QUESTION_LENGTH, REQUIRED_CHOICES
 from .forms import MultipleChoiceEditForm, FreeResponseVersionForm
@@ -43,7 +43,7 @@ def create_exam():
 
 class DevFormsTest(SimpleTestCase):
     def setUp(self):
-        get_concept_list()
+        seed_concepts()
         self.user = set_up_user()
         self.user.profile.is_contrib = True
         self.user.profile.save()
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from profiles.tests import set_up_user
+from .grading import grade_response_set, grade_exam, question_correct_counts
+from .models import MultipleChoiceQuestion, MultipleChoiceOption, ResponseSet, ExamResponse
+from .test_models import create_exam_with_questions, submit_responses
+
+
+class GradingTest(TestCase):
+    def setUp(self):
+        self.user = set_up_user()
+        self.exam = create_exam_with_questions(3, 0, num_options=2, name='Graded Exam')
+        self.questions = list(MultipleChoiceQuestion.objects.filter(exam=self.exam))
+        options = MultipleChoiceOption.objects.filter(question__exam=self.exam)\
+                                              .order_by('question__number')
+        self.correct = list(options.filter(index=1))
+        self.wrong = list(options.filter(index=2))
+        self.expiration = timezone.now() + timedelta(days=7)
+        self.response_set = self.make_response_set('Course 1')
+
+    def make_response_set(self, course):
+        return ResponseSet.objects.create(instructor=self.user.profile,
+                                          course=course,
+                                          exam=self.exam)
+
+    def submit(self, response_set, email, answers):
+        """
+        Distributes the exam to `email` and submits it, ungraded. `answers` is a list
+        of True (correct), False (wrong) or None (unanswered), one per question.
+        """
+        return submit_responses(response_set, [(email, answers)], self.expiration,
+                                graded=False)[email]
+
+    def test_grade_response_set(self):
+        a = self.submit(self.response_set, 'a@test.com', [True, True, True])
+        b = self.submit(self.response_set, 'b@test.com', [True, False, None])
+        c = self.submit(self.response_set, 'c@test.com', [False, False, False])
+        # not submitted, so not graded
+        self.response_set.distribute(['d@test.com'], self.expiration)
+
+        report = grade_response_set(self.response_set)
+        self.assertEqual(report.scores.items(), [(a.pk, 3), (b.pk, 1), (c.pk, 0)])
+        self.assertEqual(report.respondents[b.pk], 'b@test.com')
+        self.assertEqual(report.questions, [q.pk for q in self.questions])
+        self.assertEqual(report.question_correct, {self.questions[0].pk: 2,
+                                                   self.questions[1].pk: 1,
+                                                   self.questions[2].pk: 1})
+        self.assertEqual(report.question_answered[self.questions[2].pk], 2)
+        self.assertEqual(report.question_percent[self.questions[0].pk], 66.66)
+        self.assertEqual(report.option_counts[self.wrong[1].pk], 2)
+        self.assertEqual(report.option_counts[self.correct[2].pk], 1)
+        self.assertEqual(report.summary(), [3, 4, 44.44, 100.0, 0.0])
+        self.assertEqual(report.response_stats(b.pk), [3, 1, 33.33])
+        with CaptureQueriesContext(connection) as queries:
+            correct = question_correct_counts(self.response_set.examresponse_set.all())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(correct, report.question_correct)
+
+        report.save_scores()
+        self.assertEqual(ExamResponse.objects.get(pk=c.pk).score, 0)
+        self.assertEqual(ExamResponse.objects.get(pk=a.pk).score, 3)
+
+    def test_grade_exam(self):
+        self.submit(self.response_set, 'a@test.com', [True, True, False])
+        self.submit(self.make_response_set('Course 2'), 'a@test.com', [True, False, False])
+        report = grade_exam(self.exam)
+        self.assertEqual(sorted(report.scores.values()), [1, 2])
+        self.assertEqual(report.question_correct[self.questions[0].pk], 2)
+
+    def test_query_count(self):
+        # The number of queries does not grow with the number of students
+        for i in range(2):
+            self.submit(self.response_set, 'few%d@test.com' % i, [True, False, True])
+        with CaptureQueriesContext(connection) as few:
+            grade_response_set(self.response_set)
+        many_set = self.make_response_set('Course 3')
+        for i in range(40):
+            self.submit(many_set, 'many%d@test.com' % i, [True, False, i % 2 == 0])
+        with CaptureQueriesContext(connection) as many:
+            report = grade_response_set(many_set)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(report.num_students, 40)
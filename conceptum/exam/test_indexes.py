@@ -0,0 +1,99 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import SimpleTestCase
+
+from interviews.models import DummyConcept
+from nodemanager.models import ConceptAtom
+from ranking.models import ValueCounter
+from .models import Exam, ExamKind, ExamStage, ExamResponse, Question
+
+# how each database names the index a plan uses
+PLAN_INDEX = {
+    'sqlite': r'USING (?:COVERING )?INDEX (\w+)',
+    'postgresql': r'Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)',
+}
+
+
+def explain(queryset):
+    """
+    Returns the query plan of `queryset` as text.
+    """
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    cursor = connection.cursor()
+    cursor.execute(prefix + sql, params)
+    return '\n'.join(' '.join(unicode(column) for column in row) for row in cursor.fetchall())
+
+
+def index_columns(table):
+    """
+    Returns a dictionary that maps the name of each index of `table` to its columns.
+    """
+    cursor = connection.cursor()
+    indexes = {}
+    if connection.vendor == 'sqlite':
+        cursor.execute('PRAGMA index_list(%s)' % connection.ops.quote_name(table))
+        for row in cursor.fetchall():
+            cursor.execute('PRAGMA index_info(%s)' % connection.ops.quote_name(row[1]))
+            indexes[row[1]] = [info[2] for info in cursor.fetchall()]
+    else:
+        cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s',
+                       [table])
+        for name, definition in cursor.fetchall():
+            columns = definition[definition.rindex('(') + 1:definition.rindex(')')]
+            indexes[name] = [column.strip().strip('"') for column in columns.split(',')]
+    return indexes
+
+
+@skipUnless(connection.vendor in PLAN_INDEX, 'query plans are only read on sqlite and postgresql')
+class IndexUsageTest(SimpleTestCase):
+    """
+    Checks that the hot queries of the exam models are answered from the composite
+    indexes declared in their Meta. On PostgreSQL sequential scans are disabled, since
+    the test tables are too small for the planner to prefer an index by itself.
+    """
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            connection.cursor().execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            connection.cursor().execute('SET enable_seqscan = on')
+
+    def assertUsesIndex(self, queryset, columns):
+        """
+        Asserts that the plan of `queryset` uses an index whose leading columns are
+        `columns`.
+        """
+        plan = explain(queryset)
+        indexes = index_columns(queryset.model._meta.db_table)
+        used = [name for match in re.findall(PLAN_INDEX[connection.vendor], plan)
+                for name in (match if isinstance(match, tuple) else [match]) if name]
+        self.assertTrue(any(indexes.get(name, [])[:len(columns)] == columns for name in used),
+                        "no index on %s in plan:\n%s" % (', '.join(columns), plan))
+
+    def test_question(self):
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        self.assertUsesIndex(Question.objects.filter(exam=1, is_multiple_choice=True,
+                                                     content_type=concept_type, object_id=1),
+                             ['exam_id', 'is_multiple_choice', 'content_type_id', 'object_id'])
+
+    def test_exam(self):
+        self.assertUsesIndex(Exam.objects.filter(kind=ExamKind.CI, stage=ExamStage.DEV),
+                             ['kind', 'stage'])
+
+    def test_exam_response(self):
+        self.assertUsesIndex(ExamResponse.objects.filter(response_set=1, respondent='a@b.com'),
+                             ['response_set_id', 'respondent'])
+        self.assertUsesIndex(ExamResponse.objects.filter(submitted__isnull=True),
+                             ['submitted'])
+        self.assertUsesIndex(ExamResponse.objects.expired(),
+                             ['submitted', 'expiration_datetime'])
+
+    def test_value_counter(self):
+        atom_type = ContentType.objects.get_for_model(ConceptAtom)
+        self.assertUsesIndex(ValueCounter.objects.filter(object_id=1, content_type=atom_type),
+                             ['object_id', 'content_type_id'])
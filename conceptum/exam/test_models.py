@@ -1,13 +1,28 @@
+from datetime import timedelta
+
 from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.test import SimpleTestCase
+from django.db import models, connection
+from django.test import SimpleTestCase, TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 import reversion
+from reversion.models import Revision, Version
 
-from .models import Exam, FreeResponseQuestion, MultipleChoiceQuestion, MultipleChoiceOption
+from interviews.models import seed_concepts, DummyConcept as Concept
+from profiles.tests import set_up_user
+from .models import Exam, Question, FreeResponseQuestion, MultipleChoiceQuestion,\
+                    MultipleChoiceOption, ResponseSet, ExamResponse, FreeResponseResponse,\
+                    MultipleChoiceResponse, ExamInvitation, InvitationStatus,\
+                    ResponseSetStats, ExamStage, QuestionFingerprint, purge_question_history,\
+                    MAX_SEND_ATTEMPTS
+from .mailer import send_queued_invitations
 
 
 class DummyConcept(models.Model):
@@ -189,4 +204,564 @@ class ModelsTest(SimpleTestCase):
             option_2.save()
             option_3.save()
             question.save()
-        self.assertEqual(len(question.get_unique_versions()),6)
\ No newline at end of file
+        self.assertEqual(len(question.get_unique_versions()),6)
+
+    def test_get_unique_versions_keeps_latest(self):
+        # The proxy models are not versioned in tests (see above), so the question is
+        # saved through Question, which is registered with reversion.
+        exam = Exam.objects.create(name='Test Exam', description='an exam for testing')
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        concept = DummyConcept.objects.get(name = "Concept A")
+        with reversion.create_revision():
+            question = Question.objects.create(exam=exam, question="Version 1 ?", number=1,
+                                               is_multiple_choice=True,
+                                               content_type=concept_type,
+                                               object_id=concept.id)
+            option_1 = MultipleChoiceOption.objects.create(question_id=question.id,
+                                                           index=1, text="A v1")
+            option_2 = MultipleChoiceOption.objects.create(question_id=question.id,
+                                                           index=2, text="B v1")
+
+        def save_revision(text):
+            with reversion.create_revision():
+                option_1.text = text
+                option_1.save()
+                option_2.save()
+                question.save()
+
+        save_revision("A v2")
+        save_revision("A v1") # same as the first version
+        save_revision("A v2") # same as the second version
+        # options saved in a different order are still the same version
+        with reversion.create_revision():
+            option_2.save()
+            option_1.save()
+            question.save()
+
+        versions = list(reversion.get_for_object(question))
+        self.assertEqual(len(versions), 5)
+        with CaptureQueriesContext(connection) as queries:
+            unique_versions = question.get_unique_versions()
+        self.assertEqual(len(queries), 2)
+        # the most recent version of each is kept, most recent first
+        self.assertEqual(unique_versions, [versions[0], versions[2]])
+
+        for i in range(10):
+            save_revision("A v%d" % (i + 3))
+        with CaptureQueriesContext(connection) as queries:
+            unique_versions = question.get_unique_versions()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len(unique_versions), 12)
+
+    def test_unique_fingerprints(self):
+        exam = Exam.objects.create(name='Test Exam', description='an exam for testing')
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        concept = DummyConcept.objects.get(name = "Concept A")
+        with reversion.create_revision():
+            questions = [Question.objects.create(exam=exam, question="Question %d ?" % i,
+                                                 number=i, is_multiple_choice=True,
+                                                 content_type=concept_type,
+                                                 object_id=concept.id)
+                         for i in range(2)]
+            option = MultipleChoiceOption.objects.create(question_id=questions[0].id,
+                                                         index=1, text="A v1")
+        for text in ["A v2", "A v1"]:
+            with reversion.create_revision():
+                option.text = text
+                option.save()
+                for question in questions:
+                    question.save()
+
+        # the options of the first question are not part of the second one's versions
+        fingerprints = questions[0].get_unique_fingerprints()
+        self.assertEqual([f.version for f in fingerprints], questions[0].get_unique_versions())
+        self.assertEqual([f.text for f in fingerprints], ["Question 0 ?"] * 2)
+        with CaptureQueriesContext(connection) as queries:
+            fingerprints = questions[1].get_unique_fingerprints()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([f.version for f in fingerprints],
+                         [reversion.get_for_object(questions[1])[0]])
+        self.assertEqual([f.version for f in fingerprints], questions[1].get_unique_versions())
+
+        # versions saved without fingerprints are backfilled the same way
+        recorded = [(f.version_id, f.fingerprint)
+                    for f in QuestionFingerprint.objects.filter(revision__in=
+                        reversion.get_for_object(questions[0]).values('revision'))]
+        QuestionFingerprint.objects.all().delete()
+        call_command('backfill_fingerprints', verbosity=0)
+        self.assertEqual([(f.version_id, f.fingerprint)
+                          for f in QuestionFingerprint.objects.filter(revision__in=
+                            reversion.get_for_object(questions[0]).values('revision'))],
+                         recorded)
+
+
+def create_exam_with_questions(num_questions, num_free_response=None, num_options=3,
+                               stage=ExamStage.DIST, **fields):
+    """
+    Creates an exam with `num_questions` multiple choice questions and
+    `num_free_response` free response questions (by default as many), which is then
+    moved to `stage`. `fields` are set on the exam.
+    
+    Questions are numbered from 1, a free response and a multiple choice question in
+    turn while both kinds are left, and cycle through the concepts of seed_concepts().
+    Free response questions have an image. Each multiple choice question has
+    `num_options` options "option <question>.<index>", of which the first is correct.
+    Rows are inserted in bulk, so large exams are cheap to build.
+    """
+    if num_free_response is None:
+        num_free_response = num_questions
+    fields.setdefault('name', 'Clone Exam')
+    fields.setdefault('description', 'an exam for testing')
+    exam = Exam.objects.create(**fields)
+    seed_concepts()
+    concept_type = ContentType.objects.get_for_model(Concept)
+    concepts = list(Concept.objects.order_by('name'))
+    kinds = []
+    for i in range(max(num_questions, num_free_response)):
+        if i < num_free_response:
+            kinds.append(False)
+        if i < num_questions:
+            kinds.append(True)
+    concept_ids = [concepts[i % len(concepts)].id for i in range(len(kinds))]
+    Question.objects.bulk_create([
+        Question(exam=exam, is_multiple_choice=is_mc, number=number,
+                 question="%s question %d?" % ('MC' if is_mc else 'FR', number),
+                 image='' if is_mc else 'exams/%d/figure.png' % exam.id,
+                 content_type=concept_type, object_id=concept_id)
+        for number, (is_mc, concept_id) in enumerate(zip(kinds, concept_ids), 1)])
+    MultipleChoiceOption.objects.bulk_create([
+        MultipleChoiceOption(question_id=question_id, index=index, is_correct=(index == 1),
+                             text="option %d.%d" % (number, index))
+        for question_id, number in exam.question_set.filter(is_multiple_choice=True)
+                                                    .values_list('pk', 'number')
+        for index in range(1, num_options + 1)])
+    exam.stage = stage
+    exam.save()
+    return exam
+
+
+def submit_responses(response_set, answers, expiration=None, graded=True):
+    """
+    Distributes the exam of `response_set` to the emails of `answers`, a list of
+    (email, choices) pairs, and submits the ExamResponses whose choices are not None.
+    
+    `choices` has an entry per multiple choice question, in exam order: True for the
+    correct option, False for the option with index 2, or None to leave the question
+    unanswered. Free response questions are answered "answer of <email>", and unless
+    `graded` is False the number of correct choices is stored as the score.
+    
+    Returns a dictionary {email: ExamResponse}.
+    """
+    if expiration is None:
+        expiration = timezone.now() + timedelta(days=7)
+    exam = response_set.exam
+    questions = list(exam.question_set.filter(is_multiple_choice=True)
+                                      .order_by('number').values_list('pk', flat=True))
+    options = dict(((option.question_id, option.index), option.pk) for option in
+                   MultipleChoiceOption.objects.filter(question__exam=exam, index__lte=2))
+    exam_responses, summary = response_set.distribute([email for email, choices in answers],
+                                                      expiration)
+    for exam_response, (email, choices) in zip(exam_responses, answers):
+        if choices is None:
+            continue
+        for question, choice in zip(questions, choices):
+            if choice is not None:
+                MultipleChoiceResponse.objects.filter(exam_response=exam_response,
+                                                      question=question)\
+                    .update(option=options[(question, 1 if choice else 2)])
+        FreeResponseResponse.objects.filter(exam_response=exam_response)\
+                                    .update(response='answer of %s' % email)
+        graded_fields = {'score': choices.count(True)} if graded else {}
+        ExamResponse.objects.filter(pk=exam_response.pk)\
+                            .update(submitted=timezone.now(), **graded_fields)
+    return dict((exam_response.respondent, exam_response)
+                for exam_response in exam_responses)
+
+
+class CloneTest(SimpleTestCase):
+    def test_clone(self):
+        exam = create_exam_with_questions(3)
+        copy = exam.clone(name='Cloned Exam')
+        self.assertEqual((copy.name, copy.description, copy.stage),
+                         ('Cloned Exam', exam.description, ExamStage.DEV))
+
+        questions = list(Question.objects.filter(exam=copy).order_by('number'))
+        old_questions = list(Question.objects.filter(exam=exam).order_by('number'))
+        self.assertEqual([(q.question, q.is_multiple_choice, q.image.name) for q in questions],
+                         [(q.question, q.is_multiple_choice, q.image.name)
+                          for q in old_questions])
+        revision = reversion.get_for_object(questions[0])[0].revision
+        for question, old_question in zip(questions, old_questions):
+            self.assertNotEqual(question.pk, old_question.pk)
+            self.assertEqual(
+                list(MultipleChoiceOption.objects.filter(question=question)
+                                                 .values_list('index', 'text', 'is_correct')),
+                list(MultipleChoiceOption.objects.filter(question=old_question)
+                                                 .values_list('index', 'text', 'is_correct')))
+            # one version each, all in the same revision
+            versions = reversion.get_for_object(question)
+            self.assertEqual(len(versions), 1)
+            self.assertEqual(versions[0].revision, revision)
+            self.assertEqual(len(question.get_unique_fingerprints()), 1)
+
+    def test_clone_query_count(self):
+        counts = []
+        for num_questions in [2, 20]:
+            exam = create_exam_with_questions(num_questions)
+            with CaptureQueriesContext(connection) as queries:
+                exam.clone()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_copy_exam_command(self):
+        exam = create_exam_with_questions(2)
+        call_command('copy_exam', str(exam.id), new_name='Command Copy', verbosity=0)
+        copy = Exam.objects.get(name='Command Copy')
+        self.assertEqual(Question.objects.filter(exam=copy).count(), 4)
+        self.assertEqual(MultipleChoiceOption.objects.filter(question__exam=copy).count(), 6)
+
+
+class PurgeHistoryTest(SimpleTestCase):
+    def make_history(self, num_questions, num_edits):
+        """
+        Returns a copy of an exam, whose questions were edited `num_edits` times.
+        """
+        exam = create_exam_with_questions(num_questions).clone()
+        for i in range(num_edits):
+            for question in Question.objects.filter(exam=exam):
+                with reversion.create_revision():
+                    question.question = "edit %d" % i
+                    question.save()
+                    for option in MultipleChoiceOption.objects.filter(question_id=question.id):
+                        option.text = "edit %d" % i
+                        option.save()
+        return exam
+
+    def versions(self, questions):
+        return Version.objects.filter(
+            content_type=ContentType.objects.get_for_model(Question),
+            object_id_int__in=[question.pk for question in questions])
+
+    def test_purge_question(self):
+        exam = self.make_history(2, 3)
+        questions = list(Question.objects.filter(exam=exam).order_by('number'))
+        purged = questions[1] # multiple choice
+        options = list(MultipleChoiceOption.objects.filter(question=purged))
+        purge_question_history(Question.objects.filter(pk=purged.pk))
+        self.assertFalse(self.versions([purged]).exists())
+        self.assertFalse(Version.objects.filter(
+            content_type=ContentType.objects.get_for_model(MultipleChoiceOption),
+            object_id_int__in=[option.pk for option in options]).exists())
+        self.assertFalse(QuestionFingerprint.objects.filter(question_id=purged.pk).exists())
+        # the other questions keep their history, including the copy's shared revision
+        for question in questions[:1] + questions[2:]:
+            self.assertEqual(self.versions([question]).count(), 4)
+            self.assertEqual(len(question.get_unique_fingerprints()), 4)
+
+    def test_purge_exam(self):
+        counts = []
+        for num_edits in [1, 5]:
+            exam = self.make_history(2, num_edits)
+            questions = list(Question.objects.filter(exam=exam))
+            revisions = list(Revision.objects.filter(
+                pk__in=self.versions(questions).values('revision')))
+            with CaptureQueriesContext(connection) as queries:
+                purge_question_history(exam.question_set.all())
+            counts.append(len(queries))
+            self.assertFalse(self.versions(questions).exists())
+            self.assertFalse(Revision.objects.filter(
+                pk__in=[revision.pk for revision in revisions]).exists())
+        self.assertEqual(counts[0], counts[1])
+
+
+class DistributeTest(SimpleTestCase):
+    def setUp(self):
+        create_concepts()
+        self.user = set_up_user()
+        self.exam = Exam.objects.create(name='Test Exam', description='an exam for testing')
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        concept = DummyConcept.objects.get(name = "Concept A")
+        for i in range(3):
+            FreeResponseQuestion.objects.create(exam=self.exam,
+                                                question="FR question %d?" % i,
+                                                content_type=concept_type,
+                                                object_id=concept.id)
+            MultipleChoiceQuestion.objects.create(exam=self.exam,
+                                                  question="MC question %d?" % i,
+                                                  content_type=concept_type,
+                                                  object_id=concept.id)
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course',
+                                                       exam=self.exam)
+        self.expiration = timezone.now() + timedelta(days=7)
+    
+    def test_distribute(self):
+        emails = ['a@test.com', 'b@test.com', 'a@test.com']
+        exam_responses, summary = self.response_set.distribute(emails, self.expiration)
+        self.assertEqual(len(exam_responses), 2)
+        self.assertEqual(summary.items(), [('a@test.com', ResponseSet.created_response),
+                                           ('b@test.com', ResponseSet.created_response)])
+        self.assertEqual(self.response_set.examresponse_set.count(), 2)
+        for exam_response in self.response_set.examresponse_set.all():
+            self.assertEqual(len(exam_response.key), 64)
+            self.assertEqual(exam_response.freeresponseresponse_set.count(), 3)
+            self.assertEqual(exam_response.multiplechoiceresponse_set.count(), 3)
+        
+        # existing respondents are skipped, resent responses get a new key
+        old = ExamResponse.objects.get(response_set=self.response_set, respondent='b@test.com')
+        exam_responses, summary = self.response_set.distribute(['a@test.com', 'c@test.com'],
+                                                               self.expiration,
+                                                               resend=[old])
+        self.assertEqual(summary, {'a@test.com': ResponseSet.duplicate_response,
+                                   'c@test.com': ResponseSet.created_response,
+                                   'b@test.com': ResponseSet.resent_response})
+        self.assertEqual(len(exam_responses), 2)
+        self.assertFalse(ExamResponse.objects.filter(pk=old.pk).exists())
+        self.assertFalse(FreeResponseResponse.objects.filter(exam_response_id=old.pk).exists())
+        self.assertEqual(self.response_set.examresponse_set.count(), 3)
+        self.assertEqual(MultipleChoiceResponse.objects.filter(
+            exam_response__response_set=self.response_set).count(), 9)
+    
+    def test_distribute_query_count(self):
+        # The number of queries does not grow with the number of emails
+        with CaptureQueriesContext(connection) as few:
+            self.response_set.distribute(['x%d@test.com' % i for i in range(5)], self.expiration)
+        with CaptureQueriesContext(connection) as many:
+            self.response_set.distribute(['y%d@test.com' % i for i in range(50)], self.expiration)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(self.response_set.examresponse_set.count(), 55)
+    
+    def test_paper_cache(self):
+        # the questions of an exam are only cached once it is distributed
+        questions, options = self.exam.get_paper()
+        self.assertEqual(len(questions), 6)
+        with CaptureQueriesContext(connection) as development:
+            self.exam.get_paper()
+        self.assertEqual(len(development), 2)
+        
+        self.exam.stage = ExamStage.DIST
+        self.exam.save()
+        self.exam.get_paper()
+        with CaptureQueriesContext(connection) as distribution:
+            cached_questions, cached_options = self.exam.get_paper()
+        self.assertEqual(len(distribution), 0)
+        self.assertEqual([q.pk for q in cached_questions], [q.pk for q in questions])
+        
+        self.exam.stage = ExamStage.CLOSED
+        self.exam.save()
+        with CaptureQueriesContext(connection) as closed:
+            self.exam.get_paper()
+        self.assertEqual(len(closed), 2)
+
+    def test_delete_expired(self):
+        emails = ['expired%d@test.com' % i for i in range(5)]
+        expired, summary = self.response_set.distribute(emails,
+                                                        timezone.now() - timedelta(days=1))
+        current, summary = self.response_set.distribute(['current@test.com'],
+                                                        self.expiration)
+        submitted = expired[0]
+        submitted.submitted = timezone.now()
+        submitted.save()
+        keys = [response.key for response in expired[1:]]
+        self.assertEqual(set(ExamResponse.objects.expired().values_list('key', flat=True)),
+                         set(keys))
+
+        self.assertEqual(ExamResponse.objects.delete_expired(batch_size=2), 4)
+        self.assertFalse(ExamResponse.objects.filter(key__in=keys).exists())
+        self.assertFalse(FreeResponseResponse.objects.filter(exam_response__in=keys).exists())
+        self.assertFalse(MultipleChoiceResponse.objects.filter(exam_response__in=keys).exists())
+        self.assertEqual(self.response_set.examresponse_set.count(), 2)
+        self.assertEqual(submitted.multiplechoiceresponse_set.count(), 3)
+
+        call_command('cleanup_responses', verbosity=0)
+        self.assertEqual(self.response_set.examresponse_set.count(), 2)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """
+    An email backend whose messages never get through.
+    """
+    def send_messages(self, email_messages):
+        raise IOError("mail server unavailable")
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    """
+    An email backend that cannot connect to its mail server.
+    """
+    def open(self):
+        raise IOError("connection refused")
+
+
+class RejectingEmailBackend(BaseEmailBackend):
+    """
+    An email backend that rejects the messages to 'j@test.com'.
+    """
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if 'j@test.com' in message.to:
+                raise IOError("recipient rejected")
+            mail.outbox.append(message)
+        return len(email_messages)
+
+
+class InvitationTest(TestCase):
+    def setUp(self):
+        self.user = set_up_user()
+        self.exam = Exam.objects.create(name='Invitation Exam', description='an exam for testing')
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course',
+                                                       exam=self.exam)
+        expiration = timezone.now() + timedelta(days=7)
+        self.exam_responses, summary = self.response_set.distribute(['i@test.com', 'j@test.com'],
+                                                                    expiration)
+        ExamInvitation.queue(self.exam_responses, RequestFactory().get('/'))
+        self.invitations = ExamInvitation.objects.filter(
+            exam_response__response_set=self.response_set)
+    
+    def test_queue(self):
+        # queueing does not send anything
+        self.assertEqual(self.invitations.count(), 2)
+        for invitation in self.invitations:
+            self.assertEqual(invitation.status, InvitationStatus.QUEUED)
+            self.assertIn(invitation.exam_response.key, invitation.test_url)
+            self.assertIsNone(invitation.exam_response.sent)
+    
+    def test_send_queued_invitations(self):
+        self.assertEqual(send_queued_invitations(batch_size=1000), (2, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['i@test.com', 'j@test.com'])
+        for invitation in self.invitations:
+            self.assertEqual(invitation.status, InvitationStatus.SENT)
+            self.assertIsNotNone(invitation.exam_response.sent)
+        # nothing is sent twice
+        self.assertEqual(send_queued_invitations(batch_size=1000), (0, 0))
+    
+    def test_failed_invitations_are_retried_later(self):
+        sent, failed = send_queued_invitations(batch_size=1000,
+                                               connection=FailingEmailBackend())
+        self.assertEqual((sent, failed), (0, 2))
+        for invitation in self.invitations:
+            self.assertEqual(invitation.status, InvitationStatus.QUEUED)
+            self.assertEqual(invitation.attempts, 1)
+            self.assertGreater(invitation.next_attempt, timezone.now())
+            self.assertIsNone(invitation.exam_response.sent)
+        # not due yet, so the next run skips them
+        self.assertEqual(send_queued_invitations(batch_size=1000), (0, 0))
+    
+    def test_unreachable_server_does_not_count_attempts(self):
+        # more outages than MAX_SEND_ATTEMPTS do not make the invitations fail
+        for i in range(MAX_SEND_ATTEMPTS + 1):
+            sent, failed = send_queued_invitations(batch_size=1000,
+                                                   connection=UnreachableEmailBackend())
+            self.assertEqual((sent, failed), (0, 2))
+            for invitation in self.invitations:
+                self.assertEqual(invitation.status, InvitationStatus.QUEUED)
+                self.assertEqual(invitation.attempts, 0)
+                self.assertGreater(invitation.next_attempt, timezone.now())
+                self.assertEqual(invitation.last_error, "connection refused")
+            self.assertEqual(send_queued_invitations(batch_size=1000), (0, 0))
+            self.invitations.update(next_attempt=timezone.now())
+        self.assertEqual(send_queued_invitations(batch_size=1000), (2, 0))
+    
+    def test_one_failure_does_not_stop_the_batch(self):
+        sent, failed = send_queued_invitations(batch_size=1000,
+                                               connection=RejectingEmailBackend())
+        self.assertEqual((sent, failed), (1, 1))
+        self.assertEqual([message.to for message in mail.outbox], [['i@test.com']])
+        statuses = dict(self.invitations.values_list('exam_response__respondent', 'status'))
+        self.assertEqual(statuses, {'i@test.com': InvitationStatus.SENT,
+                                    'j@test.com': InvitationStatus.QUEUED})
+        
+        # messages that cannot be rendered are retried too
+        ExamInvitation.objects.update(status=InvitationStatus.QUEUED,
+                                      next_attempt=timezone.now())
+        with self.settings(TEMPLATE_LOADERS=()):
+            self.assertEqual(send_queued_invitations(batch_size=1000), (0, 2))
+        self.assertIn('exam/email_test', self.invitations[0].last_error)
+    
+    def test_claimed_invitations_are_skipped(self):
+        first, second = self.invitations
+        # another worker read the invitation before it was claimed
+        stale = ExamInvitation.objects.get(pk=first.pk)
+        self.assertTrue(first.claim())
+        self.assertFalse(stale.claim())
+        self.assertTrue(second.claim())
+        self.assertEqual(send_queued_invitations(batch_size=1000), (0, 0))
+        
+        # the claim of a worker that died runs out
+        ExamInvitation.objects.filter(pk=first.pk).update(next_attempt=timezone.now())
+        self.assertEqual(send_queued_invitations(batch_size=1000), (1, 0))
+        self.assertEqual(self.invitations.get(pk=first.pk).status, InvitationStatus.SENT)
+
+
+class ScoreStatsTest(SimpleTestCase):
+    def setUp(self):
+        create_concepts()
+        self.user = set_up_user()
+        self.exam = Exam.objects.create(name='Scored Exam', description='an exam for testing')
+        concept_type = ContentType.objects.get_for_model(DummyConcept)
+        concept = DummyConcept.objects.get(name = "Concept A")
+        self.correct = []
+        self.wrong = []
+        for i in range(4):
+            question = MultipleChoiceQuestion.objects.create(exam=self.exam,
+                                                             question="MC question %d?" % i,
+                                                             content_type=concept_type,
+                                                             object_id=concept.id)
+            self.correct.append(MultipleChoiceOption.objects.create(question=question,
+                text="right", index=1, is_correct=True))
+            self.wrong.append(MultipleChoiceOption.objects.create(question=question,
+                text="wrong", index=2))
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course',
+                                                       exam=self.exam)
+        expiration = timezone.now() + timedelta(days=7)
+        self.exam_responses, summary = self.response_set.distribute(
+            ['s1@test.com', 's2@test.com', 's3@test.com'], expiration)
+    
+    def answer(self, exam_response, num_correct):
+        """
+        Answers the first `num_correct` questions correctly and the rest incorrectly.
+        """
+        for i, response in enumerate(exam_response.multiplechoiceresponse_set.order_by('question')):
+            response.option = self.correct[i] if i < num_correct else self.wrong[i]
+            response.save()
+    
+    def test_add_score(self):
+        for exam_response, num_correct in zip(self.exam_responses, [4, 1, 1]):
+            self.answer(exam_response, num_correct)
+            self.assertEqual(exam_response.grade(), num_correct)
+            ResponseSetStats.add_score(self.response_set, exam_response.score)
+        stats = ResponseSetStats.objects.get(response_set=self.response_set)
+        self.assertEqual(stats.num_questions, 4)
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.total, 6)
+        self.assertEqual((stats.min_score, stats.max_score), (1, 4))
+        self.assertEqual(stats.get_histogram(), {1: 2, 4: 1})
+        self.assertEqual(stats.as_list(), [4, 6, 50.0, 100.0, 25.0])
+    
+    def test_take_test_updates_stats(self):
+        exam_response = self.exam_responses[0]
+        data = {}
+        for response in exam_response.multiplechoiceresponse_set.all():
+            data['MC_response_%d' % response.question_id] = response.question.correct_option.id
+        self.client.post(reverse('take_test', args=[exam_response.key]), data)
+        exam_response = ExamResponse.objects.get(pk=exam_response.pk)
+        self.assertIsNotNone(exam_response.submitted)
+        self.assertEqual(exam_response.score, 4)
+        self.assertEqual(self.response_set.stats.as_list(), [4, 4, 100.0, 100.0, 100.0])
+    
+    def test_backfill_scores(self):
+        for exam_response, num_correct in zip(self.exam_responses, [3, 2, 0]):
+            self.answer(exam_response, num_correct)
+        ExamResponse.objects.filter(pk__in=[r.pk for r in self.exam_responses])\
+                            .update(submitted=timezone.now())
+        call_command('backfill_scores', verbosity=0)
+        scores = ExamResponse.objects.filter(response_set=self.response_set)\
+                                     .order_by('score').values_list('score', flat=True)
+        self.assertEqual(list(scores), [0, 2, 3])
+        stats = ResponseSetStats.objects.get(response_set=self.response_set)
+        self.assertEqual((stats.count, stats.total, stats.min_score, stats.max_score),
+                         (3, 5, 0, 3))
+        self.assertEqual(stats.get_histogram(), {0: 1, 2: 1, 3: 1})
@@ -1,14 +1,23 @@
+from datetime import timedelta
+
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.urlresolvers import reverse
-from django.db import models, transaction
-from django.test import SimpleTestCase
+from django.db import models, transaction, connection, IntegrityError
+from django.test import SimpleTestCase, TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 import reversion
 
 from profiles.tests import set_up_user
-from interviews.models import get_concept_list, DummyConcept as Concept
+from interviews.models import seed_concepts, DummyConcept as Concept
 from .models import Exam, FreeResponseQuestion, MultipleChoiceQuestion, MultipleChoiceOption,\
-                    ExamKind, ExamStage
+                    ExamKind, ExamStage, ResponseSet, ExamResponse, MultipleChoiceResponse,\
+                    ExamInvitation, ResponseSetStats, exam_paper_cache_keys
+from .test_models import create_exam_with_questions, submit_responses
+from .views import TakeTestView
 
 def create_exam():
     """
@@ -38,7 +47,7 @@ def create_exam():
 
 class DevViewsTest(SimpleTestCase):
     def setUp(self):
-        get_concept_list()
+        seed_concepts()
         self.user = set_up_user()
     
     def test_index_view(self):
@@ -97,6 +106,37 @@ class DevViewsTest(SimpleTestCase):
             self.assertContains(response, question.question)
         for question in (exam.multiplechoicequestion_set.all()):
             self.assertContains(response, question.question)
+    
+    def test_detail_view_query_count(self):
+        # the detail page costs the same number of queries however many concepts and
+        # questions the exam has
+        self.user.profile.is_contrib = True
+        self.user.profile.save()
+        self.client.login(email=self.user.email, password='password')
+        small = create_exam()
+        large = Exam.objects.create(name='Large Exam', description='an exam for testing')
+        concept_type = ContentType.objects.get_for_model(Concept)
+        for i, concept in enumerate(Concept.objects.all()):
+            for j in range(3):
+                FreeResponseQuestion.objects.create(exam=large, question="FR %d %d?" % (i, j),
+                                                    content_type=concept_type,
+                                                    object_id=concept.id)
+                mcq = MultipleChoiceQuestion.objects.create(exam=large,
+                                                            question="MC %d %d?" % (i, j),
+                                                            content_type=concept_type,
+                                                            object_id=concept.id)
+                for k in range(4):
+                    MultipleChoiceOption.objects.create(question=mcq, text="choice %d" % k,
+                                                        index=k + 1)
+        self.client.get(reverse('exam:detail', args=[small.id]))
+        counts = []
+        for exam in [small, large]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('exam:detail', args=[exam.id]))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertContains(response, 'MC 3 2?')
+        self.assertContains(response, 'FR 0 1?')
 
     def test_create_view(self):
         # User not logged in, redirected
@@ -351,9 +391,125 @@ class DevViewsTest(SimpleTestCase):
         self.assertRedirects(response, reverse('exam:detail', kwargs ={'exam_id':exam.id,}))
 
 
+class IndexViewsTest(TestCase):
+    def setUp(self):
+        seed_concepts()
+        self.user = set_up_user()
+        self.user.profile.is_contrib = True
+        self.user.profile.save()
+        self.client.login(email=self.user.email, password='password')
+    
+    def make_exam(self, name, num_questions, num_responses):
+        """
+        Creates a distributed exam with `num_questions` multiple choice questions (one
+        per concept, cycling) and `num_responses` submitted responses with a score of 1.
+        """
+        exam = create_exam_with_questions(num_questions, 0, name=name)
+        response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                  course='Test Course', exam=exam)
+        choices = [True] + [False] * (num_questions - 1)
+        submit_responses(response_set, [('%s%d@test.com' % (name, i), choices)
+                                        for i in range(num_responses)])
+        return exam
+    
+    def test_dist_index(self):
+        # the index costs the same number of queries however many exams, questions
+        # and responses there are
+        url = reverse('CI_exam:distribute_index')
+        small = self.make_exam('small', 1, 1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        few = len(few)
+        large = self.make_exam('large', 8, 20)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(few, len(many))
+        stats = dict(response.context['distributable'])
+        self.assertEqual(stats, {
+            small: ["Questions: 1", "Responses: 1", "Exam Id: %d" % small.id,
+                    "Average Score: 100.0%", "Times Distributed: 1", "Concepts: Concept A"],
+            large: ["Questions: 8", "Responses: 20", "Exam Id: %d" % large.id,
+                    "Average Score: 12.5%", "Times Distributed: 1",
+                    "Concepts: Concept A, Concept B, Concept C, Concept D"]})
+        self.assertEqual(response.context['closed'], [])
+        self.assertContains(response, 'Average Score: 12.5%')
+    
+    def test_dev_index(self):
+        url = reverse('CI_exam:index')
+        create_exam()
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        few = len(few)
+        for i in range(5):
+            create_exam()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(few, len(many))
+        self.assertEqual([stats for exam, stats in response.context['exams']],
+                         [["Questions: 2", "Concepts: Concept A, Concept B"]] * 6)
+
+
+class DistributeViewTest(TestCase):
+    def setUp(self):
+        seed_concepts()
+        self.user = set_up_user()
+        self.client.login(email=self.user.email, password='password')
+        exam = create_exam()
+        exam.stage = ExamStage.DIST
+        exam.save()
+        self.response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                       course='Test Course', exam=exam)
+        self.url = reverse('CI_exam:distribute_send', kwargs={'rs_id': self.response_set.id})
+        expiration = timezone.now() + timedelta(days=1)
+        self.data = {'expiration_date': expiration.date().isoformat(),
+                     'expiration_time': '23:59:59',
+                     'recipients': 'i@test.com; j@test.com'}
+    
+    def test_distribute(self):
+        response = self.client.post(self.url, self.data)
+        self.assertRedirects(response, reverse('CI_exam:responses',
+                                               kwargs={'rs_id': self.response_set.id}))
+        self.assertEqual(sorted(self.response_set.examresponse_set
+                                                 .values_list('respondent', flat=True)),
+                         ['i@test.com', 'j@test.com'])
+        self.assertEqual(ExamInvitation.objects.filter(
+            exam_response__response_set=self.response_set).count(), 2)
+    
+    def test_results(self):
+        exam_responses, summary = self.response_set.distribute(['i@test.com', 'j@test.com'],
+                                                               timezone.now() + timedelta(days=1))
+        question = self.response_set.exam.multiplechoicequestion_set.get()
+        for exam_response, index in zip(exam_responses, [1, 2]):
+            MultipleChoiceResponse.objects.filter(exam_response=exam_response)\
+                .update(option=question.multiplechoiceoption_set.get(index=index))
+            ExamResponse.objects.filter(pk=exam_response.pk).update(submitted=timezone.now())
+            ResponseSetStats.add_score(self.response_set, 2 - index)
+        response = self.client.get(reverse('CI_exam:responses',
+                                           kwargs={'rs_id': self.response_set.id}))
+        self.assertEqual(response.context['stats'], [1, 1, 50.0, 100.0, 0.0])
+        self.assertEqual(response.context['question_stats'], [(question, 50.0)])
+    
+    def test_simultaneous_distribution(self):
+        # another distribution to the same addresses commits first
+        def distribute(*args, **kwargs):
+            raise IntegrityError('columns response_set_id, respondent are not unique')
+        ResponseSet.distribute, original = distribute, ResponseSet.distribute
+        try:
+            response = self.client.post(self.url, self.data)
+        finally:
+            ResponseSet.distribute = original
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', None,
+                             'Some of these addresses were sent the exam at the same time by '
+                             'someone else. Please check the list of responses and try again.')
+        self.assertFalse(ExamInvitation.objects.exists())
+
+
 class FinalizeViewTest(SimpleTestCase):
     def setUp(self):
-        get_concept_list()
+        seed_concepts()
         self.user = set_up_user()
         
     def test_permissions(self):
@@ -381,7 +537,7 @@ class FinalizeViewTest(SimpleTestCase):
 
 class CopyViewTest(SimpleTestCase):
     def setUp(self):
-        get_concept_list()
+        seed_concepts()
         self.user = set_up_user()
         self.user.is_staff = True
         self.user.save()
@@ -480,4 +636,134 @@ class CopyViewTest(SimpleTestCase):
                 self.assertNotEqual(new_options[j],
                                     old_options[j])
                 self.assertEqual(new_options[j].text,
-                                 old_options[j].text)
\ No newline at end of file
+                                 old_options[j].text)
+
+class TakeTestViewTest(TestCase):
+    def setUp(self):
+        self.user = set_up_user()
+    
+    def make_exam_response(self, num_questions):
+        """
+        Distributes an exam with `num_questions` multiple choice and `num_questions`
+        free response questions, and returns the ExamResponse for one student.
+        """
+        exam = create_exam_with_questions(num_questions, num_options=4,
+                                          name='Take Test Exam')
+        response_set = ResponseSet.objects.create(instructor=self.user.profile,
+                                                  course='Test Course', exam=exam)
+        exam_responses, summary = response_set.distribute(['student@test.com'],
+                                                          timezone.now() + timedelta(days=1))
+        return exam_responses[0]
+    
+    def answers(self, exam_response):
+        data = {}
+        for response in exam_response.multiplechoiceresponse_set.all():
+            data['MC_response_%d' % response.question_id] = \
+                response.question.multiplechoiceoption_set.all()[1].id
+        for response in exam_response.freeresponseresponse_set.all():
+            data['FR_response_%d' % response.question_id] = 'answer %d' % response.question_id
+        return data
+    
+    def test_take_test(self):
+        exam_response = self.make_exam_response(3)
+        url = reverse('take_test', args=[exam_response.key])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'MC question 6?')
+        self.assertContains(response, 'option 6.4')
+        
+        # a missing answer is reported on the form
+        data = self.answers(exam_response)
+        data.pop(data.keys()[0])
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'This field is required.')
+        
+        response = self.client.post(url, self.answers(exam_response))
+        self.assertRedirects(response, reverse('response_complete'))
+        exam_response = ExamResponse.objects.get(pk=exam_response.pk)
+        self.assertIsNotNone(exam_response.submitted)
+        self.assertEqual(exam_response.score, 0)
+        for response in exam_response.freeresponseresponse_set.all():
+            self.assertEqual(response.response, 'answer %d' % response.question_id)
+        for response in exam_response.multiplechoiceresponse_set.all():
+            self.assertEqual(response.option.index, 2)
+        
+        # the exam can only be submitted once
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('exam_unavailable'))
+    
+    def test_submit_twice(self):
+        # two requests that both found the exam available: only the first is counted
+        exam_response = self.make_exam_response(2)
+        data = self.answers(exam_response)
+        url = reverse('take_test', args=[exam_response.key])
+        views = []
+        for i in range(2):
+            view = TakeTestView(request=RequestFactory().post(url, data),
+                                kwargs={'pk': exam_response.key})
+            view.object = view.get_object()
+            self.assertTrue(view.object.is_available())
+            form = view.get_form(view.get_form_class())
+            self.assertTrue(form.is_valid())
+            views.append((view, form))
+        responses = [view.form_valid(form) for view, form in views]
+        self.assertEqual([response['Location'] for response in responses],
+                         [reverse('response_complete'), reverse('exam_unavailable')])
+        stats = ResponseSetStats.objects.get(response_set=exam_response.response_set)
+        self.assertEqual((stats.count, stats.total), (1, 0))
+    
+    def test_query_count(self):
+        # loading and submitting the exam costs the same number of queries however
+        # many questions it has
+        counts = []
+        for num_questions in [2, 10]:
+            exam_response = self.make_exam_response(num_questions)
+            url = reverse('take_test', args=[exam_response.key])
+            data = self.answers(exam_response)
+            # len() is read right away, since the next request clears the query log
+            with CaptureQueriesContext(connection) as get:
+                self.client.get(url)
+            get_count = len(get)
+            with CaptureQueriesContext(connection) as post:
+                response = self.client.post(url, data)
+            counts.append((get_count, len(post)))
+            # the answers are updated in place, one UPDATE per kind of response
+            writes = [statement for q in post.captured_queries for statement in
+                      ['UPDATE "exam_freeresponseresponse"',
+                       'UPDATE "exam_multiplechoiceresponse"',
+                       'DELETE FROM "exam_freeresponseresponse"',
+                       'DELETE FROM "exam_multiplechoiceresponse"']
+                      if statement in q['sql']]
+            self.assertEqual(writes, ['UPDATE "exam_freeresponseresponse"',
+                                      'UPDATE "exam_multiplechoiceresponse"'])
+            self.assertRedirects(response, reverse('response_complete'))
+        self.assertEqual(counts[0], counts[1])
+        # exam response, questions, options, and the two kinds of responses
+        self.assertEqual(counts[0][0], 5)
+    
+    def test_paper_cache(self):
+        # the questions are rendered once per exam and shared by all respondents
+        exam_response = self.make_exam_response(2)
+        exam = exam_response.response_set.exam
+        keys = exam_paper_cache_keys(exam.pk)
+        self.assertEqual(cache.get_many(keys), {})
+        first = self.client.get(reverse('take_test', args=[exam_response.key]))
+        paper_key = make_template_fragment_key('exam_paper', [exam.pk, exam.stage])
+        self.assertIn('MC question 2?', cache.get(paper_key))
+        
+        other_responses, summary = exam_response.response_set.distribute(
+            ['other@test.com'], timezone.now() + timedelta(days=1))
+        second = self.client.get(reverse('take_test', args=[other_responses[0].key]))
+        paper = lambda response: response.content[response.content.index('<ol>'):
+                                                  response.content.index('</ol>')]
+        self.assertEqual(paper(first), paper(second))
+        
+        self.client.get(reverse('take_test_IRB', args=[exam_response.key]))
+        consent_key = make_template_fragment_key('exam_consent', [exam.pk, exam.stage])
+        self.assertIsNotNone(cache.get(consent_key))
+        
+        # a change of stage (any save of the exam) drops the cached fragments
+        exam.stage = ExamStage.CLOSED
+        exam.save()
+        self.assertEqual(cache.get_many(keys), {})
@@ -50,9 +50,11 @@ exam_patterns = patterns('',
         url(r'^(?P<exam_id>\d+)/close/$', views.ExamCloseView.as_view(), name='close'),
         url(r'^(?P<exam_id>\d+)/responses/$', views.ResponseSetIndexView.as_view(), name = 'response_sets'),
         url(r'^(?P<exam_id>\d+)/new/$', views.NewResponseSetView.as_view(), name='distribute_new'),
+        url(r'^(?P<exam_id>\d+)/export/$', views.ExportView.as_view(), name='export_exam'),
         url(r'^response_set/(?P<rs_id>\d+)/$', views.ResponseSetDetailView.as_view(), name = 'responses'),
         url(r'^response_set/(?P<rs_id>\d+)/send/$', views.DistributeView.as_view(), name='distribute_send'),
         url(r'^response_set/(?P<rs_id>\d+)/delete/$', views.DeleteView.as_view(), name='distribute_delete'),
+        url(r'^response_set/(?P<rs_id>\d+)/export/$', views.ExportView.as_view(), name='export_responses'),
         url(r'^response/(?P<key>\w+)/$', views.ExamResponseDetailView.as_view(), name = 'response_detail'),
     ))),    
     
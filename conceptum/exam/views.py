@@ -1,52 +1,101 @@
+import collections
 import datetime
+import math
 import operator
 
 from django import forms
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404, StreamingHttpResponse
 from django.template import RequestContext, loader
 from django.views import generic
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.utils import timezone
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.formtools.wizard.views import SessionWizardView
-from django.core.exceptions import PermissionDenied
-from django.db import transaction
+from django.core.exceptions import PermissionDenied, NON_FIELD_ERRORS
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Avg
 
 import reversion
+from reversion.models import Version
 from braces.views import LoginRequiredMixin, UserPassesTestMixin, StaffuserRequiredMixin
 
+from conceptum.relations import prefetch_generic
 from profiles.mixins import ContribRequiredMixin, StaffRequiredMixin
-from interviews.models import get_concept_list, DummyConcept as Concept #TEMPORARY: DummyConcept
+from interviews.models import get_cached_concepts, DummyConcept as Concept #TEMPORARY: DummyConcept
 from interviews.models import Excerpt #not temporary
 from .models import Exam, ResponseSet, ExamResponse, QuestionResponse, FreeResponseQuestion,\
-                    MultipleChoiceQuestion, MultipleChoiceOption, FreeResponseResponse,\
-                    MultipleChoiceResponse, ExamKind, ExamStage, Question
+                    MultipleChoiceQuestion, MultipleChoiceOption, ExamKind, ExamStage,\
+                    Question, ExamInvitation, ResponseSetStats, EXAM_PAPER_CACHE_TIMEOUT,\
+                    purge_question_history, percent
 from .forms import SelectConceptForm, AddFreeResponseForm, AddMultipleChoiceForm, \
                    NewResponseSetForm, DistributeForm, ExamResponseForm, CleanupForm, FreeResponseEditForm, \
                    MultipleChoiceEditForm, FreeResponseVersionForm, MultipleChoiceVersionForm, \
                    FinalizeSelectForm, FinalizeOrderForm, FinalizeConfirmForm
-from .mixins import DevelopmentMixin, DistributionMixin, CurrentAppMixin
+from .mixins import DevelopmentMixin, DistributionMixin, ResultsMixin, CurrentAppMixin
+from .grading import grade_responses, question_correct_counts
+from .analytics import analyze_exam
+from . import export
+
+MAX_INDEX_CONCEPTS = 5 # concepts listed for each exam on the index pages
 
 
 def get_data(exam):
-    mc = {}
+    """
+    Returns 2 dictionaries (in a tuple). The first maps each concept to a list of the
+    exam's free response questions about it, the second to a list of [question,
+    options] pairs for its multiple choice questions.
+    
+    All questions and options are read at once (see Exam.get_paper()) and grouped by
+    (content_type, object_id), so the cost does not depend on the number of concepts
+    or questions.
+    """
+    questions, options = exam.get_paper()
+    by_concept = collections.defaultdict(list)
+    for question in questions:
+        by_concept[(question.content_type_id, question.object_id)].append(question)
+    concept_type = ContentType.objects.get_for_model(Concept)
     fr = {}
-    for concept in get_concept_list():
-        concept_type = ContentType.objects.get_for_model(concept)
-        fr_question_list = FreeResponseQuestion.objects.filter(exam = exam,
-                                                               content_type__pk=concept_type.id,
-                                                               object_id=concept.id)
-        mc_question_list = MultipleChoiceQuestion.objects.filter(exam = exam,
-                                                               content_type__pk=concept_type.id,
-                                                               object_id=concept.id)
-        fr[concept] = fr_question_list
-        mc[concept] = mc_question_list
-    return [fr, mc]
+    mc = {}
+    for concept in get_cached_concepts():
+        concept_questions = by_concept[(concept_type.id, concept.id)]
+        fr[concept] = [q for q in concept_questions if not q.is_multiple_choice]
+        mc[concept] = [[q, options.get(q.id, [])]
+                       for q in concept_questions if q.is_multiple_choice]
+    return (fr, mc)
 
 
     
+def question_summaries(exams, multiple_choice_only=False):
+    """
+    Returns a dictionary {exam id: (number of questions, concept names)} for the
+    `exams`. Concept names are listed in question order, without duplicates, and
+    cut to MAX_INDEX_CONCEPTS (followed by "...").
+    
+    Costs one query for the questions and one per concept content type.
+    """
+    questions = Question.objects.filter(exam__in=[exam.id for exam in exams])\
+                                .only('exam', 'content_type', 'object_id')
+    if multiple_choice_only:
+        questions = questions.filter(is_multiple_choice=True)
+    counts = collections.Counter()
+    concepts = collections.defaultdict(list)
+    for question in prefetch_generic(questions, 'content_object'):
+        counts[question.exam_id] += 1
+        concept = question.content_object
+        if concept is not None and concept.name not in concepts[question.exam_id]:
+            concepts[question.exam_id].append(concept.name)
+    summaries = {}
+    for exam_id, count in counts.items():
+        names = concepts[exam_id]
+        if len(names) > MAX_INDEX_CONCEPTS:
+            names = names[:MAX_INDEX_CONCEPTS] + ["..."]
+        summaries[exam_id] = (count, names)
+    return summaries
+
+
 ####################### Index and Detail Pages ###########################################
 
 class ExamDevIndexView(LoginRequiredMixin,
@@ -62,7 +111,7 @@ class ExamDevIndexView(LoginRequiredMixin,
     model = Exam
     
     def get_template_names(self, *args, **kwargs):
-        if (not Exam.objects.filter(kind=self.exam_kind, stage=ExamStage.DEV)):
+        if not Exam.objects.filter(kind=self.exam_kind, stage=ExamStage.DEV).exists():
             return 'exam/index_dev_empty.html'
         else:
             return 'exam/index_dev.html'
@@ -71,7 +120,7 @@ class ExamDevIndexView(LoginRequiredMixin,
         if self.request.user.is_staff:
             if self.exam_kind == ExamKind.SURVEY:
                 return True
-            if not Exam.objects.filter(kind=ExamKind.CI).exclude(stage=ExamStage.CLOSED):
+            if not Exam.objects.filter(kind=ExamKind.CI).exclude(stage=ExamStage.CLOSED).exists():
                 return True
         return False
        
@@ -79,24 +128,13 @@ class ExamDevIndexView(LoginRequiredMixin,
         context = super(ExamDevIndexView, self).get_context_data(**kwargs)
         
         ex_list = Exam.objects.filter(kind=self.exam_kind, stage=ExamStage.DEV)
+        summaries = question_summaries(ex_list)
         #format: [[exam, stat, list, goes, here...], [exam, stats, go, here], ...]
         exams = []
         for ex in ex_list:
-            qset = ex.question_set.all()
-            exam_item = [ex]
-            qs = "Questions: " + len(qset).__str__()
-            concepts = []
-            for q in qset:
-                concept = q.content_object.name
-                if (concept not in concepts and len(concepts) <= 5):
-                    concepts.append(q.content_object.name)
-                elif(len(concepts) == 5):
-                    concepts.append("...")
-                    break;
-            concepts = ", ".join(concepts)
-            concepts = "Concepts: " + concepts
-            exam_item = [ex, [qs, concepts]]
-            exams.append(exam_item)
+            num_questions, concepts = summaries.get(ex.id, (0, []))
+            exams.append([ex, ["Questions: %d" % num_questions,
+                               "Concepts: " + ", ".join(concepts)]])
             
         context['exams'] = exams
         context['can_create_new'] = self.can_create_new()
@@ -116,41 +154,33 @@ class ExamDistIndexView(LoginRequiredMixin,
     def make_exam_list(self, ex_list):
         """
         format: [[exam, stat, list, goes, here...], [exam, stats, go, here], ...]
+        
+        Distributions, responses and the average score are annotated on `ex_list`, and
+        questions are summarized with question_summaries(), so the cost does not
+        depend on the number of exams, questions or responses.
         """
+        ex_list = list(ex_list.annotate(
+            times_distributed=Count('responseset', distinct=True),
+            num_responses=Count('responseset__examresponse'),
+            average_score=Avg('responseset__examresponse__score')))
+        summaries = question_summaries(ex_list, multiple_choice_only=True)
         exams = []
         for ex in ex_list:
-            qset = ex.multiplechoicequestion_set.all()
-            exam_item = [ex]
-            qs = "Questions: " + len(qset).__str__()
-            concepts = []
-            for q in qset:
-                concept = q.content_object.name
-                if ( len(concepts) <= 5 and concept not in concepts):
-                    concepts.append(q.content_object.name)
-                elif(len(concepts) == 5):
-                    concepts.append("...")
-                    break;
-            concepts = ", ".join(concepts)
-            concepts = "Concepts: " + concepts
-            
-            rsets = ex.responseset_set.all()
-            ##TODO##
-            avgscore = "Average Score: ##"
-            ####
-            numResponses = 0
-            for rset in rsets:
-                numResponses += len(rset.examresponse_set.all())
-                
-            responses = "Responses: " + numResponses.__str__()
-            timesDistributed = "Times Distributed: " + len(rsets).__str__()
-            exid = "Exam Id: " + ex.id.__str__()
-            exam_item = [ex, [qs, responses, exid, avgscore, timesDistributed, concepts]]
-            exams.append(exam_item)
+            num_questions, concepts = summaries.get(ex.id, (0, []))
+            if ex.average_score is None:
+                avgscore = "Average Score: ---"
+            else:
+                avgscore = "Average Score: %s%%" % percent(ex.average_score, num_questions)
+            exams.append([ex, ["Questions: %d" % num_questions,
+                               "Responses: %d" % ex.num_responses,
+                               "Exam Id: %d" % ex.id,
+                               avgscore,
+                               "Times Distributed: %d" % ex.times_distributed,
+                               "Concepts: " + ", ".join(concepts)]])
         return exams
        
     def get_context_data(self,**kwargs):
         context = super(ExamDistIndexView, self).get_context_data(**kwargs)
-        ex_list = Exam.objects.filter(kind=self.exam_kind, stage=ExamStage.DIST)   
         context['distributable'] = self.make_exam_list(
             Exam.objects.filter(kind=self.exam_kind, stage=ExamStage.DIST))
         context['closed'] = self.make_exam_list(
@@ -172,23 +202,9 @@ class ExamDetailView(LoginRequiredMixin,
     def get_data(self, **kwargs):
         """
         Returns 2 dictionaries (in a tuple), each dict maps each concept to a list of
-        all associated questions of that question type.
+        all associated questions of that question type (see get_data()).
         """
-        mc = {}
-        fr = {}
-        for concept in get_concept_list():
-            concept_type = ContentType.objects.get_for_model(concept)
-            fr[concept] = FreeResponseQuestion.objects.filter(exam = self.object,
-                                                              content_type__pk=concept_type.id,
-                                                              object_id=concept.id)
-            mc_qSet= MultipleChoiceQuestion.objects.filter(exam = self.object,
-                                                                content_type__pk=concept_type.id,
-                                                                object_id=concept.id)
-            mc_list = []
-            for q in mc_qSet:
-                mc_list.append([q, q.multiplechoiceoption_set.all()])
-            mc[concept] = mc_list
-        return (fr, mc)
+        return get_data(self.object)
     
     def get_context_data(self, **kwargs):
         context = super(ExamDetailView, self).get_context_data(**kwargs)
@@ -207,6 +223,40 @@ class DevDetailView(DevelopmentMixin,
 class DistDetailView(DistributionMixin,
                      ExamDetailView):
     template_name = 'exam/distribute_detail.html'
+    
+    def get_item_analysis(self):
+        """
+        Returns a dictionary with the item analysis of all submitted responses to the
+        exam (see exam.analytics), or None if there are none. 'items' is a list with
+        [question, difficulty, discrimination, [(option, selection rate), ...]] for
+        each multiple choice question.
+        """
+        analysis = analyze_exam(self.object)
+        if not analysis.num_students:
+            return None
+        difficulty = dict(zip(analysis.items.tolist(), analysis.difficulty().tolist()))
+        discrimination = dict(zip(analysis.items.tolist(), analysis.discrimination().tolist()))
+        rates = analysis.option_rates()
+        options = collections.defaultdict(list)
+        for option in MultipleChoiceOption.objects.filter(question__exam=self.object)\
+                                                  .order_by('index'):
+            options[option.question_id].append((option, rates.get(option.pk, 0)))
+        items = []
+        for question in self.object.multiplechoicequestion_set:
+            if question.pk not in difficulty:
+                continue
+            d = discrimination[question.pk]
+            items.append([question, difficulty[question.pk], None if math.isnan(d) else d,
+                          options[question.pk]])
+        kr20 = analysis.kr20()
+        return {'num_students': analysis.num_students,
+                'kr20': None if math.isnan(kr20) else kr20,
+                'items': items}
+    
+    def get_context_data(self, **kwargs):
+        context = super(DistDetailView, self).get_context_data(**kwargs)
+        context['item_analysis'] = self.get_item_analysis()
+        return context
 
 
 
@@ -306,26 +356,11 @@ class ExamCopyView(LoginRequiredMixin,
                 'description':'%s\n\n[copied from %s]' % (self.object.description, self.object.name)}
 
     def form_valid(self, form):
-        new_exam = Exam.objects.create(name = form.cleaned_data.get('name'),
-                                       description = form.cleaned_data.get('description'),
-                                       randomize = form.cleaned_data.get('randomize'),
-                                       kind = self.exam_kind)
-        for question in self.object.freeresponsequestion_set.all():
-            with transaction.atomic(), reversion.create_revision():
-                question.pk = None
-                question.exam = new_exam
-                question.save()
-        for question in self.object.multiplechoicequestion_set.all():
-            with transaction.atomic(), reversion.create_revision():
-                old_pk = question.pk
-                question.pk = None
-                question.exam = new_exam
-                question.save()
-                old_question = MultipleChoiceQuestion.objects.get(pk=old_pk)
-                for option in old_question.multiplechoiceoption_set.all():
-                    option.pk = None
-                    option.question = question
-                    option.save()
+        self.object.clone(user=self.request.user,
+                          name=form.cleaned_data.get('name'),
+                          description=form.cleaned_data.get('description'),
+                          randomize=form.cleaned_data.get('randomize'),
+                          kind=self.exam_kind)
         return HttpResponseRedirect(self.get_success_url())
     
     def get_success_url(self):
@@ -354,11 +389,10 @@ class ExamDeleteView(LoginRequiredMixin,
     template_name = 'exam/delete_exam.html'
     
     def delete(self, request, *args, **kwargs):
-        for question in self.get_object().question_set.all():
-            versions = reversion.get_for_object(question)
-            for version in versions:
-                version.revision.delete()
-        self.get_object().delete()
+        exam = self.get_object()
+        with transaction.atomic():
+            purge_question_history(exam.question_set.all())
+            exam.delete()
         return HttpResponseRedirect(self.get_success_url())
     
     def get_success_url(self):
@@ -545,6 +579,18 @@ class QuestionVersionView(LoginRequiredMixin,
     
     def get_success_url(self):
         return reverse('exam:detail', args=[self.exam.id], current_app=self.current_app)
+    
+    def get_version_list(self, fingerprints):
+        """
+        Returns the question at each of the versions `fingerprints`, oldest first, each
+        in a list of its own (see exam/versions.html). Only these versions are loaded.
+        """
+        versions = Version.objects.in_bulk([fingerprint.version_id
+                                            for fingerprint in fingerprints])
+        questions = prefetch_generic([versions[fingerprint.version_id].object_version.object
+                                      for fingerprint in reversed(fingerprints)],
+                                     'content_object')
+        return [[question] for question in questions]
 
 
 class FreeResponseVersionView(QuestionVersionView):
@@ -554,8 +600,7 @@ class FreeResponseVersionView(QuestionVersionView):
     def get_context_data(self, **kwargs):
         context = super(FreeResponseVersionView, self).get_context_data(**kwargs)
         context['question_type'] = 'fr'
-        context['version_list'] = [[version.object_version.object]
-            for version in reversed(self.object.get_unique_versions())]
+        context['version_list'] = self.get_version_list(context['form'].fingerprints)
         return context
 
 
@@ -563,7 +608,7 @@ class MultipleChoiceVersionView(QuestionVersionView):
     model = MultipleChoiceQuestion
     form_class = MultipleChoiceVersionForm
     
-    def get_option_list(self):
+    def get_option_list(self, fingerprints):
         """
         Returns a list of lists of MultipleChoiceOptions, oldest version first.
         e.g. l[0] is all MCOs associated with the oldest version.
@@ -571,21 +616,25 @@ class MultipleChoiceVersionView(QuestionVersionView):
         List is reversed so that when items are popped from the list in the template,
         the latest version will come first.
         """
-        l=[]
         option_type = ContentType.objects.get_for_model(MultipleChoiceOption)
-        for version in reversed(self.object.get_unique_versions()):
-            option_versions = version.revision.version_set.filter(content_type__pk=option_type.id)
-            options = list(version.object_version.object for version in option_versions)
-            options.sort(cmp=lambda x,y: cmp(x.index, y.index))
-            l.append(options)
+        option_versions = Version.objects.filter(
+            revision__in=[fingerprint.revision_id for fingerprint in fingerprints],
+            content_type=option_type)
+        options = collections.defaultdict(list)
+        for version in option_versions:
+            option = version.object_version.object
+            if option.question_id == self.object.id:
+                options[version.revision_id].append(option)
+        l=[]
+        for fingerprint in reversed(fingerprints):
+            l.append(sorted(options[fingerprint.revision_id], key=lambda option: option.index))
         return l
         
     def get_context_data(self, **kwargs):
         context = super(MultipleChoiceVersionView, self).get_context_data(**kwargs)
         context['question_type'] = 'mc'
-        context['version_list'] = [[version.object_version.object]
-            for version in reversed(self.object.get_unique_versions())]
-        context['option_list'] = self.get_option_list()
+        context['version_list'] = self.get_version_list(context['form'].fingerprints)
+        context['option_list'] = self.get_option_list(context['form'].fingerprints)
         return context
 
 
@@ -607,10 +656,10 @@ class QuestionDeleteView(LoginRequiredMixin,
     template_name = 'exam/delete_question.html'
     
     def delete(self, request, *args, **kwargs):
-        versions = reversion.get_for_object(self.get_object())
-        self.get_object().delete()
-        for version in versions:
-            version.revision.delete()
+        question = self.get_object()
+        with transaction.atomic():
+            purge_question_history(Question.objects.filter(pk=question.pk))
+            question.delete()
         return HttpResponseRedirect(self.get_success_url())
     
     def get_success_url(self):
@@ -655,7 +704,13 @@ class FinalizeView(LoginRequiredMixin,
         context['exam'] = self.exam
         if self.steps.current =='0':
             form = self.get_form()
-            context['choices_and_objects'] = zip(form['select_questions'], form['select_questions'].field.queryset)
+            questions = prefetch_generic(form['select_questions'].field.queryset,
+                                         'content_object')
+            options = collections.defaultdict(list)
+            for option in MultipleChoiceOption.objects.filter(question__exam=self.exam):
+                options[option.question_id].append(option)
+            context['choices_and_objects'] = zip(form['select_questions'], questions,
+                                                 [options[q.id] for q in questions])
         if self.steps.current == '1':
             form = self.get_form()
             context['question_list'] = [[question] for question in reversed(form.queryset)]
@@ -684,52 +739,6 @@ class FinalizeView(LoginRequiredMixin,
 
 ################################ DISTRIBUTION and RESULTS ##################################
 
-def respSetStats(qStats):
-    """
-    returns list of stats for a response set by putting together a list of stats from each question (qstats)
-    list format is:
-    ["Questions: ##", "Correct Answers:  ##", "Average Score: ##", "Highest Score: ##", "Lowest Score: ##"]
-    """
-    if (qStats):
-        numQuestions = qStats[0][0]
-        numCorrect = 0
-        maxScore = 0
-        lowScore = 100
-        medianScore = 0
-        for stats in qStats:
-            if(stats):
-                numCorrect+=stats[1]
-                if (numQuestions < stats[0]):
-                    numQuestions = stats[0]
-                if (maxScore < stats[2]):
-                    maxScore = stats[2]
-                if (lowScore > stats[2]):
-                    lowScore = stats[2]
-        medianScore = numCorrect / float(numQuestions * len(qStats))
-        medianScore = medianScore *10000 //1 /100
-        return ["Questions: " + numQuestions.__str__(), "Correct answers: " + numCorrect.__str__(), "Average Score: " + medianScore.__str__(), "Highest Score: " + maxScore.__str__(), "Lowest Score: " + lowScore.__str__()]
-    else:
-        return [0,0,0,0,0]
-    
-
-def qstats(mcRespSet):
-    """
-    processes a multiplechoiceresponse_set for an exam and
-    returns a list with [numquestions, numcorrect, percent correct]
-    """
-    numQuestions = 0
-    numCorrect = 0
-    for question in mcRespSet:
-        
-        numQuestions+=1
-        if question.option_id == question.question.correct_option.id:     #later if option_id == correct_id
-            numCorrect+=1
-    if (numQuestions != 0):
-        percCorrect = numCorrect/float(numQuestions)
-        percFormatted = percCorrect * 10000 //1 /100
-        return [numQuestions, numCorrect, percFormatted]
-    
-
 class ResponseSetIndexView(LoginRequiredMixin,
                            CurrentAppMixin,
                            DistributionMixin,
@@ -758,31 +767,86 @@ class ResponseSetDetailView(LoginRequiredMixin,
     pk_url_kwarg = 'rs_id'
     model = ResponseSet
     
-    def set_stats(self):
-        responses = self.object.examresponse_set.all().order_by('respondent')
-        stats = []
-        if not self.exam.is_survey():
-            for mcrs in responses:
-                stats.append(qstats(mcrs.multiplechoiceresponse_set.all()))
-            set_stats = respSetStats(stats)
-        else:
-            set_stats = []
-            for frset in responses:
-                stats.append(frset.freeresponseresponse_set.all())
-        return set_stats
+    def get_stats(self):
+        """
+        Returns the precomputed ResponseSetStats row (see TakeTestView.form_valid), or
+        None if nobody has submitted yet.
+        """
+        try:
+            return self.object.stats
+        except ResponseSetStats.DoesNotExist:
+            return None
     
     def get_context_data(self, **kwargs):
+        """
+        The summary comes from the stored ResponseSetStats and the percent correct by
+        question from one aggregate query, so nothing is graded here.
+        """
         context = super(ResponseSetDetailView, self).get_context_data(**kwargs)
         context['exam'] = self.exam
         context['response_set'] = self.object
         context['responses'] = self.object.examresponse_set.filter(submitted__isnull=False)
         context['pending'] = self.object.examresponse_set.filter(submitted__isnull=True)
-        context['stats'] = self.set_stats()
+        if self.exam.is_survey():
+            context['stats'] = []
+        else:
+            stats = self.get_stats()
+            context['stats'] = stats.as_list() if stats else [0, 0, 0, 0, 0]
+            num_students = stats.count if stats else 0
+            correct = question_correct_counts(self.object.examresponse_set.all())
+            context['question_stats'] = [(question, percent(correct.get(question.pk, 0),
+                                                            num_students))
+                                         for question in self.exam.multiplechoicequestion_set]
         context['user_is_uploader_or_staff'] =\
             (self.request.user.is_staff or self.request.user.profile==self.object.instructor)
         return context
 
 
+class ExportView(LoginRequiredMixin,
+                 UserPassesTestMixin,
+                 CurrentAppMixin,
+                 ResultsMixin,
+                 generic.View):
+    """
+    Streams the submitted responses of a ResponseSet ('rs_id') or of a whole Exam
+    ('exam_id') as a CSV file. See exam.export.
+    
+    The layout is chosen with the GET parameter 'layout': 'wide' (default, one row
+    per respondent) or 'long' (one row per answer).
+    
+    A ResponseSet can be exported by its instructor or a staff user; a whole Exam
+    only by a staff user. Results can still be exported once the exam is closed.
+    """
+    raise_exception = True
+    redirect_unauthenticated_users = True
+    
+    def test_func(self, user):
+        """
+        This function is required by the UserPassesTestMixin.
+        """
+        if user.is_staff:
+            return True
+        if self.kwargs.get('rs_id'):
+            response_set = get_object_or_404(ResponseSet, pk=self.kwargs['rs_id'])
+            return user.profile == response_set.instructor
+        return False
+    
+    def get(self, request, *args, **kwargs):
+        layout = request.GET.get('layout', 'wide')
+        if layout not in export.LAYOUTS:
+            raise Http404
+        if self.kwargs.get('rs_id'):
+            response_set = get_object_or_404(ResponseSet, pk=self.kwargs['rs_id'])
+            rows = export.response_set_rows(response_set, layout)
+            filename = 'response_set_%d_%s.csv' % (response_set.pk, layout)
+        else:
+            rows = export.exam_rows(self.exam, layout)
+            filename = 'exam_%d_%s.csv' % (self.exam.pk, layout)
+        response = StreamingHttpResponse(export.csv_lines(rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+
 class ExamResponseDetailView(LoginRequiredMixin,
                              CurrentAppMixin,
                              DistributionMixin,
@@ -792,29 +856,32 @@ class ExamResponseDetailView(LoginRequiredMixin,
     pk_url_kwarg = 'key'
     
     def make_question_list(self):
-        multiple_choice_responses = self.object.multiplechoiceresponse_set.all()
-        free_response_responses = self.object.freeresponseresponse_set.all()
-        
+        """
+        Questions and options come from Exam.get_paper(), and the answers are read with
+        one query per kind of question.
+        """
+        questions, options = self.exam.get_paper()
+        chosen = dict(self.object.multiplechoiceresponse_set.values_list('question_id',
+                                                                         'option_id'))
+        answers = dict(self.object.freeresponseresponse_set.values_list('question_id',
+                                                                        'response'))
         question_list = []
-        for question in self.object.response_set.exam.question_set.all():
+        for question in questions:
             if question.is_multiple_choice:
-                response = multiple_choice_responses.get(question=question)
-                q = {'question':question, 'chosen':response.option_id}
-                qOptions = []
-                qOptions.extend(question.multiplechoiceoption_set.all())
-                q['options']=qOptions
-                question_list.append(q)
+                question_list.append({'question':question,
+                                      'chosen':chosen.get(question.id),
+                                      'options':options.get(question.id, [])})
             else:
-                response = free_response_responses.get(question=question)
-                q = {'question':question, 'answer':response.response}
-                question_list.append(q)
+                question_list.append({'question':question,
+                                      'answer':answers.get(question.id)})
         return question_list
     
     def get_context_data(self, **kwargs):
         context = super(ExamResponseDetailView, self).get_context_data(**kwargs)      
         context['exam'] = self.exam
         context['response'] = self.object
-        context['stats'] = qstats(self.object.multiplechoiceresponse_set.all())
+        report = grade_responses(self.exam, ExamResponse.objects.filter(pk=self.object.pk))
+        context['stats'] = report.response_stats(self.object.pk)
         context['question_list'] = self.make_question_list()
         return context
     
@@ -929,41 +996,38 @@ class DistributeView(LoginRequiredMixin,
     
     def form_valid(self, form):
         """
-        Create new ExamResponses and *QuestionResponses for each email address listed.
+        Create new ExamResponses and *QuestionResponses for each email address listed,
+        then queue their invitations. See ResponseSet.distribute() and exam.mailer;
+        the emails themselves are sent by the `send_invitations` command.
         
-        TODO: apply filter by modules
+        ExamResponses to be re-sent are deleted and a new ExamResponse is created for
+        their email address. If another distribution to the same addresses commits
+        first, nothing is created and the form is shown again with an error.
         """
         # Get submitted data from form
         date = form.cleaned_data.get('expiration_date')
         time = form.cleaned_data.get('expiration_time')
         expiration_datetime = datetime.datetime.combine(date, time)
         to_send = form.cleaned_data.get('recipients') # a list of email strings
+        resend = form.cleaned_data.get('resend') # a list of ExamResponses
         
-        # For each ExamResponse to be re-sent, delete the existing ER and add its
-        # email to the list of emails to_send.
-        for response in form.cleaned_data.get('resend'): # a list of ExamResponses
-            to_send.append(response.respondent)
-            response.delete()
-            
-        # For each email in the recipient list, create a new ExamResponse and create
-        # associated FreeResponse- and MultipleChoiceResponses for every question
-        # in the selected modules.
-        for email in to_send:
-            
-            # If there is already an ExamResponse for this email, do not make a new one.
-            # This situation will arise if an email is given twice in the recipients field.
-            if not self.object.examresponse_set.filter(respondent__exact=email):
-                exam_response = ExamResponse.objects.create(response_set=self.object,
-                                                            respondent=email,
-                                                            expiration_datetime=expiration_datetime)
-                # TODO: instead of all(), filter by module
-                for question in self.object.exam.freeresponsequestion_set.all():
-                    FreeResponseResponse.objects.create(question=question,
-                                                        exam_response=exam_response)
-                for question in self.object.exam.multiplechoicequestion_set.all():
-                    MultipleChoiceResponse.objects.create(question=question,
-                                                      exam_response=exam_response)
-                exam_response.send(self.request, email)    
+        try:
+            exam_responses, self.summary = self.object.distribute(to_send,
+                                                                  expiration_datetime,
+                                                                  resend=resend)
+        except IntegrityError:
+            form._errors[NON_FIELD_ERRORS] = form.error_class([
+                'Some of these addresses were sent the exam at the same time by '
+                'someone else. Please check the list of responses and try again.'])
+            return self.form_invalid(form)
+        ExamInvitation.queue(exam_responses, self.request)
+        
+        counts = collections.Counter(self.summary.values())
+        messages.add_message(self.request, messages.INFO,
+            'Queued: %d, re-queued: %d, skipped (already sent): %d' %
+            (counts[ResponseSet.created_response],
+             counts[ResponseSet.resent_response],
+             counts[ResponseSet.duplicate_response]))
         return HttpResponseRedirect(self.get_success_url())
 
 
@@ -1005,8 +1069,8 @@ class CleanupView(LoginRequiredMixin,
     """
     A view for staff to manually delete expired, unsubmitted ExamResponses.
     
-    This cleanup does not happen automatically, but this S.O. post suggests a good design,
-    in case automatic cleanup is desired.  http://stackoverflow.com/a/11789141
+    The `cleanup_responses` management command does the same, e.g. from cron, as this
+    S.O. post suggests.  http://stackoverflow.com/a/11789141
     """
     template_name = 'exam/cleanup.html'
     form_class = CleanupForm
@@ -1017,17 +1081,14 @@ class CleanupView(LoginRequiredMixin,
         Pass the list of expired, unsubmitted ERs to the template
         """
         context = super(CleanupView, self).get_context_data(**kwargs)
-        context['expired'] = ExamResponse.objects.filter(
-            expiration_datetime__lt=timezone.now()).filter(submitted__isnull=True)
+        context['expired'] = ExamResponse.objects.expired()
         return context
     
     def form_valid(self, form):
         """
         Delete expired, unsubmitted ERs. This also deletes the associated *QuestionResponses.
         """
-        for exam_response in ExamResponse.objects.filter(
-            expiration_datetime__lt=timezone.now()).filter(submitted__isnull=True):
-                exam_response.delete()
+        ExamResponse.objects.delete_expired()
         return HttpResponseRedirect(self.get_success_url())
 
 
@@ -1039,6 +1100,26 @@ class TakeTestIRBView(generic.DetailView):
     model = ExamResponse
     template_name = 'exam/take_test_IRB.html'
 
+    def get_queryset(self):
+        return ExamResponse.objects.select_related('response_set__exam')
+    
+    def get_object(self, queryset=None):
+        """
+        The ExamResponse is fetched once per request (dispatch() needs it too).
+        """
+        if not hasattr(self, '_exam_response'):
+            self._exam_response = super(TakeTestIRBView, self).get_object(queryset)
+        return self._exam_response
+    
+    def get_context_data(self, **kwargs):
+        """
+        The consent text is cached per Exam (see take_test_IRB.html).
+        """
+        context = super(TakeTestIRBView, self).get_context_data(**kwargs)
+        context['exam'] = self.object.response_set.exam
+        context['exam_paper_timeout'] = EXAM_PAPER_CACHE_TIMEOUT
+        return context
+
     def dispatch(self, *args, **kwargs):
         """
         Check that the ExamResponse is available.
@@ -1063,6 +1144,17 @@ class TakeTestView(generic.UpdateView):
     template_name='exam/take_test.html'
     form_class = ExamResponseForm
     
+    def get_queryset(self):
+        return ExamResponse.objects.select_related('response_set__exam')
+    
+    def get_object(self, queryset=None):
+        """
+        The ExamResponse is fetched once per request (dispatch() needs it too).
+        """
+        if not hasattr(self, '_exam_response'):
+            self._exam_response = super(TakeTestView, self).get_object(queryset)
+        return self._exam_response
+    
     def dispatch(self, *args, **kwargs):
         """
         Check that the ExamResponse is available.
@@ -1076,23 +1168,38 @@ class TakeTestView(generic.UpdateView):
     
     def get_context_data(self, **kwargs):
         """
-        Pass the list of expired, unsubmitted ERs to the template
+        Pass (field, question) pairs to the template. The questions were already
+        loaded by the form. While the form is unbound, the rendered questions are the
+        same for every respondent, so take_test.html caches them per Exam and stage.
         """
         context = super(TakeTestView, self).get_context_data(**kwargs)
-        form = self.get_form(self.form_class)
-        fields = list(form)
-        questions = self.object.response_set.exam.question_set.all()
-        context['questions'] = zip(form, questions)
+        context['questions'] = context['form'].question_fields()
+        context['exam'] = self.object.response_set.exam
+        context['exam_paper_timeout'] = EXAM_PAPER_CACHE_TIMEOUT
         return context
     
     def form_valid(self, form):
         """
         Mark the time the exam has been submitted, and call the form's save() method,
-        which saves the responses.
+        which saves the responses. The response is graded and its score is added to
+        the ResponseSet's stats in the same transaction.
+        
+        The submission is claimed with a conditional UPDATE, so when the same exam is
+        submitted twice at once (both requests passed is_available()), only the first
+        one is saved and counted in the stats; the other goes to "Exam Unavailable".
         """
-        form.save()
-        self.object.submitted = timezone.now()
-        self.object.save()
+        with transaction.atomic():
+            submitted = timezone.now()
+            claimed = ExamResponse.objects.filter(pk=self.object.pk, submitted__isnull=True)\
+                                          .update(submitted=submitted)
+            if not claimed:
+                return HttpResponseRedirect(reverse('exam_unavailable'))
+            form.save()
+            self.object.submitted = submitted
+            response_set = self.object.response_set
+            if not response_set.exam.is_survey():
+                ResponseSetStats.add_score(response_set, self.object.grade())
+            self.object.save()
         return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
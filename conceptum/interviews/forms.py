@@ -7,7 +7,7 @@ from django.contrib.auth import get_user_model
 # <<<<<<< HEAD
 # from .models import Interview, Excerpt, get_concept_list, ConceptExcerpt, TopicTag
 #=======
-from .models import InterviewGroup, Interview, Excerpt, ConceptExcerpt, TopicTag, get_concept_list
+from .models import InterviewGroup, Interview, Excerpt, ConceptExcerpt, TopicTag, get_cached_concepts
 
 
 User = get_user_model()
@@ -36,7 +36,7 @@ class AddForm(forms.ModelForm):
         if not self.group:
             self.fields["group"] = forms.ModelChoiceField(
                 queryset=InterviewGroup.objects.filter(unlocked=True, is_concept = False))
-        for concept in get_concept_list():
+        for concept in get_cached_concepts():
             # TODO: when get_concept_list is fixed, we may need to update this line
             self.fields["response_%d" % concept.id] = \
                 forms.CharField(label=_("%s response" % concept),
@@ -59,7 +59,7 @@ class AddForm(forms.ModelForm):
             i.group = self.cleaned_data.get('group')
         i.save()
         
-        for concept in get_concept_list():
+        for concept in get_cached_concepts():
             # TODO: when get_concept_list is fixed, may need to update this line
             response = self.cleaned_data.get("response_%d" % concept.id)
             # if a response was left blank, an Excerpt is not created
@@ -83,7 +83,7 @@ class EditForm(forms.ModelForm):
         initial data.
         """
         super(EditForm, self).__init__(*args, **kwargs)        
-        for concept in get_concept_list():         
+        for concept in get_cached_concepts():         
             self.fields["response_%d" % concept.id] = \
                 forms.CharField(label=_("%s response" % concept),
                                 required=False,
@@ -100,7 +100,7 @@ class EditForm(forms.ModelForm):
         i.interviewee = self.cleaned_data.get('interviewee')
         i.date_of_interview =  self.cleaned_data.get('date_of_interview')
         i.save()
-        for concept in get_concept_list():
+        for concept in get_cached_concepts():
             # TODO: when get_concept_list is fixed, may need to update this line
             response = self.cleaned_data.get("response_%d" % concept.id)
             if i.excerpt_set.filter(object_id=concept.id):
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_syncdb
+
+from interviews import models as interviews_models
+
+
+def seed_concepts(sender, created_models, **kwargs):
+    """
+    Seeds the concepts when syncdb creates their table, as it does for the test
+    database (South migrations are not run there). With South, migration 0007 does it.
+    """
+    if interviews_models.DummyConcept in created_models:
+        interviews_models.seed_concepts()
+
+post_syncdb.connect(seed_concepts, sender=interviews_models)
@@ -4,6 +4,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.core.urlresolvers import reverse
 
+from conceptum import caching
+
 class DummyConcept(models.Model):
     """
     this model is temporary.  See get_concept_list() below
@@ -14,19 +16,42 @@ class DummyConcept(models.Model):
         return self.name
 
 
+CONCEPT_NAMES = ['Concept A', 'Concept B', 'Concept C', 'Concept D']
+
+
+def seed_concepts():
+    """
+    Creates the concepts of CONCEPT_NAMES that do not exist yet. This is done by
+    migration 0007 and when syncdb creates the table (see interviews.management),
+    never on reads.
+    """
+    existing = set(DummyConcept.objects.filter(name__in=CONCEPT_NAMES)
+                                       .values_list('name', flat=True))
+    missing = [name for name in CONCEPT_NAMES if name not in existing]
+    if missing:
+        DummyConcept.objects.bulk_create([DummyConcept(name=name) for name in missing])
+        caching.invalidate('concepts')
+
+
 def get_concept_list():
     """
     this method is temporary.  Its anticipated replacement is a method in the
     ConceptNode class that will return a list of leaf nodes.
-    """
 
-    DummyConcept.objects.get_or_create(name='Concept A')
-    DummyConcept.objects.get_or_create(name='Concept B')
-    DummyConcept.objects.get_or_create(name='Concept C')
-    DummyConcept.objects.get_or_create(name='Concept D')
+    Returns a lazy queryset: nothing is read until it is evaluated.
+    """
     return DummyConcept.objects.all()
 
 
+def get_cached_concepts():
+    """
+    Returns get_concept_list() as a list, from the cache when possible.
+    """
+    return caching.get_or_set('concepts', ['list'], lambda: list(get_concept_list()))
+
+caching.invalidate_on('concepts', DummyConcept)
+
+
 class InterviewGroup(models.Model):
     name = models.CharField(max_length=255)
     unlocked = models.BooleanField(default=True)
@@ -1,14 +1,17 @@
 import datetime
 from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 
 from allauth.account.models import EmailAddress
 
 from profiles.models import ContributorProfile
-from .models import Interview, Excerpt, get_concept_list
+from .models import Interview, Excerpt, get_concept_list, get_cached_concepts, CONCEPT_NAMES
+from .forms import AddForm, EditForm
 
 User = get_user_model()
 
@@ -72,6 +75,25 @@ def create_excerpt(interview, index=0, response='This is a response'):
     excerpt.save()
     return excerpt
 
+class ConceptListTest(TestCase):
+    def test_concept_list(self):
+        # the concepts are seeded with the tables, reading them writes nothing
+        with CaptureQueriesContext(connection) as queries:
+            concepts = get_concept_list()
+        self.assertEqual(len(queries), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sorted(concept.name for concept in concepts), CONCEPT_NAMES)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('INSERT', queries[0]['sql'])
+    
+    def test_form_construction(self):
+        get_cached_concepts()
+        with CaptureQueriesContext(connection) as queries:
+            add_form = AddForm(group=None)
+            EditForm()
+        self.assertEqual(len(queries), 0)
+        self.assertIn('response_%d' % get_concept_list()[0].id, add_form.fields)
+
 class FormsTest(TestCase):
     def setUp(self):
         self.user = set_up_user()
@@ -1,3 +1,5 @@
+import collections
+
 from django.shortcuts import get_object_or_404
 
 from django.core.exceptions import PermissionDenied
@@ -10,13 +12,14 @@ from django.http import HttpResponseRedirect
 
 from braces.views import LoginRequiredMixin, UserPassesTestMixin, StaffuserRequiredMixin
 
+from conceptum.relations import prefetch_generic
 from profiles.mixins import ContribRequiredMixin
 # <<<<<<< HEAD
 # from .models import Interview, ConceptExcerpt, TopicTag
 # from .forms import AddForm, EditForm, ConceptExcerptAddForm, ConceptInterviewAddForm, \
 #                     ConceptInterviewEditForm
 # =======
-from .models import Interview, InterviewGroup, ConceptExcerpt, TopicTag
+from .models import Interview, InterviewGroup, Excerpt, ConceptExcerpt, TopicTag
 from .forms import AddForm, EditForm, ConceptInterviewAddForm, ConceptExcerptAddForm, \
                     ConceptInterviewEditForm, ConceptExcerptEditForm
                     
@@ -84,9 +87,14 @@ class GroupView(LoginRequiredMixin,
         The template should use the boolean user_can_edit to do this check
         """
         context = super(GroupView, self).get_context_data(**kwargs)
+        # all excerpts of the group and their concepts are read at once
+        excerpt_sets = collections.defaultdict(list)
+        for exc in prefetch_generic(Excerpt.objects.filter(interview__group=self.object),
+                                    'content_object'):
+            excerpt_sets[exc.interview_id].append(exc)
         interview_list = []
         for intv in self.object.interview_set.all():
-            excerpts_obj = intv.excerpt_set.all()
+            excerpts_obj = excerpt_sets[intv.id]
             excerpts = []
             for exc in excerpts_obj:
                 excerpts.append(exc.content_object.name)
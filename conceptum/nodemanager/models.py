@@ -1,11 +1,15 @@
 # Defines the models for the nodemanager class
 
 from django.db import models
+from django.db.models import Q
 from mptt.models import MPTTModel, TreeForeignKey #for tree structure
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes import generic
 
-from ranking.models import RankingProcess
+from conceptum import caching
+from profiles.models import ContributorProfile
+from ranking.models import RankingProcess, ValueCounter
 
 class CITreeInfo(models.Model):
     """
@@ -33,6 +37,24 @@ class CITreeInfo(models.Model):
 
     @staticmethod
     def get_master_tree_root():
+        """
+        Returns the root node of the master concept hierarchy, or None. Only
+        the root's id is cached (see conceptum.caching), so the node itself is
+        always read fresh.
+        """
+        root_id = caching.get_or_set('master_tree', ['root'],
+                                     CITreeInfo.find_master_tree_root_id)
+        if root_id is None:
+            return None
+        return ConceptNode.objects.get(pk=root_id)
+
+    @staticmethod
+    def find_master_tree_root_id():
+        root = CITreeInfo.find_master_tree_root()
+        return root.pk if root is not None else None
+
+    @staticmethod
+    def find_master_tree_root():
         """
         This function the root node of the master concept hierarchy. There
         should only be one of them.
@@ -143,6 +165,19 @@ class ConceptNode(MPTTModel):
         User = get_user_model()
         return User.objects.filter(is_staff=True)
 
+    def has_visited(self, user):
+        """
+        Returns whether `user` has visited this node, with one query.
+        """
+        return self.user.filter(pk=user.pk).exists()
+
+    def is_admin(self, user):
+        """
+        Returns whether `user` is one of the admins of this node (see
+        admin_set), without a query.
+        """
+        return user.is_authenticated() and user.is_staff
+
     def is_active(self):
         """
         Returns whether or not the node is has finished all processes.
@@ -167,12 +202,10 @@ class ConceptNode(MPTTModel):
                                  #process here
         elif self.node_type == self.rank:
             # if we are transitioning from the ranking process, we
-            # export the top choices as new nodes and close both the
-            # node and the ranking process
+            # export the ranked choices, best first, as new nodes and
+            # close both the node and the ranking process
             ranking_process = RankingProcess.objects.filter(object_id=self.id, content_type=ContentType.objects.get_for_model(self)).get()
-            ranking_process.status = ranking_process.closed
-            ranking_process.save()
-            self.add_atoms_as_new_nodes(ranking_process.get_rank_choices())
+            self.add_atoms_as_new_nodes(ranking_process.close())
             self.node_type = self.closed
 
         #transition means a new stage of the stage 1 process has begun
@@ -184,47 +217,33 @@ class ConceptNode(MPTTModel):
 
     def check_users_visited(self):
         """
-        Check if all the users have visited the node.
+        Check if all the users (contributors and staff, see
+        eligible_users) have visited the node, with one query: whether
+        any of them is missing from the node's visitors.
         """
-        User = get_user_model()
-        fullset = (User.objects.filter(profile__is_contrib=True) | User.objects.filter(is_staff=True)).distinct()
-
-        if set(self.users_contributed_set()) == set(fullset):
-            return True
-        else:
-            return False
+        return not eligible_users().exclude(pk__in=self.user.values('pk')).exists()
 
     def check_admin_visited(self):
         """
         Check if an admin has visited the node
         """
-
-        if not set(self.admin_set()).isdisjoint(set(self.users_contributed_set())):
-            return True
-        else:
-            return False
+        return self.user.filter(is_staff=True).exists()
 
     def get_contribution_sets(self):
         """
         Return a dictionary containing two keys: 'contributed' and 'notcontributed',
         whose values are lists of strings with the name/email address of the users
         who have and have not yet contributed to this node.
-        """
-
-        User = get_user_model()
-        fullset = (User.objects.filter(profile__is_contrib=True) | User.objects.filter(is_staff=True)).distinct()
-        fullset = set(fullset)
 
-        contributor_set = set(self.users_contributed_set())
-
-        contributors = list()
-        non_contributors = list()
-
-        for c in contributor_set:
-            contributors.append('%s <%s>' % (c.name, c.email))
+        Only the visitors are read; the eligible users come from the cache (see
+        get_participants).
+        """
 
-        for nc in fullset.difference(contributor_set):
-            non_contributors.append('%s <%s>' % (nc.name, nc.email))
+        visitors = list(self.user.values_list('pk', 'name', 'email'))
+        contributors = sorted('%s <%s>' % (name, email) for pk, name, email in visitors)
+        visited = set(pk for pk, name, email in visitors)
+        non_contributors = sorted(label for pk, label in get_participants().items()
+                                  if pk not in visited)
 
         result = { 'contributed': contributors,
                    'notcontributed': non_contributors }
@@ -283,6 +302,9 @@ class ConceptAtom(models.Model):
     # many atoms can only be merged under one single atom
     merged_atoms = models.ForeignKey('self', null=True, on_delete=models.SET_NULL)
 
+    # the counters of the atom in ranking processes (one per process)
+    value_counters = generic.GenericRelation(ValueCounter)
+
     def __unicode__(self):
         return self.text
 
@@ -317,3 +339,29 @@ class ConceptAtom(models.Model):
         """ Get all atoms merged under this one."""
 
         return ConceptAtom.objects.filter(merged_atoms__pk=self.pk)
+
+
+def eligible_users():
+    """
+    Returns a queryset of the users who take part in the stage 1 process:
+    contributors and staff.
+    """
+    User = get_user_model()
+    return User.objects.filter(Q(profile__is_contrib=True) | Q(is_staff=True))
+
+
+def get_participants():
+    """
+    Returns a dictionary that maps the id of each eligible user (see
+    eligible_users) to their name and email address. The dictionary is cached
+    (see conceptum.caching) until a user or a contributor profile changes.
+    """
+    return caching.get_or_set('participants', ['labels'], lambda: dict(
+        (pk, '%s <%s>' % (name, email))
+        for pk, name, email in eligible_users().values_list('pk', 'name', 'email')))
+
+
+caching.invalidate_on('master_tree', CITreeInfo)
+caching.invalidate_on(lambda node: 'master_tree' if node.parent_id is None else None,
+                      ConceptNode)
+caching.invalidate_on('participants', get_user_model(), ContributorProfile)
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from nodemanager.models import CITreeInfo, ConceptNode, eligible_users, get_participants
+from profiles.models import ContributorProfile
+
+User = get_user_model()
+
+
+class StageCompletionTest(TestCase):
+
+    def setUp(self):
+        self.node = ConceptNode.objects.create(ci_tree_info=CITreeInfo.objects.create(),
+                                               content='node')
+        self.staff = self.create_user('staff', is_staff=True)
+        self.contributor = self.create_user('contrib', is_contrib=True)
+        self.outsider = self.create_user('outsider')
+        # users left over by other tests have visited too
+        self.node.user.add(*eligible_users().exclude(pk__in=[self.staff.pk,
+                                                             self.contributor.pk]))
+
+    def create_user(self, name, is_staff=False, is_contrib=False):
+        user = User.objects.create_user('%s@stage.test' % name, password='password',
+                                        name=name, is_staff=is_staff)
+        ContributorProfile.objects.create(user=user, is_contrib=is_contrib)
+        return user
+
+    def test_check_users_visited(self):
+        self.node.user.add(self.staff, self.outsider)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(self.node.check_users_visited())
+        self.assertEqual(len(queries), 1)
+        self.node.user.add(self.contributor)
+        self.assertTrue(self.node.check_users_visited())
+
+        # a contributor who joins later has to visit too
+        self.outsider.profile.is_contrib = True
+        self.outsider.profile.save()
+        self.node.user.remove(self.outsider)
+        self.assertFalse(self.node.check_users_visited())
+
+    def test_check_admin_visited(self):
+        self.node.user.remove(*self.node.user.filter(is_staff=True))
+        self.node.user.add(self.contributor)
+        self.assertFalse(self.node.check_admin_visited())
+        self.node.user.add(self.staff)
+        self.assertTrue(self.node.check_admin_visited())
+
+    def test_is_admin_and_has_visited(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.node.is_admin(self.staff))
+            self.assertFalse(self.node.is_admin(self.contributor))
+            self.assertFalse(self.node.is_admin(AnonymousUser()))
+        self.assertEqual(len(queries), 0)
+        self.node.user.add(self.contributor)
+        self.assertTrue(self.node.has_visited(self.contributor))
+        self.assertFalse(self.node.has_visited(self.staff))
+
+    def test_get_contribution_sets(self):
+        self.node.user.add(self.contributor)
+        get_participants()
+        with CaptureQueriesContext(connection) as queries:
+            sets = self.node.get_contribution_sets()
+        # only the visitors are read
+        self.assertEqual(len(queries), 1)
+        self.assertIn('contrib <contrib@stage.test>', sets['contributed'])
+        self.assertEqual(sets['notcontributed'], ['staff <staff@stage.test>'])
+
+        # the cached participants change with the profiles
+        self.outsider.profile.is_contrib = True
+        self.outsider.profile.save()
+        self.assertEqual(self.node.get_contribution_sets()['notcontributed'],
+                         ['outsider <outsider@stage.test>', 'staff <staff@stage.test>'])
+        self.staff.is_staff = False
+        self.staff.save()
+        self.assertEqual(self.node.get_contribution_sets()['notcontributed'],
+                         ['outsider <outsider@stage.test>'])
@@ -44,7 +44,7 @@ def entry(request, node, context):
     atoms = ConceptAtom.objects.filter(concept_node=node.id).filter(user=request.user)
 
     # If the user has already visited, show them their picks
-    if request.user in node.users_contributed_set():
+    if node.has_visited(request.user):
         context['atoms'] = atoms
         return render(request, 'nodemanager/node_finalizedentry.html', context)
 
@@ -144,7 +144,7 @@ def finalize(request, node_id):
         raise PermissionDenied
 
     node = get_object_or_404(ConceptNode,pk=node_id)
-    if not request.user in node.users_contributed_set(): #no duplicates
+    if not node.has_visited(request.user): #no duplicates
         node.user.add(request.user)
 
     if node.is_stage_finished():
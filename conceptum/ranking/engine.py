@@ -0,0 +1,135 @@
+"""
+Aggregation of ranked (hierarchical) ballots.
+
+The ballots of a ranking process are loaded into a dense NumPy matrix with one row per
+ballot and one column per candidate, holding the rank each voter gave each candidate
+(1 is the most preferred). Candidates a voter did not rank share the last place. Every
+method is computed in vectorized form from that matrix, or from the pairwise
+preference matrix derived from it:
+
+    profile = RankProfile.from_rows(candidates, rows)
+    profile.pairwise()           # d[i, j]: voters who prefer candidate i to candidate j
+    profile.borda()              # Borda count of each candidate
+    profile.instant_runoff()     # round in which each candidate was eliminated
+    profile.schulze()            # candidates each one beats by strongest paths
+    profile.order('schulze')     # candidate ids, best first
+    profile.ranked('schulze')    # (candidate id, score) pairs, best first
+
+Higher scores are better for all methods.
+"""
+
+import numpy as np
+
+METHODS = ('borda', 'instant_runoff', 'schulze')
+
+
+class RankProfile(object):
+    """
+    Ranked ballots for a set of candidates.
+
+    Attributes:
+        candidates: array of candidate ids, one per column.
+
+        ranks: float array (ballots x candidates) of the rank each voter gave each
+            candidate, inf where the voter did not rank the candidate.
+    """
+    def __init__(self, candidates, ranks):
+        self.candidates = np.asarray(candidates)
+        self.ranks = np.asarray(ranks, dtype=float).reshape(len(ranks), len(self.candidates))
+
+    @classmethod
+    def from_rows(cls, candidates, rows):
+        """
+        Builds a RankProfile from (ballot id, candidate id, rank) rows. Rows of
+        candidates that are not in `candidates` are ignored.
+        """
+        column = dict((candidate, i) for i, candidate in enumerate(candidates))
+        rows = [row for row in rows if row[1] in column]
+        count = len(rows)
+        ballots = {}
+        ballot_index = np.fromiter((ballots.setdefault(row[0], len(ballots)) for row in rows),
+                                   np.intp, count)
+        ranks = np.full((len(ballots), len(column)), np.inf)
+        ranks[ballot_index, np.fromiter((column[row[1]] for row in rows), np.intp, count)] = \
+            np.fromiter((row[2] for row in rows), float, count)
+        return cls(candidates, ranks)
+
+    @property
+    def num_ballots(self):
+        return self.ranks.shape[0]
+
+    @property
+    def num_candidates(self):
+        return self.ranks.shape[1]
+
+    def pairwise(self):
+        """
+        Pairwise preference matrix: d[i, j] is the number of voters who rank candidate
+        i above candidate j. A ranked candidate is above every unranked one.
+        """
+        return (self.ranks[:, :, np.newaxis] < self.ranks[:, np.newaxis, :]).sum(axis=0)
+
+    def borda(self):
+        """
+        Borda count: each voter gives a candidate one point for every candidate it
+        ranks below it.
+        """
+        return self.pairwise().sum(axis=1)
+
+    def instant_runoff(self):
+        """
+        Instant-runoff voting. In each round every ballot counts for its most preferred
+        remaining candidate, and the candidates with the fewest votes are eliminated
+        (all of them, if they tie). A candidate's score is the round in which it was
+        eliminated, so the winner has the highest score.
+        """
+        scores = np.zeros(self.num_candidates, dtype=int)
+        remaining = np.ones(self.num_candidates, dtype=bool)
+        round_number = 0
+        while remaining.any():
+            round_number += 1
+            ranks = np.where(remaining, self.ranks, np.inf)
+            counted = np.isfinite(ranks.min(axis=1))
+            votes = np.bincount(ranks.argmin(axis=1)[counted], minlength=self.num_candidates)
+            eliminated = remaining & (votes == votes[remaining].min())
+            scores[eliminated] = round_number
+            remaining &= ~eliminated
+        return scores
+
+    def schulze(self):
+        """
+        Schulze method: the strength of the strongest path between every pair of
+        candidates is computed with a vectorized Floyd-Warshall over the pairwise
+        matrix. A candidate's score is the number of candidates it beats, i.e. whose
+        strongest path back to it is weaker.
+        """
+        d = self.pairwise()
+        strength = np.where(d > d.T, d, 0)
+        for k in range(self.num_candidates):
+            strength = np.maximum(strength, np.minimum(strength[:, k, np.newaxis],
+                                                       strength[np.newaxis, k, :]))
+        np.fill_diagonal(strength, 0)
+        return (strength > strength.T).sum(axis=1)
+
+    def scores(self, method):
+        """
+        Scores of `method`, one of METHODS.
+        """
+        if method not in METHODS:
+            raise ValueError("Unknown ranking method: %s" % method)
+        return getattr(self, method)()
+
+    def ranked(self, method):
+        """
+        (candidate id, score) pairs ordered by the scores of `method`, best first.
+        Tied candidates keep their order in `candidates`.
+        """
+        scores = self.scores(method)
+        order = np.argsort(-scores, kind='mergesort')
+        return zip(self.candidates[order].tolist(), scores[order].tolist())
+
+    def order(self, method):
+        """
+        Candidate ids ordered by the scores of `method`, best first (see ranked()).
+        """
+        return [candidate for candidate, score in self.ranked(method)]
@@ -1,3 +1,5 @@
+import operator
+
 from django import forms
 from django.contrib.contenttypes.models import ContentType
 
@@ -24,7 +26,7 @@ def get_ranking_process(node):
 class RankingProcessSetupForm(forms.ModelForm):
     class Meta:
         model = RankingProcess
-        fields = ['value_choices']
+        fields = ['value_choices', 'aggregation']
 
 class BinaryChoiceForm(forms.Form):
     final_choices = forms.ModelMultipleChoiceField(
@@ -39,14 +41,47 @@ class BinaryChoiceForm(forms.Form):
         ranking_process = get_ranking_process(node)
         super(BinaryChoiceForm, self).__init__(*args, **kwargs)
 
-        # This is needed because there's no way we can return a
-        # QUERYSET of things from get_rank_choices without losing
-        # generality. We right now have a list of the things, and we
-        # need to convert it to a queryset, since this is the only
-        # type (to my knowledge) that the 'queryset' field of a form
-        # field will accept. Thus, we get each atom's id and search
-        # for them all again, except this time they are returned as a
-        # queryset.
-        atom_ids = map(lambda obj: obj.id, ranking_process.get_rank_choices())
-        atom_qset = ConceptAtom.objects.filter(pk__in=atom_ids)
-        self.fields['final_choices'].queryset = atom_qset
+        self.fields['final_choices'].queryset = ranking_process.get_atoms()
+
+
+class HierarchicalChoiceForm(forms.Form):
+    """
+    A ranked ballot: the voter gives each atom they want to rank a
+    distinct rank, 1 being the most preferred. Atoms left blank are
+    ranked below all the others. cleaned_data['final_choices'] lists
+    the ranked atoms in order of preference, like the binary form's.
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        node_id = kwargs.pop('node_id')
+        node = ConceptNode.objects.filter(pk=node_id).get()
+        ranking_process = get_ranking_process(node)
+        super(HierarchicalChoiceForm, self).__init__(*args, **kwargs)
+
+        self.atoms = list(ranking_process.get_atoms())
+        rank_choices = [('', '---')] + [(i, i) for i in range(1, len(self.atoms) + 1)]
+        for atom in self.atoms:
+            self.fields['rank_%d' % atom.id] = forms.TypedChoiceField(
+                label=atom.text, choices=rank_choices, coerce=int,
+                required=False, empty_value=None)
+
+    def clean(self):
+        cleaned_data = super(HierarchicalChoiceForm, self).clean()
+        ranked = [(cleaned_data.get('rank_%d' % atom.id), atom) for atom in self.atoms]
+        ranked = sorted([(rank, atom) for rank, atom in ranked if rank is not None],
+                        key=operator.itemgetter(0))
+        ranks = [rank for rank, atom in ranked]
+        if not ranks:
+            raise forms.ValidationError("Rank at least one choice.")
+        if len(set(ranks)) != len(ranks):
+            raise forms.ValidationError("Each rank can only be given to one choice.")
+        cleaned_data['final_choices'] = [atom for rank, atom in ranked]
+        return cleaned_data
+
+
+# the ballot form of each kind of ranking process
+CHOICE_FORMS = {
+    RankingProcess.binary: BinaryChoiceForm,
+    RankingProcess.hierarchical: HierarchicalChoiceForm,
+}
\ No newline at end of file
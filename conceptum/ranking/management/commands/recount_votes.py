@@ -0,0 +1,45 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ranking.models import RankingProcess, ValueCounter
+
+
+class Command(BaseCommand):
+    args = '[ranking_process_id ...]'
+    help = ("Compares the value counters of ranking processes (all of them by default) "
+            "with their ballots and reports the counters that disagree. With --fix, "
+            "the counters are set to their tally of ballots.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--fix', action='store_true', dest='fix', default=False,
+            help="Correct the counters that disagree with the ballots."),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        processes = RankingProcess.objects.order_by('pk')
+        if args:
+            try:
+                processes = processes.filter(pk__in=[int(arg) for arg in args])
+            except ValueError:
+                raise CommandError("Ranking process ids must be integers.")
+
+        wrong = 0
+        for ranking_process in processes:
+            if options['fix']:
+                wrong += ranking_process.recount()
+                continue
+            tally = ranking_process.tally()
+            values = ValueCounter.objects.filter(ranking_process=ranking_process)\
+                                         .values_list('pk', 'value')
+            for counter_id, value in values:
+                if value != tally[counter_id]:
+                    wrong += 1
+                    if verbosity >= 2:
+                        self.stdout.write("Counter %d of ranking process %d: value %d, "
+                                          "%d ballot(s)." % (counter_id, ranking_process.pk,
+                                                             value, tally[counter_id]))
+        if verbosity >= 1:
+            self.stdout.write("%d counter(s) %s the ballots."
+                              % (wrong, 'corrected to' if options['fix'] else 'disagree with'))
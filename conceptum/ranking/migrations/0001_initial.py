@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Databases created with syncdb already have these tables; apply this
+        # migration to them with `./manage.py migrate ranking 0001 --fake`.
+
+        # Adding model 'RankingProcess'
+        db.create_table(u'ranking_rankingprocess', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('content_type', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['contenttypes.ContentType'])),
+            ('object_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('value_choices', self.gf('django.db.models.fields.CharField')(default='BIN', max_length=3)),
+            ('status', self.gf('django.db.models.fields.CharField')(default='N', max_length=1)),
+        ))
+        db.send_create_signal(u'ranking', ['RankingProcess'])
+
+        # Adding model 'ValueCounter'
+        db.create_table(u'ranking_valuecounter', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('content_type', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['contenttypes.ContentType'])),
+            ('object_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('ranking_process', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['ranking.RankingProcess'])),
+            ('value', self.gf('django.db.models.fields.IntegerField')()),
+        ))
+        db.send_create_signal(u'ranking', ['ValueCounter'])
+
+
+    def backwards(self, orm):
+        # Deleting model 'RankingProcess'
+        db.delete_table(u'ranking_rankingprocess')
+
+        # Deleting model 'ValueCounter'
+        db.delete_table(u'ranking_valuecounter')
+
+
+    models = {
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'ranking.rankingprocess': {
+            'Meta': {'object_name': 'RankingProcess'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'N'", 'max_length': '1'}),
+            'value_choices': ('django.db.models.fields.CharField', [], {'default': "'BIN'", 'max_length': '3'})
+        },
+        u'ranking.valuecounter': {
+            'Meta': {'ordering': "['-value']", 'object_name': 'ValueCounter'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking_process': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.RankingProcess']"}),
+            'value': ('django.db.models.fields.IntegerField', [], {})
+        }
+    }
+
+    complete_apps = ['ranking']
\ No newline at end of file
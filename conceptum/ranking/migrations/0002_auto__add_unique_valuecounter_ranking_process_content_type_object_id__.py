@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Merging duplicate counters, which the unique constraint would reject
+        if not db.dry_run:
+            self.merge_duplicate_counters(orm)
+
+        # Adding unique constraint on 'ValueCounter', fields ['ranking_process', 'content_type', 'object_id']
+        db.create_unique(u'ranking_valuecounter', ['ranking_process_id', 'content_type_id', 'object_id'])
+
+        # Adding index on 'ValueCounter', fields ['object_id', 'content_type']
+        db.create_index(u'ranking_valuecounter', ['object_id', 'content_type_id'])
+
+
+    def merge_duplicate_counters(self, orm):
+        """
+        Keeps the first ValueCounter of each object in a ranking process, and adds the
+        votes of the others to it.
+        """
+        duplicates = (orm.ValueCounter.objects.order_by()
+                                              .values('ranking_process', 'content_type',
+                                                      'object_id')
+                                              .annotate(count=models.Count('id'),
+                                                        first=models.Min('id'),
+                                                        votes=models.Sum('value'))
+                                              .filter(count__gt=1))
+        for duplicate in duplicates:
+            orm.ValueCounter.objects.filter(pk=duplicate['first'])\
+                                    .update(value=duplicate['votes'])
+            orm.ValueCounter.objects.filter(ranking_process=duplicate['ranking_process'],
+                                            content_type=duplicate['content_type'],
+                                            object_id=duplicate['object_id'])\
+                                    .exclude(pk=duplicate['first']).delete()
+
+    def backwards(self, orm):
+        # Removing index on 'ValueCounter', fields ['object_id', 'content_type']
+        db.delete_index(u'ranking_valuecounter', ['object_id', 'content_type_id'])
+
+        # Removing unique constraint on 'ValueCounter', fields ['ranking_process', 'content_type', 'object_id']
+        db.delete_unique(u'ranking_valuecounter', ['ranking_process_id', 'content_type_id', 'object_id'])
+
+
+    models = {
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'ranking.rankingprocess': {
+            'Meta': {'object_name': 'RankingProcess'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'N'", 'max_length': '1'}),
+            'value_choices': ('django.db.models.fields.CharField', [], {'default': "'BIN'", 'max_length': '3'})
+        },
+        u'ranking.valuecounter': {
+            'Meta': {'ordering': "['-value']", 'unique_together': "[['ranking_process', 'content_type', 'object_id']]", 'object_name': 'ValueCounter', 'index_together': "[['object_id', 'content_type']]"},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking_process': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.RankingProcess']"}),
+            'value': ('django.db.models.fields.IntegerField', [], {})
+        }
+    }
+
+    complete_apps = ['ranking']
\ No newline at end of file
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'BallotChoice'
+        db.create_table(u'ranking_ballotchoice', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('ballot', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['ranking.Ballot'])),
+            ('counter', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['ranking.ValueCounter'])),
+            ('rank', self.gf('django.db.models.fields.PositiveIntegerField')(null=True)),
+        ))
+        db.send_create_signal(u'ranking', ['BallotChoice'])
+
+        # Adding unique constraint on 'BallotChoice', fields ['ballot', 'counter']
+        db.create_unique(u'ranking_ballotchoice', ['ballot_id', 'counter_id'])
+
+        # Moving the choices of existing ballots, which are not ranked
+        db.execute('INSERT INTO ranking_ballotchoice (ballot_id, counter_id, rank) '
+                   'SELECT ballot_id, valuecounter_id, NULL FROM %s'
+                   % db.quote_name(db.shorten_name(u'ranking_ballot_choices')))
+
+        # Removing M2M table for field choices on 'Ballot'
+        db.delete_table(db.shorten_name(u'ranking_ballot_choices'))
+
+        # Adding field 'RankingProcess.aggregation'
+        db.add_column(u'ranking_rankingprocess', 'aggregation',
+                      self.gf('django.db.models.fields.CharField')(default='SCH', max_length=3),
+                      keep_default=False)
+
+
+    def backwards(self, orm):
+        # Adding M2M table for field choices on 'Ballot'
+        m2m_table_name = db.shorten_name(u'ranking_ballot_choices')
+        db.create_table(m2m_table_name, (
+            ('id', models.AutoField(verbose_name='ID', primary_key=True, auto_created=True)),
+            ('ballot', models.ForeignKey(orm[u'ranking.ballot'], null=False)),
+            ('valuecounter', models.ForeignKey(orm[u'ranking.valuecounter'], null=False))
+        ))
+        db.create_unique(m2m_table_name, ['ballot_id', 'valuecounter_id'])
+
+        # Moving the choices back; their ranks are lost
+        db.execute('INSERT INTO %s (ballot_id, valuecounter_id) '
+                   'SELECT ballot_id, counter_id FROM ranking_ballotchoice'
+                   % db.quote_name(m2m_table_name))
+
+        # Removing unique constraint on 'BallotChoice', fields ['ballot', 'counter']
+        db.delete_unique(u'ranking_ballotchoice', ['ballot_id', 'counter_id'])
+
+        # Deleting model 'BallotChoice'
+        db.delete_table(u'ranking_ballotchoice')
+
+        # Deleting field 'RankingProcess.aggregation'
+        db.delete_column(u'ranking_rankingprocess', 'aggregation')
+
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'authtools.user': {
+            'Meta': {'ordering': "[u'name', u'email']", 'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'unique': 'True', 'max_length': '255', 'db_index': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'ranking.ballot': {
+            'Meta': {'unique_together': "[['ranking_process', 'voter']]", 'object_name': 'Ballot'},
+            'choices': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['ranking.ValueCounter']", 'through': u"orm['ranking.BallotChoice']", 'symmetrical': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'ranking_process': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.RankingProcess']"}),
+            'submitted': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'voter': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['authtools.User']"})
+        },
+        u'ranking.ballotchoice': {
+            'Meta': {'unique_together': "[['ballot', 'counter']]", 'object_name': 'BallotChoice'},
+            'ballot': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.Ballot']"}),
+            'counter': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.ValueCounter']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'rank': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True'})
+        },
+        u'ranking.rankingprocess': {
+            'Meta': {'object_name': 'RankingProcess'},
+            'aggregation': ('django.db.models.fields.CharField', [], {'default': "'SCH'", 'max_length': '3'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'N'", 'max_length': '1'}),
+            'value_choices': ('django.db.models.fields.CharField', [], {'default': "'BIN'", 'max_length': '3'})
+        },
+        u'ranking.valuecounter': {
+            'Meta': {'ordering': "['-value']", 'unique_together': "[['ranking_process', 'content_type', 'object_id']]", 'object_name': 'ValueCounter', 'index_together': "[['object_id', 'content_type']]"},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'ranking_process': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['ranking.RankingProcess']"}),
+            'value': ('django.db.models.fields.IntegerField', [], {})
+        }
+    }
+
+    complete_apps = ['ranking']
\ No newline at end of file
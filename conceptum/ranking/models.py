@@ -1,11 +1,17 @@
 # Model definitions for the ranking app
 
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction, IntegrityError
+from django.db import connection
+from django.db.models import Count, F, Max, Q
 
 from authtools.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 
+from ranking.engine import RankProfile
+
 import nodemanager.models #full namespace to avoid circular import
                           #(hopefully)
 
@@ -21,9 +27,13 @@ class RankingProcess(models.Model):
     who is voting and administrating, since that information is
     available in the concept node's CI Tree Info model).
 
-    -Value Choice: The ranking system (currently just binary is implemented)
+    -Value Choice: The ranking system, binary (vote for any number of
+    choices) or hierarchical (rank the choices)
 
     -Status: one of Not Initialized/In Progress/Closed
+
+    -Aggregation: how hierarchical ballots are combined into one
+    ranking (Borda count, instant runoff or the Schulze method)
     """
 
     # ranking processes can be attached to any kind of object.
@@ -58,22 +68,221 @@ class RankingProcess(models.Model):
                              choices=STATE_CHOICES,
                              default=not_initialized)
 
-    def get_rank_choices(self):
+    #how hierarchical ballots are aggregated (see ranking.engine)
+    borda = 'BOR'
+    instant_runoff = 'IRV'
+    schulze = 'SCH'
+    AGGREGATION_CHOICES = (
+        (borda, 'Borda Count'),
+        (instant_runoff, 'Instant Runoff'),
+        (schulze, 'Schulze Method'),
+    )
+    AGGREGATION_METHODS = {
+        borda: 'borda',
+        instant_runoff: 'instant_runoff',
+        schulze: 'schulze',
+    }
+    aggregation = models.CharField(max_length=3,
+                                   choices=AGGREGATION_CHOICES,
+                                   default=schulze)
+
+    def get_rank_choices(self, top=None, ties=False):
         """
         This function returns a list of every item that can be ranked by
-        the Ranking Process by finding everything attached to its
-        Value Counters.
+        the Ranking Process, best first (the list of get_ranked_atoms).
+        """
+
+        return list(self.get_ranked_atoms(top, ties))
+
+    def get_atoms(self):
+        """
+        Returns a queryset of the ConceptAtoms ranked by this process,
+        each annotated with `votes`, the value of its counter. The atoms
+        are joined with their counters, so they are read in one query.
+        """
+
+        return nodemanager.models.ConceptAtom.objects\
+            .filter(value_counters__ranking_process=self)\
+            .annotate(votes=Max('value_counters__value'))
+
+    def get_ranked_atoms(self, top=None, ties=False):
+        """
+        Returns the queryset of get_atoms(), best first. A binary
+        process orders the atoms by votes, in the same query. A
+        hierarchical process orders them by the process' aggregation of
+        the ballots (see ranking.engine), which costs two more queries:
+        the counters and the ballots. Atoms that tie keep the order of
+        their ids.
+
+        With `top`, only the first `top` atoms are returned, and with
+        `ties` also the atoms after them that tie with the last one.
+        `top` must be at least 1.
+        """
+
+        if top is not None and top < 1:
+            raise ValueError("top must be at least 1, not %r" % top)
+        atoms = self.get_atoms()
+        if self.value_choices == self.hierarchical:
+            return self.order_by_ballots(atoms, top, ties)
+
+        atoms = atoms.order_by('-votes', 'pk')
+        if top is None:
+            return atoms
+        if not ties:
+            return atoms[:top]
+        cutoff = list(atoms.values_list('votes', flat=True)[top - 1:top])
+        if not cutoff:
+            return atoms
+        return atoms.filter(votes__gte=cutoff[0])
+
+    def order_by_ballots(self, atoms, top=None, ties=False):
+        """
+        Orders the queryset `atoms` by the aggregation of the ballots
+        of this process, for get_ranked_atoms().
+        """
+
+        atom_type = ContentType.objects.get_for_model(nodemanager.models.ConceptAtom)
+        atom_ids = dict(ValueCounter.objects.filter(ranking_process=self,
+                                                    content_type=atom_type)
+                                            .values_list('pk', 'object_id'))
+        profile = self.get_rank_profile(sorted(atom_ids, key=atom_ids.get))
+        ranked = [(atom_ids[counter_id], score) for counter_id, score
+                  in profile.ranked(self.AGGREGATION_METHODS[self.aggregation])]
+        if top is not None:
+            if ties and len(ranked) > top:
+                cutoff = ranked[top - 1][1]
+                ranked = [(atom_id, score) for atom_id, score in ranked if score >= cutoff]
+            else:
+                ranked = ranked[:top]
+            atoms = atoms.filter(pk__in=[atom_id for atom_id, score in ranked])
+        if not ranked:
+            return atoms
+
+        # the position of each atom, as SQL (the ids are integers)
+        qn = connection.ops.quote_name
+        meta = nodemanager.models.ConceptAtom._meta
+        position = 'CASE %s.%s %s END' % (
+            qn(meta.db_table), qn(meta.pk.column),
+            ' '.join('WHEN %d THEN %d' % (atom_id, i) for i, (atom_id, score) in enumerate(ranked)))
+        return atoms.extra(select={'position': position}, order_by=['position'])
+
+    def get_rank_profile(self, counter_ids):
+        """
+        Returns the ranked ballots of this process as a
+        ranking.engine.RankProfile whose candidates are the value
+        counters `counter_ids`. The ballots are read with one query.
+        """
+
+        rows = BallotChoice.objects.filter(ballot__ranking_process=self,
+                                           rank__isnull=False)\
+                                   .values_list('ballot', 'counter', 'rank')
+        return RankProfile.from_rows(counter_ids, rows)
+
+    def counters_for(self, choices):
+        """
+        Returns a queryset of this process' value counters of the
+        objects in `choices`.
+        """
+
+        ids_by_type = defaultdict(list)
+        for choice in choices:
+            ids_by_type[ContentType.objects.get_for_model(choice)].append(choice.id)
+
+        targets = Q(pk__in=[])
+        for content_type, ids in ids_by_type.items():
+            targets |= Q(content_type=content_type, object_id__in=ids)
+        return ValueCounter.objects.filter(targets, ranking_process=self)
+
+    def has_voted(self, user):
+        """
+        Returns whether `user` has cast a ballot in this process.
+        """
+
+        if not user.is_authenticated():
+            return False
+        return Ballot.objects.filter(ranking_process=self, voter=user).exists()
+
+    def cast_ballot(self, voter, choices):
+        """
+        Records the ballot of `voter` for the objects in `choices` and
+        adds its votes to their value counters, in one transaction. In a
+        hierarchical process `choices` are in the voter's order of
+        preference, and are ranked in that order.
 
-        Note: due to the metaclass ordering enforced in the
-        ValueCounter class, this function (for now) will return the
-        items in descending order according to their integer
-        value. This "feature" and will fall apart if more complex
-        notions of value are created for concept atoms. Consider the
-        use of this function to return items in order as already
-        "deprecated"
+        The counters are incremented in the database with one UPDATE,
+        so votes submitted at the same time are all counted. Only this
+        process' counters change.
+
+        Returns the new Ballot, or None if `voter` had already voted in
+        this process. In that case nothing changes, so submitting a
+        ballot twice is harmless.
+        """
+
+        counters = dict(((content_type_id, object_id), counter_id)
+                        for counter_id, content_type_id, object_id
+                        in self.counters_for(choices).values_list('pk', 'content_type',
+                                                                  'object_id'))
+        counter_ids = []
+        for choice in choices:
+            key = (ContentType.objects.get_for_model(choice).id, choice.id)
+            if key in counters and counters[key] not in counter_ids:
+                counter_ids.append(counters[key])
+        hierarchical = self.value_choices == self.hierarchical
+        try:
+            with transaction.atomic():
+                ballot = Ballot.objects.create(voter=voter, ranking_process=self)
+                BallotChoice.objects.bulk_create([
+                    BallotChoice(ballot=ballot, counter_id=counter_id,
+                                 rank=i + 1 if hierarchical else None)
+                    for i, counter_id in enumerate(counter_ids)])
+                ValueCounter.objects.filter(pk__in=counter_ids)\
+                                    .update(value=F('value') + 1)
+        except IntegrityError:
+            return None
+        return ballot
+
+    def tally(self):
+        """
+        Returns a dictionary that maps the id of each of this process'
+        value counters to the number of ballots that chose it, counted
+        with one GROUP BY query.
+        """
+
+        return dict(ValueCounter.objects.filter(ranking_process=self)
+                                        .order_by()
+                                        .annotate(votes=Count('ballot'))
+                                        .values_list('pk', 'votes'))
+
+    def recount(self):
+        """
+        Sets each value counter of this process to its tally of ballots
+        and returns the number of counters that were corrected.
+
+        The counters are locked while they are recounted, so ballots cast
+        in the meantime wait and are counted once.
         """
 
-        return map(lambda vc: vc.target, ValueCounter.objects.filter(ranking_process=self))
+        corrections = defaultdict(list)
+        with transaction.atomic():
+            values = dict(ValueCounter.objects.select_for_update()
+                                              .filter(ranking_process=self)
+                                              .values_list('pk', 'value'))
+            for counter_id, votes in self.tally().items():
+                if values[counter_id] != votes:
+                    corrections[votes].append(counter_id)
+            for votes, counter_ids in corrections.items():
+                ValueCounter.objects.filter(pk__in=counter_ids).update(value=votes)
+        return sum(len(counter_ids) for counter_ids in corrections.values())
+
+    def close(self, top=None, ties=False):
+        """
+        Closes this process and returns its ranked atoms, optionally
+        only the `top` ones (see get_ranked_atoms).
+        """
+
+        self.status = self.closed
+        self.save()
+        return self.get_ranked_atoms(top, ties)
 
     def __unicode__(self):
         return "Ranking Process of " + unicode(self.parent)
@@ -112,3 +321,55 @@ class ValueCounter(models.Model):
         ordering = ["-value"] #ensures that any queryset of
                               #ValueCounters will be sorted in
                               #descending order
+        # a target has one counter per ranking process, and counters are
+        # looked up by their target
+        unique_together = [["ranking_process", "content_type", "object_id"]]
+        index_together = [["object_id", "content_type"]]
+
+
+class Ballot(models.Model):
+    """
+    A Ballot records the choices one voter submitted to a ranking
+    process. A voter has at most one ballot per process, which makes
+    submission idempotent, and value counters can be recounted (and
+    audited) from the ballots.
+
+    - voter: the user who voted
+
+    - ranking process: the process the ballot was cast in
+
+    - choices: the value counters of the objects the voter chose (and
+      their ranks, in a hierarchical process; see BallotChoice)
+
+    - submitted: when the ballot was cast
+    """
+
+    voter = models.ForeignKey(User)
+    ranking_process = models.ForeignKey(RankingProcess)
+    choices = models.ManyToManyField(ValueCounter, through='BallotChoice')
+    submitted = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return "Ballot of " + unicode(self.voter) + " in " + unicode(self.ranking_process)
+
+    class Meta:
+        # one ballot per voter and process; also the index that has_voted uses
+        unique_together = [["ranking_process", "voter"]]
+
+
+class BallotChoice(models.Model):
+    """
+    One choice on a Ballot: the value counter of the chosen object and,
+    in a hierarchical process, the rank the voter gave it (1 being the
+    most preferred). Binary ballots have no ranks.
+    """
+
+    ballot = models.ForeignKey(Ballot)
+    counter = models.ForeignKey(ValueCounter)
+    rank = models.PositiveIntegerField(null=True)
+
+    def __unicode__(self):
+        return unicode(self.counter) + " on " + unicode(self.ballot)
+
+    class Meta:
+        unique_together = [["ballot", "counter"]]
@@ -0,0 +1,68 @@
+from django.test import SimpleTestCase
+
+import numpy as np
+
+from ranking.engine import RankProfile
+
+
+def profile_from_orders(candidates, orders):
+    """
+    Builds a RankProfile from (number of voters, candidates in order of preference)
+    pairs.
+    """
+    rows = []
+    ballot = 0
+    for count, order in orders:
+        for i in range(count):
+            ballot += 1
+            rows.extend((ballot, candidate, rank + 1) for rank, candidate in enumerate(order))
+    return RankProfile.from_rows(list(candidates), rows)
+
+
+class RankProfileTest(SimpleTestCase):
+
+    def test_schulze(self):
+        # the example of Schulze's paper, also on Wikipedia
+        profile = profile_from_orders('ABCDE', [(5, 'ACBED'), (5, 'ADECB'), (8, 'BEDAC'),
+                                                (3, 'CABED'), (7, 'CAEBD'), (2, 'CBADE'),
+                                                (7, 'DCEBA'), (8, 'EBADC')])
+        self.assertEqual(profile.num_ballots, 45)
+        np.testing.assert_array_equal(profile.pairwise()[0], [0, 20, 26, 30, 22])
+        self.assertEqual(profile.order('schulze'), list('EACBD'))
+
+    def test_instant_runoff_and_borda(self):
+        # C is eliminated first and its voters elect B
+        profile = profile_from_orders('ABC', [(4, 'ABC'), (3, 'BCA'), (2, 'CBA')])
+        np.testing.assert_array_equal(profile.instant_runoff(), [2, 3, 1])
+        np.testing.assert_array_equal(profile.borda(), [8, 12, 7])
+        self.assertEqual(profile.order('instant_runoff'), list('BAC'))
+        self.assertEqual(profile.order('borda'), list('BAC'))
+
+    def test_partial_ballots(self):
+        # unranked candidates share the last place; ties keep the candidates' order
+        profile = profile_from_orders([1, 2, 3, 4], [(2, [3]), (1, [2, 3])])
+        np.testing.assert_array_equal(profile.borda(), [0, 3, 8, 0])
+        self.assertEqual(profile.order('borda'), [3, 2, 1, 4])
+        self.assertEqual(profile.order('instant_runoff'), [3, 2, 1, 4])
+        self.assertEqual(profile.order('schulze'), [3, 2, 1, 4])
+        # rows of unknown candidates are ignored
+        self.assertEqual(RankProfile.from_rows([1], [(1, 1, 1), (1, 9, 2)]).num_candidates, 1)
+
+    def test_empty(self):
+        profile = RankProfile.from_rows([1, 2], [])
+        self.assertEqual(profile.order('schulze'), [1, 2])
+        self.assertEqual(profile.order('instant_runoff'), [1, 2])
+        self.assertEqual(RankProfile.from_rows([], []).order('borda'), [])
+        self.assertRaises(ValueError, profile.order, 'plurality')
+
+    def test_pairwise(self):
+        # compare with counting every ballot and pair in Python
+        random = np.random.RandomState(0)
+        ranks = random.randint(1, 8, size=(50, 6)).astype(float)
+        ranks[random.rand(50, 6) < 0.3] = np.inf
+        expected = np.zeros((6, 6), dtype=int)
+        for ballot in ranks:
+            for i in range(6):
+                for j in range(6):
+                    expected[i, j] += ballot[i] < ballot[j]
+        np.testing.assert_array_equal(RankProfile(range(6), ranks).pairwise(), expected)
@@ -0,0 +1,200 @@
+from StringIO import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from nodemanager.models import CITreeInfo, ConceptNode, ConceptAtom
+from ranking.models import RankingProcess, ValueCounter, Ballot
+
+User = get_user_model()
+
+
+def create_ranking_process(num_atoms=4, **fields):
+    """
+    Creates a node in the ranking stage and its ranking process in progress, with
+    `num_atoms` final choices. `fields` are set on the ranking process. Returns
+    (node, ranking process, atoms).
+    """
+    node = ConceptNode.objects.create(ci_tree_info=CITreeInfo.objects.create(),
+                                      content='ranked', node_type=ConceptNode.rank)
+    ranking_process = RankingProcess.objects.create(parent=node,
+                                                    status=RankingProcess.in_progress,
+                                                    **fields)
+    author = create_voters(1, prefix='author%d-' % node.id)[0]
+    atom_type = ContentType.objects.get_for_model(ConceptAtom)
+    atoms = []
+    for i in range(num_atoms):
+        atom = ConceptAtom.objects.create(concept_node=node, user=author,
+                                          text='atom %d' % i, final_choice=True)
+        ValueCounter.objects.create(ranking_process=ranking_process, value=0,
+                                    content_type=atom_type, object_id=atom.id)
+        atoms.append(atom)
+    return node, ranking_process, atoms
+
+
+def create_voters(num_voters, prefix='voter'):
+    """
+    Creates `num_voters` staff users, whose password is 'password'.
+    """
+    voters = []
+    for i in range(num_voters):
+        voter = User.objects.create_user('%s%d@test.com' % (prefix, i), password='password',
+                                         name='Voter %d' % i)
+        voter.is_staff = True
+        voter.save()
+        voters.append(voter)
+    return voters
+
+
+def counter_values(ranking_process, atoms):
+    """
+    Returns the values of the counters of `atoms` in `ranking_process`, in order.
+    """
+    values = dict(ValueCounter.objects.filter(ranking_process=ranking_process)
+                                      .values_list('object_id', 'value'))
+    return [values[atom.id] for atom in atoms]
+
+
+class BallotTest(TestCase):
+
+    def setUp(self):
+        self.node, self.ranking_process, self.atoms = create_ranking_process()
+        self.voters = create_voters(3)
+
+    def test_cast_ballot(self):
+        # counters of the same atoms in another process are left alone
+        other_process = RankingProcess.objects.create(parent=create_ranking_process(0)[0])
+        atom_type = ContentType.objects.get_for_model(ConceptAtom)
+        for atom in self.atoms:
+            ValueCounter.objects.create(ranking_process=other_process, value=0,
+                                        content_type=atom_type, object_id=atom.id)
+
+        voter = self.voters[0]
+        self.assertFalse(self.ranking_process.has_voted(voter))
+        with CaptureQueriesContext(connection) as queries:
+            ballot = self.ranking_process.cast_ballot(voter, self.atoms[:2])
+        self.assertEqual(len([q for q in queries if 'UPDATE' in q['sql']]), 1)
+        self.assertEqual(set(ballot.choices.values_list('object_id', flat=True)),
+                         set(atom.id for atom in self.atoms[:2]))
+        self.assertTrue(self.ranking_process.has_voted(voter))
+
+        # a second ballot changes nothing
+        self.assertIsNone(self.ranking_process.cast_ballot(voter, self.atoms[2:]))
+        self.assertEqual(Ballot.objects.filter(voter=voter).count(), 1)
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [1, 1, 0, 0])
+        self.assertEqual(counter_values(other_process, self.atoms), [0, 0, 0, 0])
+
+    def test_tally_and_recount(self):
+        for voter, atoms in zip(self.voters, [self.atoms[:1], self.atoms[:2], self.atoms[:3]]):
+            self.ranking_process.cast_ballot(voter, atoms)
+        counters = dict(ValueCounter.objects.filter(ranking_process=self.ranking_process)
+                                            .values_list('object_id', 'pk'))
+        with CaptureQueriesContext(connection) as queries:
+            tally = self.ranking_process.tally()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([tally[counters[atom.id]] for atom in self.atoms], [3, 2, 1, 0])
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [3, 2, 1, 0])
+
+        ValueCounter.objects.filter(pk__in=[counters[self.atoms[0].id],
+                                            counters[self.atoms[3].id]]).update(value=7)
+        out = StringIO()
+        call_command('recount_votes', str(self.ranking_process.pk), stdout=out)
+        self.assertIn('2 counter(s) disagree', out.getvalue())
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [7, 2, 1, 7])
+
+        call_command('recount_votes', fix=True, stdout=out)
+        self.assertIn('2 counter(s) corrected', out.getvalue())
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [3, 2, 1, 0])
+        self.assertEqual(self.ranking_process.recount(), 0)
+
+
+class RankedAtomsTest(TestCase):
+
+    def setUp(self):
+        self.node, self.ranking_process, self.atoms = create_ranking_process(5)
+        for atom, value in zip(self.atoms, [2, 5, 2, 0, 3]):
+            self.ranking_process.counters_for([atom]).update(value=value)
+
+    def test_get_ranked_atoms(self):
+        a, b, c, d, e = self.atoms
+        with CaptureQueriesContext(connection) as queries:
+            atoms = list(self.ranking_process.get_ranked_atoms())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(atoms, [b, e, a, c, d])
+        self.assertEqual([atom.votes for atom in atoms], [5, 3, 2, 2, 0])
+
+        self.assertEqual(list(self.ranking_process.get_ranked_atoms(top=3)), [b, e, a])
+        self.assertEqual(list(self.ranking_process.get_ranked_atoms(top=3, ties=True)),
+                         [b, e, a, c])
+        self.assertEqual(list(self.ranking_process.get_ranked_atoms(top=4, ties=True)),
+                         [b, e, a, c])
+        self.assertEqual(list(self.ranking_process.get_ranked_atoms(top=9, ties=True)),
+                         [b, e, a, c, d])
+        self.assertRaises(ValueError, self.ranking_process.get_ranked_atoms, top=0)
+        # atoms of other processes are not included
+        create_ranking_process(2)
+        self.assertEqual(self.ranking_process.get_rank_choices(), [b, e, a, c, d])
+
+    def test_close(self):
+        a, b, c, d, e = self.atoms
+        # every ranked atom is exported, whatever the node's max_children
+        self.node.max_children = 2
+        self.node.transition_node_state()
+        self.assertEqual(RankingProcess.objects.get(pk=self.ranking_process.pk).status,
+                         RankingProcess.closed)
+        self.assertEqual([child.content for child in self.node.get_children()],
+                         [b.text, e.text, a.text, c.text, d.text])
+
+
+class HierarchicalTest(TestCase):
+
+    def setUp(self):
+        self.node, self.ranking_process, self.atoms = create_ranking_process(
+            3, value_choices=RankingProcess.hierarchical,
+            aggregation=RankingProcess.instant_runoff)
+        a, b, c = self.atoms
+        # C is eliminated first and its voters elect B
+        ballots = [[a, b, c]] * 4 + [[b, c]] * 3 + [[c, b]] * 2
+        for voter, choices in zip(create_voters(9), ballots):
+            self.ranking_process.cast_ballot(voter, choices)
+
+    def test_cast_ballot(self):
+        a, b, c = self.atoms
+        ballot = self.ranking_process.cast_ballot(create_voters(1, 'ranker')[0], [c, a, c])
+        self.assertEqual(list(ballot.ballotchoice_set.order_by('rank')
+                                    .values_list('counter__object_id', 'rank')),
+                         [(c.id, 1), (a.id, 2)])
+
+    def test_get_rank_choices(self):
+        a, b, c = self.atoms
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ranking_process.get_rank_choices(), [b, a, c])
+        # counters, ballots and atoms
+        self.assertEqual(len(queries), 3)
+        self.assertEqual([atom.votes for atom in self.ranking_process.get_ranked_atoms()],
+                         [9, 4, 9])
+        self.ranking_process.aggregation = RankingProcess.borda
+        self.assertEqual(self.ranking_process.get_rank_choices(), [b, a, c])
+        # C beats A head to head, 5 to 4
+        self.ranking_process.aggregation = RankingProcess.schulze
+        self.assertEqual(self.ranking_process.get_rank_choices(), [b, c, a])
+        self.assertEqual(self.ranking_process.get_rank_choices(top=1), [b])
+
+    def test_ties(self):
+        a, b, c = self.atoms
+        # Borda scores 8, 14 and 8
+        self.ranking_process.cast_ballot(create_voters(1, 'ranker')[0], [b, c])
+        self.ranking_process.aggregation = RankingProcess.borda
+        self.assertEqual(self.ranking_process.get_rank_choices(top=2), [b, a])
+        self.assertEqual(self.ranking_process.get_rank_choices(top=2, ties=True), [b, a, c])
+
+    def test_transition_node_state(self):
+        self.node.transition_node_state()
+        self.assertEqual(RankingProcess.objects.get(pk=self.ranking_process.pk).status,
+                         RankingProcess.closed)
+        self.assertEqual([child.content for child in self.node.get_children()],
+                         ['atom 1', 'atom 0', 'atom 2'])
@@ -0,0 +1,89 @@
+import threading
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.client import Client
+
+from ranking.models import Ballot, BallotChoice, RankingProcess
+from ranking.test_models import create_ranking_process, create_voters, counter_values
+
+NUM_VOTERS = 12
+
+
+class SubmitTest(TransactionTestCase):
+
+    def setUp(self):
+        self.node, self.ranking_process, self.atoms = create_ranking_process()
+
+    def submit(self, client, atoms):
+        return client.post(reverse('get submit', kwargs={'node_id': self.node.id}),
+                           {'final_choices': [atom.id for atom in atoms]})
+
+    def test_submit(self):
+        voter = create_voters(1)[0]
+        submit_url = reverse('submit', kwargs={'node_id': self.node.id})
+
+        response = self.submit(self.client, self.atoms[1:])
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(email=voter.email, password='password')
+        self.assertTemplateUsed(self.client.get(submit_url), 'ranking/submit.html')
+        response = self.submit(self.client, self.atoms[1:])
+        self.assertRedirects(response, reverse('dispatch', kwargs={'node_id': self.node.id}),
+                             target_status_code=302)
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [0, 1, 1, 1])
+
+        # submitting again is harmless
+        self.assertTemplateUsed(self.client.get(submit_url), 'ranking/already_voted.html')
+        self.submit(self.client, self.atoms[:1])
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [0, 1, 1, 1])
+
+    def test_submit_ranked(self):
+        self.ranking_process.value_choices = RankingProcess.hierarchical
+        self.ranking_process.save()
+        voter = create_voters(1)[0]
+        self.client.login(email=voter.email, password='password')
+        url = reverse('get submit', kwargs={'node_id': self.node.id})
+        a, b, c, d = self.atoms
+
+        response = self.client.post(url, {'rank_%d' % a.id: '1', 'rank_%d' % b.id: '1'})
+        self.assertFormError(response, 'form', None, "Each rank can only be given to one choice.")
+
+        self.client.post(url, {'rank_%d' % a.id: '3', 'rank_%d' % c.id: '1',
+                               'rank_%d' % d.id: ''})
+        self.assertEqual(list(BallotChoice.objects.filter(ballot__voter=voter).order_by('rank')
+                                                  .values_list('counter__object_id', 'rank')),
+                         [(c.id, 1), (a.id, 2)])
+        self.assertEqual(counter_values(self.ranking_process, self.atoms), [1, 0, 1, 0])
+
+    def test_simultaneous_submissions(self):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            self.skipTest('every thread would get its own in-memory database')
+        start = threading.Event()
+        statuses = []
+
+        def vote(voter, atoms):
+            client = Client()
+            client.login(email=voter.email, password='password')
+            start.wait()
+            try:
+                statuses.append(self.submit(client, atoms).status_code)
+            finally:
+                connection.close()
+
+        # every voter submits twice; voter i votes for atom 0 and for atom i % 4
+        ballots = [(voter, [self.atoms[0], self.atoms[i % 4]])
+                   for i, voter in enumerate(create_voters(NUM_VOTERS))]
+        threads = [threading.Thread(target=vote, args=ballot) for ballot in ballots * 2]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [302] * 2 * NUM_VOTERS)
+        self.assertEqual(Ballot.objects.filter(ranking_process=self.ranking_process).count(),
+                         NUM_VOTERS)
+        self.assertEqual(counter_values(self.ranking_process, self.atoms),
+                         [NUM_VOTERS] + [NUM_VOTERS // 4] * 3)
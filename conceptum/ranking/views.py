@@ -1,12 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
 from django.template import RequestContext, loader
 from django.core.urlresolvers import reverse
 from django.contrib.contenttypes.models import ContentType
 
 from nodemanager.models import ConceptNode
+from profiles.models import ContributorProfile
 from ranking.models import RankingProcess, ValueCounter
-from ranking.forms import RankingProcessSetupForm, BinaryChoiceForm
+from ranking.forms import RankingProcessSetupForm, CHOICE_FORMS
 
 # TODO: get_or_404s for all nodes, ranking processes, etc
 
@@ -60,7 +62,7 @@ def setup(request, node_id):
     if not ranking_process.status == ranking_process.not_initialized:
         return redirect('dispatch', node_id=node_id)
 
-    if user in node.admin_set():
+    if node.is_admin(user):
         return render(request,'ranking/rank_setup.html',
                       {"node": node,
                        "form": form})
@@ -84,6 +86,7 @@ def get_setup(request, node_id):
             #update ranking_process state based on admin form submission
             ranking_process = get_ranking_process(node)
             ranking_process.value_choices = form.cleaned_data.get('value_choices')
+            ranking_process.aggregation = form.cleaned_data.get('aggregation')
             ranking_process.status = ranking_process.in_progress
             ranking_process.save()
 
@@ -115,43 +118,45 @@ def submit(request, node_id):
 
     render_args = {'node': node,
                    'user': user,
-                   'user_is_admin': user in node.admin_set()} #is boolean
+                   'user_is_admin': node.is_admin(user)} #is boolean
 
-    #users who already visited are assumed to have voted
-    if user not in node.users_contributed_set():
-        render_args['form'] = BinaryChoiceForm(node_id=node_id)
+    #users who cast a ballot cannot vote again
+    ranking_process = get_ranking_process(node)
+    if not ranking_process.has_voted(user):
+        form_class = CHOICE_FORMS[ranking_process.value_choices]
+        render_args['form'] = form_class(node_id=node_id)
         return render(request, 'ranking/submit.html', render_args)
     else:
         return render(request, 'ranking/already_voted.html', render_args)
 
 def get_submit(request, node_id):
     """
-    Processes a ranking submission form from a user.
+    Processes a ranking submission form from a user. A user's ballot
+    is only counted once, so submitting the form again changes nothing.
     """
 
     user = request.user
+    if not ContributorProfile.auth_status(user):
+        raise PermissionDenied
     node = ConceptNode.objects.filter(pk=node_id).get()
 
     if request.method == 'POST':
 
-        form = BinaryChoiceForm(request.POST, node_id=node_id)
+        ranking_process = get_ranking_process(node)
+        form_class = CHOICE_FORMS[ranking_process.value_choices]
+        form = form_class(request.POST, node_id=node_id)
         if form.is_valid():
 
-            choices = form.cleaned_data['final_choices']
-
-            for choice in choices:
-                counter = ValueCounter.objects.filter(object_id=choice.id, content_type=get_ct(choice)).get()
-                counter.value += 1
-                counter.save()
+            ranking_process.cast_ballot(user, form.cleaned_data['final_choices'])
 
-            return redirect('final sub', node_id)
+            return redirect('dispatch', node_id=node_id)
 
         else: #form has errors
             return render(request, 'ranking/submit.html',
                           {'node': node,
                            'user': user,
                            'form': form,
-                           'user_is_admin': user in node.admin_set()} #bool
+                           'user_is_admin': node.is_admin(user)} #bool
                           )
     else:
         HttpResponse("not supposed to be here?")